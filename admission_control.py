@@ -0,0 +1,249 @@
+"""
+泰迪杯项目 - 准入控制与过载保护
+功能: 按通道限制问答、表格提取等耗时请求的并发数，超出部分进入有界队列排队；
+      根据平均处理时间估算排队等待时间，预计超过截止时间时立即返回503，
+      健康检查等轻量请求使用独立通道，不会排在耗时请求之后
+"""
+
+import math
+import time
+import asyncio
+from collections import deque
+
+from starlette.responses import JSONResponse, Response
+
+try:
+    from .latency_metrics import LatencyHistogram
+except ImportError:
+    from latency_metrics import LatencyHistogram
+
+# 平均处理时间的指数加权系数
+EWMA_ALPHA = 0.2
+
+
+class Overloaded(Exception):
+    """通道过载，请求被拒绝"""
+
+    def __init__(self, lane, reason, retry_after):
+        super().__init__(f"{lane}: {reason}")
+        self.lane = lane
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class AdmissionLane:
+    """单个通道: 并发上限 + FIFO有界队列
+
+    必须在事件循环线程中使用；释放名额时直接交给队首等待者，排队顺序公平。
+    """
+
+    def __init__(self, name, max_concurrency, max_queue=100, deadline=5.0, clock=time.monotonic):
+        """初始化通道
+
+        Args:
+            name (str): 通道名称
+            max_concurrency (int): 同时处理的请求数上限
+            max_queue (int): 排队请求数上限
+            deadline (float): 排队等待的最长秒数，预计等待超过该值时直接拒绝
+            clock (callable): 单调时钟
+        """
+        self.name = name
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_queue = max_queue
+        self.deadline = deadline
+        self.clock = clock
+        self.active = 0
+        self.waiters = deque()
+        self.avg_service = None
+        self.queue_wait = LatencyHistogram()
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    def estimated_wait(self):
+        """按队列长度和平均处理时间估算新请求的排队时间（秒）"""
+        if self.active < self.max_concurrency and not self.waiters:
+            return 0.0
+        return (len(self.waiters) + 1) / self.max_concurrency * (self.avg_service or 0.0)
+
+    def _reject(self, reason, retry_after):
+        self.rejected += 1
+        raise Overloaded(self.name, reason, retry_after)
+
+    async def acquire(self):
+        """获取处理名额
+
+        Returns:
+            float: 排队等待的秒数
+
+        Raises:
+            Overloaded: 队列已满、预计等待超过截止时间或排队超时
+        """
+        if self.active < self.max_concurrency and not self.waiters:
+            self.active += 1
+            self.admitted += 1
+            self.queue_wait.record(0)
+            return 0.0
+
+        estimate = self.estimated_wait()
+        if len(self.waiters) >= self.max_queue:
+            self._reject("queue_full", estimate or self.deadline)
+        if estimate > self.deadline:
+            self._reject("deadline", estimate)
+
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.append(future)
+        start = self.clock()
+        try:
+            await asyncio.wait_for(future, self.deadline)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 名额已经交给本请求，放弃时要还回去
+                self.release(None)
+            else:
+                try:
+                    self.waiters.remove(future)
+                except ValueError:
+                    pass
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self.timed_out += 1
+            self._reject("timeout", self.estimated_wait() or self.deadline)
+
+        waited = self.clock() - start
+        self.admitted += 1
+        self.queue_wait.record(waited * 1e6)
+        return waited
+
+    def release(self, service_time):
+        """释放名额并更新平均处理时间
+
+        Args:
+            service_time (float): 本次处理耗时（秒），为None时不计入平均值
+        """
+        if service_time is not None:
+            if self.avg_service is None:
+                self.avg_service = service_time
+            else:
+                self.avg_service += EWMA_ALPHA * (service_time - self.avg_service)
+        while self.waiters:
+            future = self.waiters.popleft()
+            if not future.done():
+                # 名额直接转交，active 不变
+                future.set_result(None)
+                return
+        self.active -= 1
+
+    def get_stats(self):
+        p50, p95, p99 = self.queue_wait.percentiles([0.5, 0.95, 0.99])
+        return {
+            "active": self.active,
+            "queued": len(self.waiters),
+            "max_concurrency": self.max_concurrency,
+            "max_queue": self.max_queue,
+            "deadline": self.deadline,
+            "admitted": self.admitted,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_service_ms": round(self.avg_service * 1000, 3) if self.avg_service is not None else None,
+            "estimated_wait_ms": round(self.estimated_wait() * 1000, 3),
+            "queue_wait_p50_ms": round(p50 / 1000, 3),
+            "queue_wait_p95_ms": round(p95 / 1000, 3),
+            "queue_wait_p99_ms": round(p99 / 1000, 3),
+        }
+
+    def reset_stats(self):
+        self.queue_wait.reset()
+        self.admitted = self.rejected = self.timed_out = 0
+
+
+class _HeldResponse(Response):
+    """包装响应: 响应体发送完成（或客户端断开）后才调用 release
+
+    流式响应在 call_next 返回后才开始生成响应体（如逐页解析PDF），名额必须保持到发送结束。
+    包装的是响应的发送过程而不只是响应体迭代器: 响应体未开始发送客户端就断开时也会释放。
+    """
+
+    def __init__(self, response, release):
+        # 共用原响应的状态码和响应头，外层中间件修改响应头时同样生效
+        self.__dict__.update(response.__dict__)
+        self._response = response
+        self._release = release
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self._response(scope, receive, send)
+        finally:
+            self._release()
+
+
+class AdmissionController:
+    """按路径前缀把请求分配到通道，未配置的路径不受限制"""
+
+    def __init__(self, lanes, routes):
+        """初始化准入控制
+
+        Args:
+            lanes (dict): {通道名: AdmissionLane}
+            routes (dict): {路径前缀: 通道名}，前缀越长越优先
+        """
+        self.lanes = lanes
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+
+    @classmethod
+    def from_config(cls, config, clock=time.monotonic):
+        """根据 ADMISSION_CONFIG 创建，未开启时返回None"""
+        if not config.get('enabled'):
+            return None
+        lanes = {
+            name: AdmissionLane(
+                name,
+                max_concurrency=options.get('max_concurrency', 4),
+                max_queue=options.get('max_queue', 100),
+                deadline=options.get('deadline', 5.0),
+                clock=clock,
+            )
+            for name, options in config.get('lanes', {}).items()
+        }
+        return cls(lanes, config.get('routes', {}))
+
+    def lane_for(self, path):
+        for prefix, lane in self.routes:
+            if path.startswith(prefix):
+                return self.lanes.get(lane)
+        return None
+
+    async def handle(self, request, call_next):
+        """HTTP中间件入口"""
+        lane = self.lane_for(request.url.path)
+        if lane is None:
+            return await call_next(request)
+
+        try:
+            waited = await lane.acquire()
+        except Overloaded as e:
+            retry_after = max(1, math.ceil(e.retry_after))
+            return JSONResponse(
+                status_code=503,
+                content={"detail": "服务繁忙，请稍后再试", "lane": e.lane, "reason": e.reason,
+                         "retry_after": retry_after},
+                headers={"Retry-After": str(retry_after)},
+            )
+
+        start = lane.clock()
+        try:
+            response = await call_next(request)
+        except BaseException:
+            # 处理失败的请求耗时不具代表性，不计入平均处理时间
+            lane.release(None)
+            raise
+        response.headers["X-Queue-Wait"] = f"{waited:.4f}"
+        # 处理时间计到响应体发送完成
+        return _HeldResponse(response, lambda: lane.release(lane.clock() - start))
+
+    def get_stats(self):
+        return {name: lane.get_stats() for name, lane in self.lanes.items()}
+
+    def reset_stats(self):
+        for lane in self.lanes.values():
+            lane.reset_stats()
@@ -0,0 +1,236 @@
+"""
+泰迪杯项目 - 组件依赖加载器
+功能: 按依赖关系（DAG）加载服务组件，互不依赖的组件在线程池中并发加载，
+      每个组件独立超时和重试，失败组件的下游组件降级跳过，各组件耗时通过 /health 输出
+"""
+
+import time
+import asyncio
+import inspect
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+logger = logging.getLogger(__name__)
+
+# 组件状态
+PENDING = "pending"
+LOADING = "loading"
+LOADED = "loaded"
+FAILED = "failed"
+TIMEOUT = "timeout"
+SKIPPED = "skipped"
+
+
+class ComponentState:
+    """单个组件的加载配置与状态"""
+
+    __slots__ = ("name", "loader", "depends_on", "timeout", "retries",
+                 "status", "attempts", "duration", "error")
+
+    def __init__(self, name, loader, depends_on, timeout, retries):
+        self.name = name
+        self.loader = loader
+        self.depends_on = tuple(depends_on)
+        self.timeout = timeout
+        self.retries = retries
+        self.status = PENDING
+        self.attempts = 0
+        self.duration = None
+        self.error = None
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "duration": round(self.duration, 3) if self.duration is not None else None,
+            "attempts": self.attempts,
+            "depends_on": list(self.depends_on),
+            "timeout": self.timeout,
+            "error": self.error,
+        }
+
+
+class ComponentLoader:
+    """按依赖关系并行加载组件
+
+    加载函数可以是普通函数（在线程池中执行，不阻塞事件循环）或异步函数；
+    返回False或抛出异常视为失败，按配置重试。超时的组件不重试（线程无法中断，
+    重试会导致同一组件被并发加载两次），依赖它的组件标记为跳过。
+    """
+
+    def __init__(self, max_workers=4, default_timeout=30, retries=1, retry_delay=0.5,
+                 order=(), timeouts=None, dependencies=None):
+        """初始化加载器
+
+        Args:
+            max_workers (int): 线程池大小
+            default_timeout (float): 未单独配置的组件的超时秒数
+            retries (int): 失败后的重试次数
+            retry_delay (float): 重试间隔基数（秒），第n次重试等待 n*retry_delay
+            order (list): 优先级顺序，依赖关系允许时靠前的组件先提交
+            timeouts (dict): {组件名: 超时秒数}
+            dependencies (dict): {组件名: [依赖的组件名]}
+        """
+        self.max_workers = max_workers
+        self.default_timeout = default_timeout
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.order = list(order)
+        self.timeouts = dict(timeouts or {})
+        self.dependencies = dict(dependencies or {})
+        self.components = {}
+        self.started = None
+        self.duration = None
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 COMPONENT_LOADING 配置创建加载器"""
+        return cls(
+            max_workers=config.get('max_workers', 4),
+            default_timeout=config.get('default_timeout', 30),
+            retries=config.get('retries', 1),
+            retry_delay=config.get('retry_delay', 0.5),
+            order=config.get('order', ()),
+            timeouts=config.get('timeout', {}),
+            dependencies=config.get('dependencies', {}),
+        )
+
+    def register(self, name, loader, depends_on=None, timeout=None, retries=None):
+        """注册组件
+
+        Args:
+            name (str): 组件名
+            loader (callable): 加载函数
+            depends_on (list): 依赖的组件名，默认取配置中的依赖关系
+            timeout (float): 超时秒数，默认取配置
+            retries (int): 重试次数，默认取加载器设置
+        """
+        if depends_on is None:
+            depends_on = self.dependencies.get(name, ())
+        self.components[name] = ComponentState(
+            name, loader, depends_on,
+            timeout if timeout is not None else self.timeouts.get(name, self.default_timeout),
+            retries if retries is not None else self.retries,
+        )
+
+    def _sorted_names(self):
+        """拓扑排序，同一层级内按配置的优先级顺序
+
+        未注册的依赖会被忽略；存在循环依赖时抛出 ValueError。
+        """
+        priority = {name: i for i, name in enumerate(self.order)}
+        rank = lambda name: (priority.get(name, len(priority)), name)
+
+        remaining = {
+            name: {dep for dep in state.depends_on if dep in self.components}
+            for name, state in self.components.items()
+        }
+        for name, state in self.components.items():
+            for dep in state.depends_on:
+                if dep not in self.components:
+                    logger.warning(f"组件 {name} 的依赖 {dep} 未注册，已忽略")
+
+        result = []
+        while remaining:
+            ready = sorted((name for name, deps in remaining.items() if not deps), key=rank)
+            if not ready:
+                raise ValueError(f"组件存在循环依赖: {', '.join(sorted(remaining))}")
+            for name in ready:
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+            result.extend(ready)
+        return result
+
+    async def load_all(self):
+        """加载全部已注册组件
+
+        Returns:
+            dict: 加载报告，同 report()
+        """
+        names = self._sorted_names()
+        for state in self.components.values():
+            state.status, state.attempts, state.duration, state.error = PENDING, 0, None, None
+        self.started = time.perf_counter()
+        self.duration = None
+
+        executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="component-loader")
+        try:
+            tasks = {}
+            # 拓扑序保证创建任务时其依赖的任务已存在
+            for name in names:
+                tasks[name] = asyncio.ensure_future(self._load(self.components[name], tasks, executor))
+            await asyncio.gather(*tasks.values())
+        finally:
+            # 超时组件的线程仍可能在运行，不等待其结束
+            executor.shutdown(wait=False)
+        self.duration = time.perf_counter() - self.started
+
+        report = self.report()
+        logger.info(f"组件加载结束: {report['status']}，耗时 {self.duration:.2f}秒")
+        return report
+
+    async def _load(self, state, tasks, executor):
+        deps = [dep for dep in state.depends_on if dep in tasks]
+        if deps:
+            await asyncio.gather(*(tasks[dep] for dep in deps))
+            unavailable = [dep for dep in deps if self.components[dep].status != LOADED]
+            if unavailable:
+                state.status = SKIPPED
+                state.error = f"依赖组件未加载: {', '.join(unavailable)}"
+                logger.warning(f"跳过组件 {state.name}: {state.error}")
+                return
+
+        loop = asyncio.get_running_loop()
+        state.status = LOADING
+        start = time.perf_counter()
+        for attempt in range(1, state.retries + 2):
+            state.attempts = attempt
+            try:
+                if inspect.iscoroutinefunction(state.loader):
+                    pending = state.loader()
+                else:
+                    pending = loop.run_in_executor(executor, state.loader)
+                if await asyncio.wait_for(pending, state.timeout) is False:
+                    raise RuntimeError("加载函数返回失败")
+                state.status = LOADED
+                state.error = None
+                break
+            except asyncio.TimeoutError:
+                state.status = TIMEOUT
+                state.error = f"加载超时（{state.timeout}秒）"
+                break
+            except Exception as e:
+                state.status = FAILED
+                state.error = str(e)
+                if attempt <= state.retries:
+                    logger.warning(f"组件 {state.name} 第{attempt}次加载失败: {e}，准备重试")
+                    await asyncio.sleep(self.retry_delay * attempt)
+        state.duration = time.perf_counter() - start
+
+        if state.status == LOADED:
+            logger.info(f"组件 {state.name} 加载成功，耗时 {state.duration:.2f}秒")
+        else:
+            logger.error(f"组件 {state.name} 加载失败: {state.error}")
+
+    def is_loaded(self, name):
+        state = self.components.get(name)
+        return state is not None and state.status == LOADED
+
+    @property
+    def load_status(self):
+        """整体状态: pending / loading / completed / degraded"""
+        if self.started is None:
+            return PENDING
+        if self.duration is None:
+            return LOADING
+        if all(state.status == LOADED for state in self.components.values()):
+            return "completed"
+        return "degraded"
+
+    def report(self):
+        """各组件的加载状态与耗时"""
+        return {
+            "status": self.load_status,
+            "duration": round(self.duration, 3) if self.duration is not None else None,
+            "components": {name: state.to_dict() for name, state in self.components.items()},
+        }
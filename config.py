@@ -29,8 +29,16 @@ COMPONENT_LOADING = {
         'ui_components': 2,     # UI组件加载超时秒数
         'data_processor': 30,   # 数据处理组件加载超时秒数
         'qa_engine': 45,        # 问答引擎加载超时秒数
-        'knowledge_base': 20    # 知识库加载超时秒数
-    }
+        'knowledge_base': 20,   # 知识库加载超时秒数
+        'knowledge_graph': 30,  # 知识图谱加载超时秒数
+        'table_store': 60       # 表格存储导入超时秒数
+    },
+    'dependencies': {           # 组件 -> 依赖的组件，无依赖关系的组件并发加载
+        'knowledge_graph': ['knowledge_base']
+    },
+    'max_workers': 4,           # 加载线程数
+    'retries': 1,               # 加载失败后的重试次数（超时不重试）
+    'retry_delay': 1.0          # 重试间隔秒数
 }
 
 # API相关配置
@@ -39,25 +47,197 @@ API_CONFIG = {
     'cors_allowed_origins': ['*'],  # 允许所有来源，生产环境应限制
     'rate_limit': {
         'enabled': True,
-        'requests_per_minute': 60
+        'requests_per_minute': 60,      # 每个客户端的默认限额
+        'burst': 20,                    # 默认分组的桶容量（允许的突发请求数）
+        'routes': {                     # 单独计数的路径前缀 -> 每分钟请求数
+            '/api/ask': 30
+        },
+        'exempt_paths': ['/health', '/api/health', '/monitoring', '/static', '/docs', '/redoc', '/openapi.json'],
+        'backend': 'memory',            # memory: 进程内；sqlite: 多个工作进程共享计数
+        'sqlite_path': 'data/cache/rate_limit.db',
+        'sqlite_timeout': 0.05,         # 等待SQLite写锁的秒数，超时的请求直接放行
+        'trust_forwarded_for': False    # 部署在反向代理后时开启，按 X-Forwarded-For 识别客户端
     },
     'docs_url': '/api/docs',
     'redoc_url': '/api/redoc'
 }
 
+# 响应缓存配置
+RESPONSE_CACHE_CONFIG = {
+    'max_entries': 512,                # 最大缓存条目数
+    'max_bytes': 32 * 1024 * 1024,     # 缓存总字节数上限
+    'max_entry_bytes': 2 * 1024 * 1024,  # 单个响应可缓存的最大字节数
+    'lock_timeout': 10,                # 等待其他请求回源的最长秒数
+    'routes': {                        # 路径前缀 -> TTL秒数，未列出的路径不缓存
+        '/api/tables/catalog': 30,
+        '/api/tables': 30,
+        '/tables': 30,
+        '/api/health': 5,
+        '/health': 5
+    },
+    'last_modified_sources': {         # 路径前缀 -> 数据目录或文件，用于生成Last-Modified并在文件更新时使缓存失效
+        # 已入库表格的目录索引（WAL模式下写入先进入 -wal 文件），与 TABLE_STORE_CONFIG['root'] 一致
+        '/api/tables/catalog': ['data/table_store/catalog.db', 'data/table_store/catalog.db-wal'],
+        '/api/tables': ['data/processed/excel_tables'],  # 与 TABLE_PROCESSOR_CONFIG['output_dir'] 一致
+        '/tables': ['data/processed/excel_tables']
+    }
+}
+
+# 请求分阶段计时配置
+TRACING_CONFIG = {
+    'enabled': True,
+    'routes': ['/api/ask', '/api/qa'],  # 需要分阶段计时的路径前缀
+    'slow_trace_capacity': 50,          # 保留最慢的追踪记录条数
+    'debug_param': 'debug_timing',      # 请求带 ?debug_timing=1 时在JSON响应中附加 _timing 字段
+    'instrument': {                     # "模块:类.方法" -> 阶段名称，模块不存在时跳过
+        'app.models.smart_qa:HybridQA.ask': 'qa_answer',
+        'app.models.smart_qa_C:HybridQA.ask': 'qa_answer',
+        'app.models.qa_evaluator:AnswerEvaluator.evaluate': 'evaluate'
+    }
+}
+
+# 准入控制配置（并发上限 + 有界队列，过载时快速返回503）
+ADMISSION_CONFIG = {
+    'enabled': True,
+    'lanes': {
+        'qa': {'max_concurrency': 4, 'max_queue': 32, 'deadline': 5.0},          # 问答
+        'extraction': {'max_concurrency': 2, 'max_queue': 8, 'deadline': 10.0},  # 表格提取
+        'catalog': {'max_concurrency': 8, 'max_queue': 32, 'deadline': 2.0},     # 已入库表格的检索、读取和查询
+        'light': {'max_concurrency': 32, 'max_queue': 64, 'deadline': 1.0}       # 健康检查、监控等轻量请求的保留通道
+    },
+    'routes': {                    # 路径前缀 -> 通道，未列出的路径不受限制
+        '/api/ask': 'qa',
+        '/api/tables/catalog': 'catalog',
+        '/api/tables': 'extraction',
+        '/health': 'light',
+        '/api/health': 'light',
+        '/monitoring': 'light'
+    }
+}
+
+# 同步任务执行器配置
+EXECUTOR_CONFIG = {
+    'default_pool': 'io',
+    'disconnect_poll_interval': 0.25,  # 检查客户端是否断开的间隔（秒）
+    'pools': {
+        # 线程池: 释放GIL的任务（numpy、PDF解析的C扩展、外部API调用）
+        'io': {'kind': 'thread', 'max_workers': 8, 'max_queue': 64},
+        # 进程池: 纯Python的CPU密集任务，子进程启动时预加载问答索引
+        'cpu': {'kind': 'process', 'max_workers': 2, 'max_queue': 16,
+                'initializer': 'app.preload:warm_start', 'mp_context': None}
+    },
+    'routes': {                    # 任务名 -> 执行池，未列出的任务使用 default_pool
+        'qa.search': 'cpu',
+        'qa.hybrid_ask': 'io',
+        'qa.evaluate': 'io',
+        'pdf.extract_tables': 'cpu',
+        'table.catalog': 'io',      # 已入库表格的检索、读取和查询（numpy内存映射，释放GIL）
+        'table.export': 'io'        # 单表导出（批量导出内部另行使用进程池）
+    }
+}
+
+# PDF表格提取任务队列配置
+JOB_QUEUE_CONFIG = {
+    'enabled': True,
+    'db_path': 'data/cache/jobs.db',         # 任务表（SQLite），Web进程与工作进程共享
+    'upload_dir': 'data/jobs/uploads',       # 上传的PDF按内容哈希保存
+    'handler': 'app.pdf_tables:extract_job', # 任务处理函数
+    'workers': 2,                            # 工作进程数
+    'poll_interval': 0.5,                    # 空闲时检查新任务的间隔（秒）
+    'stale_after': 300,                      # 运行中任务超过该秒数没有心跳时重新排队
+    'heartbeat_interval': 60,                # 执行任务期间发送心跳的间隔（秒）
+    'max_attempts': 2,                       # 单个任务最多执行次数
+    'max_upload_mb': 100,
+    'upload_retention': 86400,               # 上传文件保留秒数，排队中和运行中任务的文件除外，0 表示不清理
+    'mp_context': None                       # 进程启动方式，默认使用平台默认值
+}
+
+# PDF提取结果缓存配置
+EXTRACTION_CACHE_CONFIG = {
+    'enabled': True,
+    'cache_dir': 'data/cache/extraction',  # 按内容哈希保存的提取结果
+    'max_size_mb': 512,                    # 超出后淘汰最久未使用的条目
+    'version': '1',                        # 全局版本号，修改后全部缓存失效
+    # "模块:类.方法" -> 结果类型和提取器版本，模块不存在时跳过；
+    # 提取模块源文件的哈希也参与缓存键，修改提取代码后旧条目自动失效，version 用于其他原因（如依赖库升级）手动失效
+    'targets': {
+        'app.data_processing.extract_tables:TableExtractor.extract_tables': {'kind': 'tables', 'version': '1'},
+        'app.data_processing.extract_tables:TableExtractor.extract_metadata': {'kind': 'metadata', 'version': '1'},
+        'app.data_processing.extract_text:TextExtractor.extract_text': {'kind': 'text', 'version': '1'},
+        'app.data_processing.extract_text:TextExtractor.extract_metadata': {'kind': 'metadata', 'version': '1'}
+    }
+}
+
+# 列式表格存储配置
+TABLE_STORE_CONFIG = {
+    'enabled': True,
+    'root': 'data/table_store',                      # 目录索引 catalog.db 与按列保存的表格
+    'import_dirs': ['data/processed/excel_tables'],  # 启动时导入其中新增或修改过的 .xlsx/.csv
+    'import_on_startup': True,
+    'index_columns': ['赛项名称', '赛道', '报名时间', '报名时间_开始'],  # 写入时建立排序索引的常用查询字段
+    'normalize': True,              # 入库时清洗单元格，并把日期、日期区间解析为日期列（见 table_normalize.py）
+    'stitch': True,                 # 导入Excel时合并跨页断开的表格（见 table_stitch.py）
+    'ingest_jobs': True,            # 后台提取任务完成后把表格写入存储
+    'default_page_size': 50,
+    'max_page_size': 500,
+    'export_dir': 'data/exports',   # 批量导出的输出目录
+    'export_workers': 4             # 批量导出的并行进程数
+}
+
+# 延迟导入配置
+LAZY_IMPORT_CONFIG = {
+    'enabled': True,               # 关闭时在启动阶段导入全部路由
+    'background_warmup': False,    # 启动完成后是否在后台预先导入全部路由
+    'load_all_paths': ['/docs', '/redoc', '/openapi.json'],  # 访问这些路径时加载全部路由
+    'routers': [                   # paths 为触发加载的路径前缀；未匹配任何路由的请求会加载全部路由
+        {'module': 'app.routers.qa_router', 'prefix': '/api', 'tags': ['问答系统'], 'paths': ['/api/ask']},
+        {'module': 'app.routers.table_router', 'prefix': '/api', 'tags': ['表格处理'], 'paths': ['/api/tables']},
+        {'module': 'app.routers.ui_router', 'tags': ['用户界面']},
+        {'module': 'app.routers.session_router', 'prefix': '/api', 'tags': ['会话管理'], 'paths': ['/api/sessions']},
+        {'module': 'app.api.session_router', 'prefix': '/api', 'tags': ['会话管理API'],
+         'paths': ['/api/sessions'], 'optional': True},
+        {'module': 'app.api.knowledge_graph', 'prefix': '/api', 'tags': ['知识图谱'], 'optional': True},
+        {'module': 'app.api.health', 'prefix': '/api', 'tags': ['健康检查'], 'paths': ['/api/health']}
+    ]
+}
+
 # 问答引擎配置
 QA_ENGINE_CONFIG = {
     'knowledge_dir': 'data/processed/excel_tables',
     'use_api': False,  # 默认不使用外部API
     'api_config': None,
-    'llm_model': None
+    'llm_model': None,
+    'snapshot_path': 'data/cache/knowledge_base.kqa'  # 预加载生成的索引快照，各工作进程通过mmap共享
+}
+
+# 预加载配置
+PRELOAD_CONFIG = {
+    'app': 'app.main:app',   # fork模式下预先导入的应用
+    'host': '0.0.0.0',
+    'workers': 2,            # fork模式下的工作进程数
+    'snapshot_lock_timeout': 600,  # 重建索引快照的锁文件超过该秒数视为遗留
+    'role_env': 'TEDDY_WORKER_ROLE',  # fork模式下标记工作进程角色的环境变量，只有 primary 进程导入表格、启动任务工作进程
+    'warm_question': '比赛时间是什么时候?'  # 预热问答链路使用的问题
+}
+
+# 分词服务配置
+TOKENIZER_CONFIG = {
+    'cache_size': 4096,   # 查询分词LRU缓存条数
+    'processes': 1,       # 批量分词默认进程数，1表示不启用多进程
+    'chunk_size': 256     # 多进程批量分词时每个任务的文本条数
 }
 
 # 表格处理配置
 TABLE_PROCESSOR_CONFIG = {
     'input_dir': 'data/raw',
     'output_dir': 'data/processed/excel_tables',
-    'max_workers': 4
+    'max_workers': 4,
+    'page_parallel': True,        # 按页码区间分片到进程池并行提取
+    'pages_per_shard': 8,         # 每个分片的页数
+    'min_parallel_pages': 16,     # 页数少于该值时顺序提取
+    'stitch_edge_margin': 0.15,   # 跨页续表判定: 表格距页面底部/顶部的范围（占页高比例）
+    'stitch_max_page_gap': 2,     # 续表与上一片段的最大页码差（中间只能是没有表格的页面），1 为只合并相邻页
+    'stitch_column_precision': 0.02  # 列几何指纹中列边界的取整精度（占页宽比例）
 }
 
 # 启动模式配置
@@ -76,6 +256,11 @@ STARTUP_MODES = {
         'description': '紧急模式 - 仅加载最基本组件',
         'env_var': 'EMERGENCY',
         'value': '1'
+    },
+    'profile': {
+        'description': '启动分析模式 - 记录每个模块的导入耗时，结果见 /monitoring/startup',
+        'env_var': 'STARTUP_PROFILE',
+        'value': '1'
     }
 }
 
@@ -0,0 +1,248 @@
+"""
+泰迪杯项目 - 同步任务执行器
+功能: 把问答检索、答案评估、PDF表格提取等同步耗时调用移出事件循环；
+      线程池用于释放GIL的任务（C扩展、外部API调用），进程池用于纯Python的CPU密集任务；
+      按任务名路由到不同的池，队列有界，客户端断开时取消尚未开始的任务
+"""
+
+import time
+import asyncio
+import importlib
+import threading
+import contextvars
+import functools
+import multiprocessing
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+
+class ExecutorBusy(Exception):
+    """执行器队列已满"""
+
+
+class ClientDisconnected(Exception):
+    """客户端已断开，任务被取消"""
+
+
+def resolve_callable(path):
+    """按 "模块:函数" 解析可调用对象"""
+    module_name, _, attr = path.partition(":")
+    return getattr(importlib.import_module(module_name), attr)
+
+
+def _run_initializer(path):
+    """进程池子进程的初始化入口（需为顶层函数才能被pickle）"""
+    if path:
+        resolve_callable(path)()
+
+
+class ExecutorPool:
+    """带有界队列的线程池或进程池"""
+
+    def __init__(self, name, kind="thread", max_workers=4, max_queue=32, initializer=None, mp_context=None):
+        """初始化执行池
+
+        Args:
+            name (str): 池名称
+            kind (str): thread / process
+            max_workers (int): 工作线程（进程）数
+            max_queue (int): 等待执行的任务数上限，超出时抛出 ExecutorBusy
+            initializer (str): 进程池子进程启动时调用的函数（"模块:函数"），如预加载问答索引
+            mp_context (str): 进程启动方式 fork / spawn / forkserver，默认使用平台默认值
+        """
+        if kind not in ("thread", "process"):
+            raise ValueError(f"不支持的执行器类型: {kind}")
+        self.name = name
+        self.kind = kind
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max_queue
+        self.initializer = initializer
+        self.mp_context = mp_context
+        self.executor = None
+        self.pending = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.cancelled = 0
+        self.rejected = 0
+        self.run_time = 0.0
+        self._lock = threading.Lock()
+
+    def _create(self):
+        if self.kind == "thread":
+            return ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix=f"executor-{self.name}")
+        context = multiprocessing.get_context(self.mp_context) if self.mp_context else None
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers, mp_context=context,
+            initializer=_run_initializer, initargs=(self.initializer,),
+        )
+
+    def submit(self, func, *args, **kwargs):
+        """提交任务
+
+        Returns:
+            concurrent.futures.Future
+
+        Raises:
+            ExecutorBusy: 执行中和排队的任务数已达上限
+        """
+        with self._lock:
+            if self.pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise ExecutorBusy(f"执行器 {self.name} 队列已满")
+            self.pending += 1
+            self.submitted += 1
+            if self.executor is None:
+                self.executor = self._create()
+
+        call = functools.partial(_timed, func, *args, **kwargs)
+        if self.kind == "thread":
+            # 复制上下文，线程中的 span() 仍能上报到当前请求的追踪记录
+            call = functools.partial(contextvars.copy_context().run, call)
+        try:
+            try:
+                future = self.executor.submit(call)
+            except BrokenProcessPool:
+                # 子进程异常退出后进程池不可再用，重建一次
+                with self._lock:
+                    self.executor = self._create()
+                future = self.executor.submit(call)
+        except BaseException:
+            with self._lock:
+                self.pending -= 1
+            raise
+        future.add_done_callback(self._done)
+        return future
+
+    def _done(self, future):
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled():
+                self.cancelled += 1
+            elif future.exception() is not None:
+                self.failed += 1
+            else:
+                self.completed += 1
+
+    def unwrap(self, result):
+        """拆出任务返回值并累计执行耗时"""
+        value, elapsed = result
+        with self._lock:
+            self.run_time += elapsed
+        return value
+
+    def get_stats(self):
+        with self._lock:
+            finished = self.completed + self.failed
+            return {
+                "kind": self.kind,
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "pending": self.pending,
+                "submitted": self.submitted,
+                "completed": self.completed,
+                "failed": self.failed,
+                "cancelled": self.cancelled,
+                "rejected": self.rejected,
+                "avg_run_ms": round(self.run_time / finished * 1000, 3) if finished else None,
+            }
+
+    def shutdown(self, wait=False):
+        if self.executor is not None:
+            self.executor.shutdown(wait=wait, cancel_futures=True)
+            self.executor = None
+
+
+def _timed(func, *args, **kwargs):
+    """在工作线程（进程）中执行并返回 (结果, 耗时)"""
+    start = time.perf_counter()
+    result = func(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+class ExecutorRegistry:
+    """按任务名把同步调用路由到对应的执行池"""
+
+    def __init__(self, pools, routes=None, default_pool=None, disconnect_poll_interval=0.25):
+        """初始化
+
+        Args:
+            pools (dict): {池名称: ExecutorPool}
+            routes (dict): {任务名: 池名称}，如 {"qa.search": "cpu"}
+            default_pool (str): 未配置路由的任务使用的池
+            disconnect_poll_interval (float): 检查客户端是否断开的间隔秒数
+        """
+        self.pools = pools
+        self.routes = dict(routes or {})
+        self.default_pool = default_pool or next(iter(pools))
+        self.disconnect_poll_interval = disconnect_poll_interval
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 EXECUTOR_CONFIG 创建"""
+        pools = {
+            name: ExecutorPool(
+                name,
+                kind=options.get('kind', 'thread'),
+                max_workers=options.get('max_workers', 4),
+                max_queue=options.get('max_queue', 32),
+                initializer=options.get('initializer'),
+                mp_context=options.get('mp_context'),
+            )
+            for name, options in config.get('pools', {}).items()
+        }
+        return cls(
+            pools,
+            routes=config.get('routes'),
+            default_pool=config.get('default_pool'),
+            disconnect_poll_interval=config.get('disconnect_poll_interval', 0.25),
+        )
+
+    def pool_for(self, task):
+        return self.pools[self.routes.get(task, self.default_pool)]
+
+    async def run(self, task, func, *args, request=None, **kwargs):
+        """在任务对应的池中执行同步函数
+
+        进程池中执行的函数及参数必须可以pickle（使用模块级函数，不要传入引擎实例）。
+
+        Args:
+            task (str): 任务名，用于选择执行池
+            func (callable): 同步函数
+            request (Request): 当前请求，提供时在客户端断开后取消任务
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            ExecutorBusy: 执行池队列已满
+            ClientDisconnected: 客户端在任务完成前断开
+        """
+        pool = self.pool_for(task)
+        future = pool.submit(func, *args, **kwargs)
+        wrapped = asyncio.wrap_future(future)
+
+        try:
+            if request is not None:
+                while not wrapped.done():
+                    done, _ = await asyncio.wait({wrapped}, timeout=self.disconnect_poll_interval)
+                    if not done and await request.is_disconnected():
+                        raise ClientDisconnected(f"客户端已断开，取消任务 {task}")
+            return pool.unwrap(await wrapped)
+        except (ClientDisconnected, asyncio.CancelledError):
+            # 尚未开始执行的任务直接从队列中取消；已在执行的任务无法中断，结果被丢弃
+            future.cancel()
+            wrapped.cancel()
+            raise
+
+    def get_stats(self):
+        return {
+            "routes": dict(self.routes),
+            "default_pool": self.default_pool,
+            "pools": {name: pool.get_stats() for name, pool in self.pools.items()},
+        }
+
+    def shutdown(self, wait=False):
+        for pool in self.pools.values():
+            pool.shutdown(wait=wait)
@@ -0,0 +1,279 @@
+"""
+泰迪杯项目 - PDF提取结果缓存
+功能: 按PDF文件内容哈希缓存表格、文本和元数据的提取结果，内容相同的文件（如副本）只解析一次；
+      缓存键包含提取器版本，提取逻辑升级后旧条目自动失效；按总大小淘汰最久未使用的条目
+"""
+
+import os
+import sys
+import json
+import uuid
+import inspect
+import hashlib
+import logging
+import functools
+import importlib
+import threading
+
+try:
+    from .config import EXTRACTION_CACHE_CONFIG
+except ImportError:
+    from config import EXTRACTION_CACHE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# 淘汰后保留的大小占上限的比例，避免每次写入都触发淘汰
+LOW_WATERMARK = 0.9
+
+
+class ExtractionCache:
+    """基于内容哈希的磁盘缓存，多个进程可共享同一目录"""
+
+    def __init__(self, cache_dir, max_bytes=512 * 1024 * 1024, version="1"):
+        """初始化缓存
+
+        Args:
+            cache_dir (str): 缓存目录
+            max_bytes (int): 缓存总大小上限
+            version (str): 全局版本号，参与所有缓存键
+        """
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.version = version
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._hashes = {}
+        self._lock = threading.Lock()
+        os.makedirs(cache_dir, exist_ok=True)
+        self._size = sum(size for _, size, _ in self._entries())
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 EXTRACTION_CACHE_CONFIG 创建，未开启时返回None"""
+        if not config.get('enabled'):
+            return None
+        return cls(
+            config.get('cache_dir', 'data/cache/extraction'),
+            max_bytes=int(config.get('max_size_mb', 512) * 1024 * 1024),
+            version=str(config.get('version', '1')),
+        )
+
+    def content_hash(self, path):
+        """计算文件内容的SHA-256，按 (路径, 修改时间, 大小) 复用已计算的结果"""
+        stat = os.stat(path)
+        fingerprint = (os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+        cached = self._hashes.get(fingerprint)
+        if cached is not None:
+            return cached
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        content_hash = digest.hexdigest()
+        if len(self._hashes) > 4096:
+            self._hashes.clear()
+        self._hashes[fingerprint] = content_hash
+        return content_hash
+
+    def key(self, content_hash, kind, extractor_version=""):
+        """缓存键: 内容哈希 + 结果类型 + 全局版本 + 提取器版本"""
+        raw = f"{content_hash}|{kind}|{self.version}|{extractor_version}"
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".json")
+
+    def get(self, path, kind, extractor_version=""):
+        """读取缓存
+
+        Returns:
+            tuple: (是否命中, 结果)
+        """
+        entry = self._path(self.key(self.content_hash(path), kind, extractor_version))
+        try:
+            with open(entry, "r", encoding="utf-8") as f:
+                value = json.load(f)
+        except (OSError, ValueError):
+            self.misses += 1
+            return False, None
+        try:
+            # 更新访问时间，淘汰时按最久未使用排序
+            os.utime(entry)
+        except OSError:
+            pass
+        self.hits += 1
+        return True, value
+
+    def put(self, path, kind, value, extractor_version=""):
+        """写入缓存（先写临时文件再重命名，并发写入同一条目时不会读到半个文件）"""
+        entry = self._path(self.key(self.content_hash(path), kind, extractor_version))
+        os.makedirs(os.path.dirname(entry), exist_ok=True)
+        temp_path = f"{entry}.{uuid.uuid4().hex}.tmp"
+        try:
+            with open(temp_path, "w", encoding="utf-8") as f:
+                json.dump(value, f, ensure_ascii=False)
+            size = os.path.getsize(temp_path)
+            os.replace(temp_path, entry)
+        except (OSError, TypeError, ValueError) as e:
+            logger.warning(f"提取结果缓存写入失败: {e}")
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+            return
+        with self._lock:
+            self._size += size
+            over = self._size > self.max_bytes
+        if over:
+            self.evict()
+
+    def get_or_compute(self, path, kind, compute, extractor_version=""):
+        """命中时返回缓存结果，否则调用 compute() 并写入缓存"""
+        hit, value = self.get(path, kind, extractor_version)
+        if hit:
+            return value
+        value = compute()
+        self.put(path, kind, value, extractor_version)
+        return value
+
+    def _entries(self):
+        """[(路径, 大小, 访问时间)]"""
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".json"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def evict(self):
+        """按最久未使用淘汰条目，直到总大小低于上限的 LOW_WATERMARK"""
+        entries = sorted(self._entries(), key=lambda entry: entry[2])
+        total = sum(size for _, size, _ in entries)
+        target = self.max_bytes * LOW_WATERMARK
+        for path, size, _ in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            self.evictions += 1
+        with self._lock:
+            self._size = total
+
+    def clear(self):
+        for path, _, _ in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        with self._lock:
+            self._size = 0
+
+    def get_stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else None,
+            "evictions": self.evictions,
+            "size_bytes": self._size,
+            "max_bytes": self.max_bytes,
+        }
+
+
+_default_cache = None
+_default_lock = threading.Lock()
+
+
+def get_extraction_cache():
+    """获取按 EXTRACTION_CACHE_CONFIG 创建的进程级缓存实例，未开启时返回None"""
+    global _default_cache
+    if _default_cache is None:
+        with _default_lock:
+            if _default_cache is None:
+                _default_cache = ExtractionCache.from_config(EXTRACTION_CACHE_CONFIG) or False
+    return _default_cache or None
+
+
+def code_version(method):
+    """根据提取方法所在模块的源文件计算版本，源文件不可读时使用方法的字节码
+
+    提取模块的代码修改后版本随之变化，不必手动维护版本号。
+    """
+    digest = hashlib.sha256()
+    module = sys.modules.get(getattr(method, "__module__", None) or "")
+    source = getattr(module, "__file__", None)
+    try:
+        with open(source, "rb") as f:
+            digest.update(f.read())
+    except (TypeError, OSError):
+        code = getattr(method, "__code__", None)
+        if code is None:
+            return ""
+        digest.update(code.co_code)
+        digest.update(repr(code.co_consts).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+def cached_method(method, kind, extractor_version="", cache=None):
+    """包装 method(self, pdf_path)，按文件内容缓存返回值
+
+    缓存键中的提取器版本由类名、类的 __version__、extractor_version 和 code_version(method) 组成。
+    带有其他参数的调用（结果可能不同）不走缓存。
+    """
+    code = code_version(method)
+
+    @functools.wraps(method)
+    def wrapper(self, pdf_path, *args, **kwargs):
+        store = cache or get_extraction_cache()
+        if store is None or args or kwargs or not os.path.isfile(pdf_path):
+            return method(self, pdf_path, *args, **kwargs)
+        version = f"{type(self).__qualname__}:{getattr(self, '__version__', '')}:{extractor_version}:{code}"
+        return store.get_or_compute(pdf_path, kind, lambda: method(self, pdf_path), version)
+
+    wrapper.__extraction_cached__ = True
+    return wrapper
+
+
+def install(targets, extractor_version="", cache=None, import_modules=True):
+    """按配置为 TableExtractor、TextExtractor 等提取方法挂载缓存，模块不存在时跳过
+
+    Args:
+        targets (dict): {"模块路径:类名.方法名": 结果类型 或 {"kind": 结果类型, "version": 版本}}
+        extractor_version (str): 默认的提取器版本，目标未指定版本时使用；升级提取逻辑时修改以使旧缓存失效
+        cache (ExtractionCache): 使用的缓存，默认 get_extraction_cache()
+        import_modules (bool): 是否导入尚未加载的模块
+
+    Returns:
+        list: 成功挂载的目标
+    """
+    installed = []
+    for target, spec in targets.items():
+        if isinstance(spec, dict):
+            kind, version = spec["kind"], str(spec.get("version", extractor_version))
+        else:
+            kind, version = spec, extractor_version
+        module_name, _, attr_path = target.partition(":")
+        class_name, _, method_name = attr_path.rpartition(".")
+        try:
+            if import_modules:
+                module = importlib.import_module(module_name)
+            else:
+                module = sys.modules[module_name]
+            cls = getattr(module, class_name)
+        except (ImportError, KeyError, AttributeError):
+            continue
+        method = inspect.getattr_static(cls, method_name, None)
+        if method is None or isinstance(method, (staticmethod, classmethod)):
+            continue
+        if not getattr(method, "__extraction_cached__", False):
+            setattr(cls, method_name, cached_method(method, kind, version, cache))
+        installed.append(target)
+    return installed
@@ -0,0 +1,518 @@
+"""
+泰迪杯项目 - PDF表格提取任务队列
+功能: 上传的PDF不在请求中同步解析，而是写入SQLite任务表，由独立的工作进程取出执行；
+      任务状态持久化，服务重启后未完成的任务继续执行；逐页汇报进度；
+      按文件内容哈希去重，同一份PDF重复上传只解析一次
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import tempfile
+import hashlib
+import logging
+import threading
+import multiprocessing
+
+try:
+    from .executors import resolve_callable
+except ImportError:
+    from executors import resolve_callable
+
+logger = logging.getLogger(__name__)
+
+JOB_STATUSES = ("queued", "running", "done", "failed")
+
+
+class UploadTooLarge(Exception):
+    """上传文件超过大小限制"""
+
+
+class JobStore:
+    """基于SQLite文件的任务表，Web进程与工作进程共享"""
+
+    def __init__(self, path, stale_after=300, max_attempts=2, timeout=5.0, clock=time.time,
+                 heartbeat_interval=None):
+        """初始化任务表
+
+        Args:
+            path (str): SQLite文件路径
+            stale_after (float): 运行中的任务超过该秒数没有心跳时视为工作进程已退出，重新排队
+            max_attempts (int): 单个任务的最大执行次数
+            timeout (float): 等待数据库写锁的秒数
+            clock (callable): 时钟
+            heartbeat_interval (float): 执行任务期间发送心跳的间隔秒数，默认为 stale_after 的三分之一
+        """
+        self.path = path
+        self.stale_after = stale_after
+        self.max_attempts = max_attempts
+        self.heartbeat_interval = heartbeat_interval if heartbeat_interval else stale_after / 3
+        self.timeout = timeout
+        self.clock = clock
+        self._local = threading.local()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+    def _connect(self):
+        """每个线程一个连接，首次使用时打开
+
+        连接按进程号区分: 模块导入后fork出的进程（见 preload.serve_forked）不会使用父进程的连接。
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, content_hash TEXT NOT NULL UNIQUE, filename TEXT, path TEXT NOT NULL, "
+                "status TEXT NOT NULL, pages_done INTEGER NOT NULL DEFAULT 0, pages_total INTEGER, "
+                "attempts INTEGER NOT NULL DEFAULT 0, error TEXT, result TEXT, "
+                "created REAL NOT NULL, updated REAL NOT NULL, started REAL, finished REAL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _transaction(self, work):
+        """在写事务中执行 work(conn)"""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            result = work(conn)
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return result
+
+    @staticmethod
+    def _to_dict(row):
+        if row is None:
+            return None
+        total = row["pages_total"]
+        return {
+            "job_id": row["id"],
+            "status": row["status"],
+            "filename": row["filename"],
+            "content_hash": row["content_hash"],
+            "progress": {
+                "pages_done": row["pages_done"],
+                "pages_total": total,
+                "percent": round(row["pages_done"] / total * 100, 1) if total else None,
+            },
+            "attempts": row["attempts"],
+            "error": row["error"],
+            "created": row["created"],
+            "started": row["started"],
+            "finished": row["finished"],
+        }
+
+    def submit(self, content_hash, path, filename=None):
+        """提交任务，相同内容哈希的任务只保留一个
+
+        Returns:
+            tuple: (任务信息, 是否复用了已有任务)
+        """
+        def work(conn):
+            now = self.clock()
+            row = conn.execute("SELECT * FROM jobs WHERE content_hash = ?", (content_hash,)).fetchone()
+            if row is not None and row["status"] != "failed":
+                return row["id"], True
+            if row is not None:
+                # 失败的任务重新排队
+                conn.execute(
+                    "UPDATE jobs SET status = 'queued', path = ?, filename = ?, pages_done = 0, pages_total = NULL, "
+                    "attempts = 0, error = NULL, result = NULL, updated = ?, started = NULL, finished = NULL "
+                    "WHERE id = ?",
+                    (path, filename, now, row["id"]),
+                )
+                return row["id"], False
+            job_id = uuid.uuid4().hex
+            conn.execute(
+                "INSERT INTO jobs (id, content_hash, filename, path, status, created, updated) "
+                "VALUES (?, ?, ?, ?, 'queued', ?, ?)",
+                (job_id, content_hash, filename, path, now, now),
+            )
+            return job_id, False
+
+        job_id, deduplicated = self._transaction(work)
+        return self.get(job_id), deduplicated
+
+    def get(self, job_id):
+        """获取任务状态（不含结果），任务不存在时返回None"""
+        row = self._connect().execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row)
+
+    def result(self, job_id):
+        """获取已完成任务的结果，未完成时返回None"""
+        row = self._connect().execute(
+            "SELECT result FROM jobs WHERE id = ? AND status = 'done'", (job_id,)
+        ).fetchone()
+        return json.loads(row["result"]) if row is not None else None
+
+    def claim(self):
+        """取出最早排队的任务（以及工作进程退出后遗留的运行中任务）并标记为运行中
+
+        每次取出时执行次数加一，执行次数同时作为本次执行的令牌:
+        任务被其他工作进程重新取出后，原工作进程的进度、心跳和结果写入都会被忽略。
+
+        Returns:
+            dict: {"job_id", "path", "filename", "attempts"}，没有待执行任务时返回None
+        """
+        def work(conn):
+            now = self.clock()
+            while True:
+                row = conn.execute(
+                    "SELECT id, path, filename, status, attempts FROM jobs "
+                    "WHERE status = 'queued' OR (status = 'running' AND updated < ?) "
+                    "ORDER BY created LIMIT 1",
+                    (now - self.stale_after,),
+                ).fetchone()
+                if row is None:
+                    return None
+                if row["status"] == "running" and row["attempts"] >= self.max_attempts:
+                    conn.execute(
+                        "UPDATE jobs SET status = 'failed', error = ?, updated = ?, finished = ? WHERE id = ?",
+                        ("工作进程执行中断次数过多", now, now, row["id"]),
+                    )
+                    continue
+                conn.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, pages_done = 0, "
+                    "updated = ?, started = ? WHERE id = ?",
+                    (now, now, row["id"]),
+                )
+                return {"job_id": row["id"], "path": row["path"], "filename": row["filename"],
+                        "attempts": row["attempts"] + 1}
+
+        return self._transaction(work)
+
+    def _update_running(self, sql, params, job_id, attempts):
+        """只更新仍由本次执行持有的任务，返回是否更新成功"""
+        cursor = self._connect().execute(
+            sql + " WHERE id = ? AND attempts = ? AND status = 'running'", params + (job_id, attempts)
+        )
+        return cursor.rowcount > 0
+
+    def heartbeat(self, job_id, attempts):
+        """工作进程心跳，与页面进度无关，单页耗时很长时任务也不会被重新取出"""
+        return self._update_running("UPDATE jobs SET updated = ?", (self.clock(),), job_id, attempts)
+
+    def progress(self, job_id, attempts, pages_done, pages_total):
+        """更新逐页进度"""
+        return self._update_running(
+            "UPDATE jobs SET pages_done = ?, pages_total = ?, updated = ?",
+            (pages_done, pages_total, self.clock()), job_id, attempts,
+        )
+
+    def complete(self, job_id, attempts, result):
+        """保存结果，任务已被重新取出时忽略并返回False"""
+        now = self.clock()
+        return self._update_running(
+            "UPDATE jobs SET status = 'done', result = ?, error = NULL, updated = ?, finished = ?",
+            (json.dumps(result, ensure_ascii=False), now, now), job_id, attempts,
+        )
+
+    def fail(self, job_id, attempts, error):
+        """记录失败，任务已被重新取出时忽略并返回False"""
+        now = self.clock()
+        return self._update_running(
+            "UPDATE jobs SET status = 'failed', error = ?, updated = ?, finished = ?",
+            (error, now, now), job_id, attempts,
+        )
+
+    def _heartbeat_loop(self, job_id, attempts, stop):
+        try:
+            while not stop.wait(self.heartbeat_interval):
+                try:
+                    if not self.heartbeat(job_id, attempts):
+                        return
+                except sqlite3.Error as e:
+                    logger.warning(f"任务 {job_id} 心跳失败: {e}")
+        finally:
+            conn = getattr(self._local, "conn", None)
+            if conn is not None:
+                conn.close()
+
+    def run_next(self, handler):
+        """取出一个任务并执行
+
+        Args:
+            handler (callable): handler(文件路径, progress, 上传时的文件名) -> 可JSON序列化的结果
+
+        Returns:
+            bool: 是否执行了任务
+        """
+        job = self.claim()
+        if job is None:
+            return False
+        job_id, attempts = job["job_id"], job["attempts"]
+        stop = threading.Event()
+        beat = threading.Thread(target=self._heartbeat_loop, args=(job_id, attempts, stop),
+                                name=f"job-heartbeat-{job_id}", daemon=True)
+        beat.start()
+        try:
+            result = handler(job["path"], lambda done, total: self.progress(job_id, attempts, done, total),
+                             job["filename"])
+        except Exception as e:
+            logger.error(f"任务 {job_id} 执行失败: {str(e)}")
+            owned = self.fail(job_id, attempts, str(e))
+        else:
+            owned = self.complete(job_id, attempts, result)
+        finally:
+            stop.set()
+            beat.join()
+        if not owned:
+            logger.warning(f"任务 {job_id} 已被其他工作进程重新取出，丢弃本次执行结果")
+        return True
+
+    def active_paths(self):
+        """排队中和运行中任务的上传文件路径"""
+        rows = self._connect().execute(
+            "SELECT path FROM jobs WHERE status IN ('queued', 'running')"
+        ).fetchall()
+        return {row["path"] for row in rows}
+
+    def counts(self):
+        """各状态的任务数"""
+        rows = self._connect().execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = dict.fromkeys(JOB_STATUSES, 0)
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts
+
+
+def _worker_main(db_path, handler_path, store_options, poll_interval, stop_event):
+    """工作进程入口: 循环取出任务执行，没有任务时等待；主进程退出后随之退出"""
+    parent = os.getppid()
+    store = JobStore(db_path, **store_options)
+    handler = resolve_callable(handler_path)
+    while not stop_event.is_set() and os.getppid() == parent:
+        try:
+            if store.run_next(handler):
+                continue
+        except sqlite3.Error as e:
+            logger.warning(f"任务表访问失败: {e}")
+        stop_event.wait(poll_interval)
+
+
+class JobQueue:
+    """PDF提取任务队列: 保存上传文件、提交任务、管理工作进程"""
+
+    def __init__(self, store, upload_dir, handler, workers=2, poll_interval=0.5,
+                 max_upload_bytes=100 * 1024 * 1024, mp_context=None, upload_retention=86400,
+                 clock=time.time):
+        """初始化任务队列
+
+        Args:
+            store (JobStore): 任务表
+            upload_dir (str): 上传文件保存目录（文件名为内容哈希）
+            handler (str): 任务处理函数（"模块:函数"），工作进程中导入，调用方式见 JobStore.run_next
+            workers (int): 工作进程数
+            poll_interval (float): 工作进程空闲时检查新任务的间隔秒数
+            max_upload_bytes (int): 上传文件大小上限
+            mp_context (str): 进程启动方式 fork / spawn / forkserver，默认使用平台默认值
+            upload_retention (float): 上传文件的保留秒数，超过后除排队中和运行中任务的文件外全部删除，
+                0 表示不清理（已完成任务的结果保存在任务表中，不再需要原文件）
+            clock (callable): 时钟，与文件修改时间比较
+        """
+        self.store = store
+        self.upload_dir = upload_dir
+        self.handler = handler
+        self.workers = max(0, workers)
+        self.poll_interval = poll_interval
+        self.max_upload_bytes = max_upload_bytes
+        self.context = multiprocessing.get_context(mp_context) if mp_context else multiprocessing
+        self.upload_retention = upload_retention
+        self.clock = clock
+        self.last_sweep = None
+        self.swept = 0
+        self.processes = []
+        self.stop_event = None
+        self.submitted = 0
+        self.deduplicated = 0
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 JOB_QUEUE_CONFIG 创建，未开启时返回None"""
+        if not config.get('enabled'):
+            return None
+        store = JobStore(
+            config.get('db_path', 'data/cache/jobs.db'),
+            stale_after=config.get('stale_after', 300),
+            max_attempts=config.get('max_attempts', 2),
+            heartbeat_interval=config.get('heartbeat_interval'),
+        )
+        return cls(
+            store,
+            config.get('upload_dir', 'data/jobs/uploads'),
+            config.get('handler', 'app.pdf_tables:extract_job'),
+            workers=config.get('workers', 2),
+            poll_interval=config.get('poll_interval', 0.5),
+            max_upload_bytes=int(config.get('max_upload_mb', 100) * 1024 * 1024),
+            mp_context=config.get('mp_context'),
+            upload_retention=config.get('upload_retention', 86400),
+        )
+
+    async def save_upload(self, chunks, suffix=".pdf", directory=None):
+        """边接收边计算哈希写入临时文件，完成后按内容哈希命名
+
+        Args:
+            chunks: 异步字节块迭代器（如 request.stream()）
+            suffix (str): 文件扩展名
+            directory (str): 保存目录，默认为 upload_dir
+
+        Returns:
+            tuple: (内容哈希, 文件路径)
+
+        Raises:
+            UploadTooLarge: 超过大小限制
+            ValueError: 上传内容为空
+        """
+        directory = directory or self.upload_dir
+        os.makedirs(directory, exist_ok=True)
+        digest = hashlib.sha256()
+        size = 0
+        temp_path = os.path.join(directory, f".upload-{uuid.uuid4().hex}")
+        try:
+            with open(temp_path, "wb") as f:
+                async for chunk in chunks:
+                    size += len(chunk)
+                    if size > self.max_upload_bytes:
+                        raise UploadTooLarge(f"上传文件超过 {self.max_upload_bytes // (1024 * 1024)}MB")
+                    digest.update(chunk)
+                    f.write(chunk)
+            if size == 0:
+                raise ValueError("上传内容为空")
+            content_hash = digest.hexdigest()
+            path = os.path.join(directory, content_hash + suffix)
+            # 相同内容的文件已存在时直接复用
+            os.replace(temp_path, path)
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+        return content_hash, os.path.abspath(path)
+
+    async def save_stream_upload(self, chunks, suffix=".pdf"):
+        """保存流式解析的上传文件
+
+        每个请求使用 upload_dir 下单独的临时目录，与任务的上传文件互不影响；
+        解析结束后调用 remove_stream_upload 删除，遗留的目录由 sweep_uploads 清理。
+
+        Returns:
+            tuple: (内容哈希, 文件路径)
+        """
+        os.makedirs(self.upload_dir, exist_ok=True)
+        directory = tempfile.mkdtemp(prefix=".stream-", dir=self.upload_dir)
+        try:
+            return await self.save_upload(chunks, suffix, directory=directory)
+        except BaseException:
+            shutil.rmtree(directory, ignore_errors=True)
+            raise
+
+    @staticmethod
+    def remove_stream_upload(path):
+        """删除 save_stream_upload 保存的文件及其临时目录"""
+        shutil.rmtree(os.path.dirname(path), ignore_errors=True)
+
+    def sweep_uploads(self):
+        """删除超过保留期的上传文件和遗留的临时文件，排队中和运行中任务的文件保留
+
+        Returns:
+            int: 删除的文件和目录数
+        """
+        now = self.clock()
+        self.last_sweep = now
+        if not self.upload_retention or not os.path.isdir(self.upload_dir):
+            return 0
+        active = self.store.active_paths()
+        removed = 0
+        for name in os.listdir(self.upload_dir):
+            path = os.path.abspath(os.path.join(self.upload_dir, name))
+            try:
+                if path in active or now - os.path.getmtime(path) < self.upload_retention:
+                    continue
+                if os.path.isdir(path):
+                    shutil.rmtree(path)
+                else:
+                    os.remove(path)
+            except OSError:
+                continue
+            removed += 1
+        self.swept += removed
+        return removed
+
+    def _maybe_sweep(self):
+        # 每过保留期的十分之一最多清理一次
+        if not self.upload_retention:
+            return
+        if self.last_sweep is None or self.clock() - self.last_sweep >= self.upload_retention / 10:
+            self.sweep_uploads()
+
+    async def submit_upload(self, chunks, filename=None):
+        """保存上传的PDF并提交提取任务
+
+        Returns:
+            dict: 任务信息，deduplicated 表示复用了相同内容的已有任务
+        """
+        content_hash, path = await self.save_upload(chunks)
+        job, deduplicated = self.store.submit(content_hash, path, filename)
+        self.submitted += 1
+        if deduplicated:
+            self.deduplicated += 1
+        self.ensure_workers()
+        self._maybe_sweep()
+        return dict(job, deduplicated=deduplicated)
+
+    def start(self):
+        """启动工作进程"""
+        if self.stop_event is None:
+            self.stop_event = self.context.Event()
+        self.ensure_workers()
+        self._maybe_sweep()
+
+    def ensure_workers(self):
+        """补齐已退出的工作进程"""
+        if self.stop_event is None or self.stop_event.is_set():
+            return
+        self.processes = [process for process in self.processes if process.is_alive()]
+        store_options = {"stale_after": self.store.stale_after, "max_attempts": self.store.max_attempts,
+                         "heartbeat_interval": self.store.heartbeat_interval}
+        while len(self.processes) < self.workers:
+            process = self.context.Process(
+                target=_worker_main,
+                args=(self.store.path, self.handler, store_options, self.poll_interval, self.stop_event),
+                name=f"job-worker-{len(self.processes)}",
+                # 非守护进程: 处理函数可以再创建进程池按页并行提取
+                daemon=False,
+            )
+            process.start()
+            self.processes.append(process)
+
+    def stop(self, timeout=5.0):
+        """通知工作进程退出，正在执行的任务结束后退出，超时则强制终止（任务稍后重新排队）"""
+        if self.stop_event is None:
+            return
+        self.stop_event.set()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            process.join(max(0.0, deadline - time.monotonic()))
+            if process.is_alive():
+                process.terminate()
+                process.join(1.0)
+        self.processes = []
+        self.stop_event = None
+
+    def get_stats(self):
+        return {
+            "workers": self.workers,
+            "workers_alive": sum(1 for process in self.processes if process.is_alive()),
+            "submitted": self.submitted,
+            "deduplicated": self.deduplicated,
+            "uploads_removed": self.swept,
+            "jobs": self.store.counts(),
+        }
@@ -0,0 +1,258 @@
+# 泰迪杯项目 - 关键词倒排索引
+# 负责人: C成员
+# 功能: 为关键词问答引擎提供紧凑的段落存储、整数postings和检索打分
+# 更新日期: 2025-04-21
+
+import math
+from array import array
+
+# 支持的打分方式: count(命中关键词计数) / tfidf / bm25
+SCORING_MODES = ("count", "tfidf", "bm25")
+
+# BM25参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+
+class KnowledgeIndex:
+    """关键词倒排索引
+
+    段落文本只存储一次，按加入顺序分配整数ID；
+    每个关键词对应一个 array('I') 段落ID列表（postings）及同长度的词频列表，
+    列表顺序与段落首次被索引的顺序一致。
+    """
+
+    def __init__(self):
+        # 段落存储，下标即段落ID
+        self.paragraphs = []
+
+        # 倒排表，结构: {关键词: array('I', [段落ID, ...])}
+        self.postings = {}
+
+        # 词频表，与postings一一对应，结构: {关键词: array('I', [词频, ...])}
+        self.term_freqs = {}
+
+        # 段落长度（关键词个数），下标即段落ID
+        self.doc_lengths = array('I')
+
+        # 段落文本到ID的映射，用于O(1)去重
+        self._para_ids = {}
+
+        # 打分用的预计算统计量，索引变化后失效
+        self._stats = None
+
+    def add_paragraph(self, para, keywords):
+        """加入一个段落及其关键词
+
+        Args:
+            para (str): 段落文本
+            keywords (list): 段落关键词列表（可含重复）
+
+        Returns:
+            int: 段落ID；段落已存在时返回None
+        """
+        if para in self._para_ids:
+            # 相同文本的关键词完全一致，已在各postings中
+            return None
+
+        para_id = len(self.paragraphs)
+        self.paragraphs.append(para)
+        self._para_ids[para] = para_id
+        self.doc_lengths.append(len(keywords))
+
+        # 保序统计词频，同一段落在一个关键词下只记录一次
+        counts = {}
+        for keyword in keywords:
+            counts[keyword] = counts.get(keyword, 0) + 1
+
+        for keyword, tf in counts.items():
+            ids = self.postings.get(keyword)
+            if ids is None:
+                ids = self.postings[keyword] = array('I')
+                self.term_freqs[keyword] = array('I')
+            ids.append(para_id)
+            self.term_freqs[keyword].append(tf)
+
+        self._stats = None
+        return para_id
+
+    def get_postings(self, keyword):
+        """获取关键词的段落ID列表，不存在时返回空序列"""
+        return self.postings.get(keyword, ())
+
+    def get_term_freqs(self, keyword):
+        """获取关键词的词频列表，与 get_postings 一一对应"""
+        return self.term_freqs.get(keyword, ())
+
+    def get_paragraph(self, para_id):
+        """根据段落ID获取段落文本"""
+        return self.paragraphs[para_id]
+
+    @property
+    def keyword_count(self):
+        return len(self.postings)
+
+    @property
+    def paragraph_count(self):
+        return len(self.paragraphs)
+
+    def prepare_scoring(self):
+        """预计算IDF和段落长度归一化系数
+
+        加载完成后调用一次即可；若未调用，首次tfidf/bm25检索时自动计算。
+
+        Returns:
+            dict: 预计算的统计量
+        """
+        n_docs = len(self.doc_lengths)
+        avg_length = (sum(self.doc_lengths) / n_docs) if n_docs else 0.0
+
+        idf_bm25 = {}
+        idf_tfidf = {}
+        for keyword, ids in self.postings.items():
+            df = len(ids)
+            idf_bm25[keyword] = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+            idf_tfidf[keyword] = math.log((n_docs + 1) / (df + 1)) + 1
+
+        # BM25分母中的长度项 k1*(1-b+b*dl/avgdl)，以及TF-IDF的 1/sqrt(dl)
+        bm25_norms = array('d')
+        tfidf_norms = array('d')
+        for length in self.doc_lengths:
+            bm25_norms.append(BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) if avg_length else BM25_K1)
+            tfidf_norms.append(1 / math.sqrt(length) if length else 0.0)
+
+        self._stats = {
+            "n_docs": n_docs,
+            "avg_length": avg_length,
+            "idf_bm25": idf_bm25,
+            "idf_tfidf": idf_tfidf,
+            "bm25_norms": bm25_norms,
+            "tfidf_norms": tfidf_norms,
+        }
+        return self._stats
+
+    def score(self, keywords, scoring="count"):
+        """计算查询关键词命中段落的得分
+
+        Args:
+            keywords (list): 查询关键词列表
+            scoring (str): 打分方式，取值见 SCORING_MODES
+
+        Returns:
+            dict: {段落ID: 得分}，按段落首次命中的顺序排列
+        """
+        results = {}
+
+        if scoring == "count":
+            # 与旧版一致：查询中重复的关键词重复计数
+            for keyword in keywords:
+                for para_id in self.get_postings(keyword):
+                    results[para_id] = results.get(para_id, 0) + 1
+            return results
+
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"不支持的打分方式: {scoring}，可选: {', '.join(SCORING_MODES)}")
+
+        stats = self._stats or self.prepare_scoring()
+        if scoring == "bm25":
+            idf_table = stats["idf_bm25"]
+            norms = stats["bm25_norms"]
+            k1_plus_1 = BM25_K1 + 1
+            for keyword in dict.fromkeys(keywords):
+                idf = idf_table.get(keyword)
+                if idf is None:
+                    continue
+                for para_id, tf in zip(self.get_postings(keyword), self.get_term_freqs(keyword)):
+                    weight = idf * tf * k1_plus_1 / (tf + norms[para_id])
+                    results[para_id] = results.get(para_id, 0.0) + weight
+        else:
+            idf_table = stats["idf_tfidf"]
+            norms = stats["tfidf_norms"]
+            for keyword in dict.fromkeys(keywords):
+                idf = idf_table.get(keyword)
+                if idf is None:
+                    continue
+                for para_id, tf in zip(self.get_postings(keyword), self.get_term_freqs(keyword)):
+                    weight = (1 + math.log(tf)) * idf * norms[para_id]
+                    results[para_id] = results.get(para_id, 0.0) + weight
+
+        return results
+
+    def to_mapping(self):
+        """导出为 {关键词: [段落文本列表]} 结构（兼容旧版知识库格式）"""
+        paragraphs = self.paragraphs
+        return {
+            keyword: [paragraphs[para_id] for para_id in ids]
+            for keyword, ids in self.postings.items()
+        }
+
+    @classmethod
+    def merge(cls, parts):
+        """按顺序合并多个局部索引
+
+        结果与把各局部索引的段落依次 add_paragraph 到同一个索引完全一致：
+        段落ID按合并顺序重新分配，跨局部索引的重复段落只保留第一次出现。
+
+        Args:
+            parts (list): KnowledgeIndex 列表
+
+        Returns:
+            KnowledgeIndex: 合并后的新索引
+        """
+        merged = cls()
+        para_ids = merged._para_ids
+        for part in parts:
+            # 局部段落ID -> 合并后段落ID，重复段落记为-1
+            id_map = []
+            for para_id, para in enumerate(part.paragraphs):
+                if para in para_ids:
+                    id_map.append(-1)
+                    continue
+                new_id = len(merged.paragraphs)
+                merged.paragraphs.append(para)
+                merged.doc_lengths.append(part.doc_lengths[para_id])
+                para_ids[para] = new_id
+                id_map.append(new_id)
+
+            for keyword, ids in part.postings.items():
+                target_ids = merged.postings.get(keyword)
+                target_freqs = merged.term_freqs.get(keyword)
+                for para_id, tf in zip(ids, part.term_freqs[keyword]):
+                    new_id = id_map[para_id]
+                    if new_id < 0:
+                        continue
+                    if target_ids is None:
+                        target_ids = merged.postings[keyword] = array('I')
+                        target_freqs = merged.term_freqs[keyword] = array('I')
+                    target_ids.append(new_id)
+                    target_freqs.append(tf)
+        return merged
+
+    @classmethod
+    def from_mapping(cls, mapping):
+        """从 {关键词: [段落文本列表]} 结构构建索引
+
+        旧版格式不含词频，词频按1计，段落长度按其所属关键词个数计。
+
+        Args:
+            mapping (dict): 旧版知识库字典
+
+        Returns:
+            KnowledgeIndex: 新索引，各关键词下的段落顺序保持不变
+        """
+        index = cls()
+        para_ids = index._para_ids
+        for keyword, paras in mapping.items():
+            ids = index.postings.setdefault(keyword, array('I'))
+            freqs = index.term_freqs.setdefault(keyword, array('I'))
+            for para in paras:
+                para_id = para_ids.get(para)
+                if para_id is None:
+                    para_id = len(index.paragraphs)
+                    index.paragraphs.append(para)
+                    index.doc_lengths.append(0)
+                    para_ids[para] = para_id
+                ids.append(para_id)
+                freqs.append(1)
+                index.doc_lengths[para_id] += 1
+        return index
@@ -0,0 +1,279 @@
+# 泰迪杯项目 - 知识库二进制快照
+# 负责人: C成员
+# 功能: 将关键词倒排索引保存为带版本号的二进制快照，并通过mmap零拷贝加载
+# 更新日期: 2025-04-22
+#
+# 文件布局（小端序）:
+#   文件头: 魔数、版本号、段落数、关键词数、平均段落长度、BM25参数
+#   段表:   每个数据段的 (偏移, 长度)
+#   数据段: 段落偏移表 + 段落字符串表、关键词偏移表 + 关键词字符串表、
+#           postings偏移表 + postings + 词频、段落长度、预计算的IDF和长度归一化系数
+# 每个数据段按8字节对齐，加载时直接 memoryview.cast 为数组，多个进程映射同一文件时共享物理页。
+
+import os
+import sys
+import mmap
+import struct
+from array import array
+from collections.abc import Sequence
+
+try:
+    from .knowledge_index import KnowledgeIndex, BM25_K1, BM25_B
+except ImportError:
+    from knowledge_index import KnowledgeIndex, BM25_K1, BM25_B
+
+SNAPSHOT_MAGIC = b"KQASNAP\x00"
+SNAPSHOT_VERSION = 1
+SNAPSHOT_SUFFIX = ".kqa"
+
+# 数据段顺序及元素类型
+SECTIONS = (
+    ("para_offsets", "Q"),
+    ("para_blob", None),
+    ("keyword_offsets", "Q"),
+    ("keyword_blob", None),
+    ("posting_offsets", "Q"),
+    ("postings", "I"),
+    ("term_freqs", "I"),
+    ("doc_lengths", "I"),
+    ("idf_bm25", "d"),
+    ("idf_tfidf", "d"),
+    ("bm25_norms", "d"),
+    ("tfidf_norms", "d"),
+)
+
+# 魔数, 版本号, 保留位, 段落数, 关键词数, 平均段落长度, k1, b
+_HEADER = struct.Struct("<8sHHIIddd")
+_SECTION_ENTRY = struct.Struct("<QQ")
+_ALIGN = 8
+
+_NEEDS_BYTESWAP = sys.byteorder != "little"
+
+
+class SnapshotError(Exception):
+    """快照文件格式错误或版本不兼容"""
+
+
+def is_snapshot(filepath):
+    """判断文件是否为二进制快照"""
+    try:
+        with open(filepath, "rb") as f:
+            return f.read(len(SNAPSHOT_MAGIC)) == SNAPSHOT_MAGIC
+    except OSError:
+        return False
+
+
+def _to_bytes(typecode, values):
+    data = array(typecode, values)
+    if _NEEDS_BYTESWAP:
+        data.byteswap()
+    return data.tobytes()
+
+
+def _encode_strings(strings):
+    """编码字符串表，返回 (偏移表字节, 字符串表字节)"""
+    offsets = array("Q", [0])
+    chunks = []
+    position = 0
+    for text in strings:
+        data = text.encode("utf-8")
+        chunks.append(data)
+        position += len(data)
+        offsets.append(position)
+    return _to_bytes("Q", offsets), b"".join(chunks)
+
+
+def write_snapshot(index, filepath):
+    """将索引写入二进制快照
+
+    先写临时文件再原子替换，正在映射旧文件的进程不受影响。
+
+    Args:
+        index (KnowledgeIndex): 倒排索引
+        filepath (str): 快照路径
+    """
+    stats = index.prepare_scoring()
+    keywords = list(index.postings)
+
+    posting_offsets = array("Q", [0])
+    postings = array("I")
+    term_freqs = array("I")
+    for keyword in keywords:
+        postings.extend(index.get_postings(keyword))
+        term_freqs.extend(index.get_term_freqs(keyword))
+        posting_offsets.append(len(postings))
+
+    para_offsets, para_blob = _encode_strings(index.paragraphs)
+    keyword_offsets, keyword_blob = _encode_strings(keywords)
+
+    payloads = {
+        "para_offsets": para_offsets,
+        "para_blob": para_blob,
+        "keyword_offsets": keyword_offsets,
+        "keyword_blob": keyword_blob,
+        "posting_offsets": _to_bytes("Q", posting_offsets),
+        "postings": _to_bytes("I", postings),
+        "term_freqs": _to_bytes("I", term_freqs),
+        "doc_lengths": _to_bytes("I", index.doc_lengths),
+        "idf_bm25": _to_bytes("d", [stats["idf_bm25"][k] for k in keywords]),
+        "idf_tfidf": _to_bytes("d", [stats["idf_tfidf"][k] for k in keywords]),
+        "bm25_norms": _to_bytes("d", stats["bm25_norms"]),
+        "tfidf_norms": _to_bytes("d", stats["tfidf_norms"]),
+    }
+
+    header = _HEADER.pack(
+        SNAPSHOT_MAGIC, SNAPSHOT_VERSION, 0,
+        index.paragraph_count, len(keywords),
+        stats["avg_length"], BM25_K1, BM25_B,
+    )
+    position = _HEADER.size + _SECTION_ENTRY.size * len(SECTIONS)
+
+    entries = []
+    for name, _ in SECTIONS:
+        position += -position % _ALIGN
+        entries.append((position, len(payloads[name])))
+        position += len(payloads[name])
+
+    directory = os.path.dirname(os.path.abspath(filepath))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{filepath}.tmp{os.getpid()}"
+    with open(tmp_path, "wb") as f:
+        f.write(header)
+        for offset, length in entries:
+            f.write(_SECTION_ENTRY.pack(offset, length))
+        for (name, _), (offset, length) in zip(SECTIONS, entries):
+            f.write(b"\x00" * (offset - f.tell()))
+            f.write(payloads[name])
+    os.replace(tmp_path, filepath)
+
+
+class _StringTable(Sequence):
+    """mmap上的只读字符串表，按需解码"""
+
+    def __init__(self, buffer, offsets):
+        self._buffer = buffer
+        self._offsets = offsets
+
+    def __len__(self):
+        return len(self._offsets) - 1
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += len(self)
+        return str(self._buffer[self._offsets[i]:self._offsets[i + 1]], "utf-8")
+
+
+class SnapshotIndex(KnowledgeIndex):
+    """基于mmap的只读倒排索引
+
+    与 KnowledgeIndex 提供相同的检索接口；段落文本按需解码，
+    postings、词频等数组直接引用映射内存，不做拷贝。
+    """
+
+    def __init__(self, filepath):
+        self.filepath = filepath
+        self._file = open(filepath, "rb")
+        try:
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # 空文件无法映射
+            self._file.close()
+            raise SnapshotError(f"快照文件为空: {filepath}")
+
+        try:
+            self._load()
+        except Exception:
+            self.close()
+            raise
+
+    def _load(self):
+        mm = self._mmap
+        if len(mm) < _HEADER.size:
+            raise SnapshotError(f"快照文件不完整: {self.filepath}")
+
+        magic, version, _, n_docs, n_keywords, avg_length, k1, b = _HEADER.unpack_from(mm, 0)
+        if magic != SNAPSHOT_MAGIC:
+            raise SnapshotError(f"不是知识库快照文件: {self.filepath}")
+        if version != SNAPSHOT_VERSION:
+            raise SnapshotError(f"不支持的快照版本: {version}（当前支持 {SNAPSHOT_VERSION}）")
+
+        view = memoryview(mm)
+        sections = {}
+        position = _HEADER.size
+        for name, typecode in SECTIONS:
+            offset, length = _SECTION_ENTRY.unpack_from(mm, position)
+            position += _SECTION_ENTRY.size
+            if offset + length > len(mm):
+                raise SnapshotError(f"快照数据段越界: {name}")
+            if typecode is None:
+                sections[name] = (offset, length)
+            elif _NEEDS_BYTESWAP:
+                data = array(typecode)
+                data.frombytes(mm[offset:offset + length])
+                data.byteswap()
+                sections[name] = data
+            else:
+                sections[name] = view[offset:offset + length].cast(typecode)
+
+        para_start, para_length = sections["para_blob"]
+        self.paragraphs = _StringTable(view[para_start:para_start + para_length],
+                                       sections["para_offsets"])
+        keyword_start, keyword_length = sections["keyword_blob"]
+        keywords = list(_StringTable(view[keyword_start:keyword_start + keyword_length],
+                                     sections["keyword_offsets"]))
+        if len(keywords) != n_keywords or len(self.paragraphs) != n_docs:
+            raise SnapshotError(f"快照计数与数据段不一致: {self.filepath}")
+
+        posting_offsets = sections["posting_offsets"]
+        postings = sections["postings"]
+        term_freqs = sections["term_freqs"]
+        self.postings = {}
+        self.term_freqs = {}
+        for i, keyword in enumerate(keywords):
+            start, end = posting_offsets[i], posting_offsets[i + 1]
+            self.postings[keyword] = postings[start:end]
+            self.term_freqs[keyword] = term_freqs[start:end]
+
+        self.doc_lengths = sections["doc_lengths"]
+        self._para_ids = None
+        self._stats = None
+
+        # 打分参数一致时直接使用快照中的预计算结果
+        if (k1, b) == (BM25_K1, BM25_B) and n_docs == len(self.doc_lengths):
+            self._stats = {
+                "n_docs": n_docs,
+                "avg_length": avg_length,
+                "idf_bm25": dict(zip(keywords, sections["idf_bm25"])),
+                "idf_tfidf": dict(zip(keywords, sections["idf_tfidf"])),
+                "bm25_norms": sections["bm25_norms"],
+                "tfidf_norms": sections["tfidf_norms"],
+            }
+
+    def add_paragraph(self, para, keywords):
+        raise TypeError("快照索引为只读，不能加入新段落")
+
+    def close(self):
+        """释放映射，之后不能再检索"""
+        self.postings = {}
+        self.term_freqs = {}
+        self.paragraphs = ()
+        self.doc_lengths = array("I")
+        self._stats = None
+        try:
+            self._mmap.close()
+        except (BufferError, ValueError):
+            # 仍有外部引用的memoryview时交由垃圾回收释放
+            pass
+        self._file.close()
+
+
+def load_snapshot(filepath):
+    """加载二进制快照
+
+    Args:
+        filepath (str): 快照路径
+
+    Returns:
+        SnapshotIndex: 只读索引
+    """
+    return SnapshotIndex(filepath)
@@ -0,0 +1,255 @@
+"""
+泰迪杯项目 - 请求延迟直方图
+功能: 以固定桶（HDR风格的对数-线性分桶）按路由记录请求延迟，
+      提供p50/p95/p99/max及滑动窗口请求速率，内存占用与流量无关；
+      支持导出为JSON指标和Prometheus文本格式
+"""
+
+import math
+import time
+from array import array
+
+# 每个2的幂区间内的子桶数为 2^(SUB_BUCKET_BITS-1)，相对误差约 1/2^(SUB_BUCKET_BITS-1)
+SUB_BUCKET_BITS = 6
+# 可记录的最大延迟（微秒），超出部分计入最后一个桶
+MAX_TRACKABLE_US = 120 * 1000 * 1000
+
+# Prometheus导出时使用的粗粒度桶上界（秒）
+PROMETHEUS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+_SUB_BUCKET_COUNT = 1 << SUB_BUCKET_BITS
+_HALF_COUNT = _SUB_BUCKET_COUNT >> 1
+
+
+def _bucket_index(value):
+    """微秒值 -> 桶下标"""
+    if value < _SUB_BUCKET_COUNT:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS
+    mantissa = value >> shift
+    return _SUB_BUCKET_COUNT + (shift - 1) * _HALF_COUNT + (mantissa - _HALF_COUNT)
+
+
+def _bucket_upper(index):
+    """桶下标 -> 桶内最大微秒值"""
+    if index < _SUB_BUCKET_COUNT:
+        return index
+    offset = index - _SUB_BUCKET_COUNT
+    shift = offset // _HALF_COUNT + 1
+    mantissa = offset % _HALF_COUNT + _HALF_COUNT
+    return ((mantissa + 1) << shift) - 1
+
+
+_BUCKET_COUNT = _bucket_index(MAX_TRACKABLE_US) + 1
+
+
+class LatencyHistogram:
+    """固定桶延迟直方图（单位: 微秒）"""
+
+    __slots__ = ("counts", "total", "sum_us", "min_us", "max_us")
+
+    def __init__(self):
+        self.counts = array("Q", bytes(8 * _BUCKET_COUNT))
+        self.total = 0
+        self.sum_us = 0
+        self.min_us = None
+        self.max_us = 0
+
+    def record(self, value_us):
+        """记录一次延迟"""
+        value_us = max(0, int(value_us))
+        self.counts[_bucket_index(min(value_us, MAX_TRACKABLE_US))] += 1
+        self.total += 1
+        self.sum_us += value_us
+        if self.min_us is None or value_us < self.min_us:
+            self.min_us = value_us
+        if value_us > self.max_us:
+            self.max_us = value_us
+
+    def percentiles(self, quantiles):
+        """计算多个分位数（微秒），一次遍历完成
+
+        Args:
+            quantiles (list): 升序排列的分位数，如 [0.5, 0.95, 0.99]
+
+        Returns:
+            list: 与输入对应的延迟值
+        """
+        if not self.total:
+            return [0] * len(quantiles)
+        targets = [max(1, math.ceil(q * self.total)) for q in quantiles]
+        results = []
+        seen = 0
+        position = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(targets) and seen >= targets[position]:
+                # 桶上界不超过实际观测到的最大值
+                results.append(min(_bucket_upper(index), self.max_us))
+                position += 1
+            if position == len(targets):
+                break
+        return results
+
+    def count_at_or_below(self, value_us):
+        """统计不超过给定延迟的请求数（按桶上界近似）"""
+        last = _bucket_index(min(int(value_us), MAX_TRACKABLE_US))
+        if _bucket_upper(last) > value_us:
+            last -= 1
+        return sum(self.counts[:last + 1]) if last >= 0 else 0
+
+    def reset(self):
+        self.__init__()
+
+
+class RateWindow:
+    """按秒计数的环形缓冲区，用于计算滑动窗口请求速率"""
+
+    __slots__ = ("size", "counts", "seconds", "clock")
+
+    def __init__(self, size=61, clock=time.monotonic):
+        self.size = size
+        self.counts = array("Q", bytes(8 * size))
+        self.seconds = array("q", [-1] * size)
+        self.clock = clock
+
+    def record(self):
+        now = int(self.clock())
+        slot = now % self.size
+        if self.seconds[slot] != now:
+            self.seconds[slot] = now
+            self.counts[slot] = 0
+        self.counts[slot] += 1
+
+    def rate(self, window):
+        """最近window秒（不含当前未结束的一秒）的平均每秒请求数"""
+        window = min(window, self.size - 1)
+        now = int(self.clock())
+        total = 0
+        for second in range(now - window, now):
+            slot = second % self.size
+            if self.seconds[slot] == second:
+                total += self.counts[slot]
+        return total / window if window else 0.0
+
+
+class RouteLatency:
+    """单个路由的延迟与速率统计"""
+
+    __slots__ = ("histogram", "rate", "errors")
+
+    def __init__(self, clock=time.monotonic):
+        self.histogram = LatencyHistogram()
+        self.rate = RateWindow(clock=clock)
+        self.errors = 0
+
+
+class LatencyRegistry:
+    """按路由汇总的延迟统计
+
+    路由数量有上限，超出后归入 "OTHER"，避免带路径参数的URL导致内存无限增长；
+    没有匹配到任何路由的请求（404）统一记为 "UNMATCHED"，随机路径不会占用路由名额。
+    """
+
+    OVERFLOW_ROUTE = "OTHER"
+    UNMATCHED_ROUTE = "UNMATCHED"
+
+    def __init__(self, max_routes=200, clock=time.monotonic):
+        self.max_routes = max_routes
+        self.clock = clock
+        self.routes = {}
+        self.started = clock()
+
+    @classmethod
+    def route_name(cls, scope):
+        """按匹配到的路由模板生成路由名称，如 "GET /api/tables/{table_id}"
+
+        Args:
+            scope (dict): ASGI请求scope（路由匹配后 scope["route"] 为匹配到的路由）
+        """
+        path = getattr(scope.get("route"), "path", None)
+        return f"{scope.get('method')} {path}" if path else cls.UNMATCHED_ROUTE
+
+    def _route(self, route):
+        stats = self.routes.get(route)
+        if stats is None:
+            if len(self.routes) >= self.max_routes:
+                route = self.OVERFLOW_ROUTE
+                stats = self.routes.get(route)
+            if stats is None:
+                stats = self.routes[route] = RouteLatency(self.clock)
+        return stats
+
+    def record(self, route, duration_ns, success=True):
+        """记录一次请求
+
+        Args:
+            route (str): 路由名称，如 "GET /api/tables"
+            duration_ns (int): 处理耗时（纳秒，来自 time.perf_counter_ns）
+            success (bool): 请求是否成功
+        """
+        stats = self._route(route)
+        stats.histogram.record(duration_ns // 1000)
+        stats.rate.record()
+        if not success:
+            stats.errors += 1
+
+    def snapshot(self):
+        """导出各路由的延迟分位数与请求速率（毫秒）"""
+        routes = {}
+        for route, stats in sorted(self.routes.items()):
+            histogram = stats.histogram
+            p50, p95, p99 = histogram.percentiles([0.5, 0.95, 0.99])
+            routes[route] = {
+                "count": histogram.total,
+                "errors": stats.errors,
+                "mean_ms": round(histogram.sum_us / histogram.total / 1000, 3) if histogram.total else 0.0,
+                "p50_ms": round(p50 / 1000, 3),
+                "p95_ms": round(p95 / 1000, 3),
+                "p99_ms": round(p99 / 1000, 3),
+                "max_ms": round(histogram.max_us / 1000, 3),
+                "rate_10s": round(stats.rate.rate(10), 3),
+                "rate_60s": round(stats.rate.rate(60), 3),
+            }
+        return {
+            "uptime_seconds": round(self.clock() - self.started, 1),
+            "routes": routes,
+        }
+
+    def render_prometheus(self, prefix="teddy_http"):
+        """导出为Prometheus文本格式"""
+        lines = [
+            f"# HELP {prefix}_request_duration_seconds HTTP request latency",
+            f"# TYPE {prefix}_request_duration_seconds histogram",
+        ]
+        quantile_lines = [
+            f"# HELP {prefix}_request_duration_quantile_seconds HTTP request latency quantiles",
+            f"# TYPE {prefix}_request_duration_quantile_seconds gauge",
+        ]
+        error_lines = [
+            f"# HELP {prefix}_request_errors_total Failed HTTP requests",
+            f"# TYPE {prefix}_request_errors_total counter",
+        ]
+        for route, stats in sorted(self.routes.items()):
+            label = 'route="%s"' % route.replace("\\", "\\\\").replace('"', '\\"')
+            histogram = stats.histogram
+            for bound in PROMETHEUS_BUCKETS:
+                count = histogram.count_at_or_below(bound * 1000 * 1000)
+                lines.append(f'{prefix}_request_duration_seconds_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{prefix}_request_duration_seconds_bucket{{{label},le="+Inf"}} {histogram.total}')
+            lines.append(f"{prefix}_request_duration_seconds_sum{{{label}}} {histogram.sum_us / 1e6}")
+            lines.append(f"{prefix}_request_duration_seconds_count{{{label}}} {histogram.total}")
+
+            quantiles = (0.5, 0.95, 0.99)
+            for quantile, value in zip(quantiles, histogram.percentiles(list(quantiles))):
+                quantile_lines.append(
+                    f'{prefix}_request_duration_quantile_seconds{{{label},quantile="{quantile}"}} {value / 1e6}'
+                )
+            error_lines.append(f"{prefix}_request_errors_total{{{label}}} {stats.errors}")
+        return "\n".join(lines + quantile_lines + error_lines) + "\n"
+
+    def reset(self):
+        self.routes.clear()
+        self.started = self.clock()
@@ -0,0 +1,174 @@
+"""
+泰迪杯项目 - 路由延迟加载
+功能: 路由模块（及其间接依赖的pandas、绘图库等）不在启动时导入，
+      首个需要它的请求到达时在线程池中导入并注册到应用，服务可以立即绑定端口
+"""
+
+import asyncio
+import importlib
+import logging
+import time
+
+from starlette.routing import Match
+
+logger = logging.getLogger(__name__)
+
+
+class LazyRouter:
+    """待加载的路由模块"""
+
+    __slots__ = ("module", "attr", "prefix", "tags", "paths", "optional",
+                 "status", "duration", "error")
+
+    def __init__(self, module, attr="router", prefix="", tags=None, paths=(), optional=False):
+        self.module = module
+        self.attr = attr
+        self.prefix = prefix
+        self.tags = list(tags or [])
+        self.paths = tuple(paths)
+        self.optional = optional
+        self.status = "pending"
+        self.duration = None
+        self.error = None
+
+    def wants(self, path):
+        return bool(self.paths) and path.startswith(self.paths)
+
+    def to_dict(self):
+        return {
+            "status": self.status,
+            "prefix": self.prefix,
+            "paths": list(self.paths),
+            "duration": round(self.duration, 3) if self.duration is not None else None,
+            "error": self.error,
+        }
+
+
+class LazyRouterRegistry:
+    """延迟加载的路由集合
+
+    - 声明了 paths 的路由在请求路径匹配其前缀时加载；
+    - 请求没有匹配到任何已注册路由时加载全部待加载路由（paths 只是优化，不必列全）；
+    - 访问 load_all_paths（如 /docs）时加载全部路由；
+    - 导入在线程池中进行，注册路由回到事件循环线程执行。
+    """
+
+    def __init__(self, app, load_all_paths=()):
+        self.app = app
+        self.load_all_paths = frozenset(load_all_paths)
+        self.routers = {}
+        self.listeners = []
+        self._lock = None
+
+    @classmethod
+    def from_config(cls, app, config):
+        """根据 LAZY_IMPORT_CONFIG 创建"""
+        registry = cls(app, config.get('load_all_paths', ()))
+        for entry in config.get('routers', []):
+            registry.add(**entry)
+        return registry
+
+    def add(self, module, attr="router", prefix="", tags=None, paths=(), optional=False):
+        """登记路由模块
+
+        Args:
+            module (str): 模块路径，如 "app.routers.qa_router"
+            attr (str): 模块中的APIRouter属性名
+            prefix (str): 注册时的路径前缀
+            tags (list): OpenAPI标签
+            paths (list): 触发加载的请求路径前缀
+            optional (bool): 模块不存在时是否忽略（不记为错误）
+        """
+        self.routers[module] = LazyRouter(module, attr, prefix, tags, paths, optional)
+
+    def on_load(self, callback):
+        """注册路由加载后的回调，参数为模块路径"""
+        self.listeners.append(callback)
+
+    @property
+    def pending(self):
+        return [router for router in self.routers.values() if router.status == "pending"]
+
+    def _matches_existing_route(self, scope):
+        for route in self.app.router.routes:
+            match, _ = route.matches(scope)
+            if match == Match.FULL:
+                return True
+        return False
+
+    def _select(self, scope):
+        """选出当前请求需要的待加载路由"""
+        pending = self.pending
+        path = scope["path"]
+        if path in self.load_all_paths:
+            return pending
+        wanted = [router for router in pending if router.wants(path)]
+        if wanted:
+            return wanted
+        if not self._matches_existing_route(scope):
+            return pending
+        return []
+
+    def _finish(self, router, start, module=None, error=None):
+        """在事件循环线程（或启动时的主线程）中注册路由并记录结果"""
+        if error is None:
+            try:
+                self.app.include_router(getattr(module, router.attr), prefix=router.prefix, tags=router.tags)
+                router.status = "loaded"
+            except Exception as e:
+                error = e
+        if error is not None:
+            optional_missing = router.optional and isinstance(error, ImportError)
+            router.status = "unavailable" if optional_missing else "failed"
+            router.error = str(error)
+        router.duration = time.perf_counter() - start
+
+        if router.status == "loaded":
+            logger.info(f"路由模块 {router.module} 已加载，耗时 {router.duration:.2f}秒")
+            # 新路由需要重新生成OpenAPI文档
+            self.app.openapi_schema = None
+            for callback in self.listeners:
+                callback(router.module)
+        elif router.status == "failed":
+            logger.error(f"路由模块 {router.module} 加载失败: {router.error}")
+
+    async def _load(self, routers):
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            for router in routers:
+                if router.status != "pending":
+                    continue
+                start = time.perf_counter()
+                try:
+                    module = await asyncio.to_thread(importlib.import_module, router.module)
+                except Exception as e:
+                    self._finish(router, start, error=e)
+                else:
+                    self._finish(router, start, module)
+
+    def load_now(self):
+        """同步导入并注册全部待加载路由（关闭延迟加载时在启动阶段调用）"""
+        for router in self.pending:
+            start = time.perf_counter()
+            try:
+                module = importlib.import_module(router.module)
+            except Exception as e:
+                self._finish(router, start, error=e)
+            else:
+                self._finish(router, start, module)
+
+    async def ensure_for_request(self, scope):
+        """加载当前请求所需的路由（已全部加载时直接返回）"""
+        if not self.pending:
+            return
+        routers = self._select(scope)
+        if routers:
+            await self._load(routers)
+
+    async def load_all(self):
+        """加载全部待加载的路由（后台预热或文档页面使用）"""
+        await self._load(self.pending)
+
+    def status(self):
+        return {module: router.to_dict() for module, router in self.routers.items()}
@@ -18,6 +18,7 @@ import logging
 import json
 import uuid
 import shutil
+import tempfile
 from pathlib import Path
 import asyncio
 from contextlib import asynccontextmanager
@@ -26,6 +27,11 @@ from contextlib import asynccontextmanager
 PROJECT_DIR = Path(__file__).parent.parent.absolute()
 sys.path.append(str(PROJECT_DIR))
 
+# 启动分析模式（STARTUP_PROFILE=1）: 记录之后每个模块的导入耗时，需在导入其他依赖之前开启
+from app.config import STARTUP_MODES
+from app.startup_profiler import ImportProfiler
+import_profiler = ImportProfiler.from_env(STARTUP_MODES['profile']['env_var'], STARTUP_MODES['profile']['value'])
+
 # 读取teddy_config.txt中的端口配置
 TEDDY_CONFIG_FILE = os.path.join(PROJECT_DIR, "teddy_config.txt")
 DEFAULT_PORT = 53085  # 与teddy_server.py中的默认端口保持一致
@@ -43,32 +49,42 @@ def read_port_from_config():
     return DEFAULT_PORT
 
 # 导入依赖模块
-from fastapi import FastAPI, Request, Response, Depends, HTTPException, status
+from fastapi import FastAPI, Request, Response, Depends, HTTPException, Query, status
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, RedirectResponse
+from fastapi.responses import HTMLResponse, FileResponse, JSONResponse, RedirectResponse, PlainTextResponse
 from fastapi.templating import Jinja2Templates
+from starlette.background import BackgroundTask
 import uvicorn
 from starlette.exceptions import HTTPException as StarletteHTTPException
 
-# 导入内部模块
-from app.routers import qa_router, table_router, ui_router, session_router
+# 导入内部模块（路由模块延迟加载，见 LAZY_IMPORT_CONFIG）
 from app.core.config import get_app_config
-
-# 尝试导入改进后的会话API
-try:
-    from app.api import session_router as api_session_router
-    HAS_IMPROVED_SESSION_API = True
-except ImportError:
-    HAS_IMPROVED_SESSION_API = False
-
-# 尝试导入知识图谱API
+from app.config import (
+    API_CONFIG, ADMISSION_CONFIG, RESPONSE_CACHE_CONFIG, TRACING_CONFIG, COMPONENT_LOADING, LAZY_IMPORT_CONFIG,
+    EXECUTOR_CONFIG, JOB_QUEUE_CONFIG, EXTRACTION_CACHE_CONFIG, TABLE_STORE_CONFIG, PRELOAD_CONFIG
+)
+from app.response_cache import ResponseCache
+from app.latency_metrics import LatencyRegistry
+from app.component_loader import ComponentLoader
+from app.request_tracing import SlowTraceLog, start_trace, finish_trace, instrument_targets
+from app.lazy_routers import LazyRouterRegistry
+from app.rate_limiter import RateLimiter
+from app.admission_control import AdmissionController
+from app.executors import ExecutorRegistry, ExecutorBusy, ClientDisconnected
+from app.job_queue import JobQueue, UploadTooLarge
+from app.extraction_cache import get_extraction_cache, install as install_extraction_cache
+from app.table_streaming import negotiate_format, table_stream_response
+from app.table_store import get_table_store
+from app.table_query import TableQueryEngine, QueryError, parse_filters, parse_sort
+from app.table_export import ExportError, MEDIA_TYPES as EXPORT_MEDIA_TYPES, export_table, export_catalog
+
+# 导入监控模块
 try:
-    from app.api.knowledge_graph import router as knowledge_graph_router
-    HAS_KNOWLEDGE_GRAPH_API = True
+    # 导入简化版监控模块
+    from app.core.simple_monitor import SimpleMonitor
+    monitor = SimpleMonitor()
+    USE_SIMPLE_MONITOR = True
 except ImportError:
-    HAS_KNOWLEDGE_GRAPH_API = False
-    knowledge_graph_router = None
-
     # 如果简化版监控不可用，使用传统监控
     from app.core.monitoring import (
         ResponseTimeTracker, init_monitoring, get_system_info,
@@ -76,22 +92,6 @@ except ImportError:
         register_component_health
     )
     USE_SIMPLE_MONITOR = False
-else:
-    # 导入简化版监控模块
-    from app.core.simple_monitor import SimpleMonitor
-    monitor = SimpleMonitor()
-    USE_SIMPLE_MONITOR = True
-
-# 导入优化的快速启动模块（新增）
-try:
-    from app.core.fast_starter import (
-        create_background_loader, get_lightweight_response, 
-        is_components_loaded, get_loading_status
-    )
-    USE_FAST_STARTER = True
-except ImportError:
-    from app.core.component_loader import load_components_async
-    USE_FAST_STARTER = False
 
 # 获取配置
 app_config = get_app_config()
@@ -100,106 +100,178 @@ app_config = get_app_config()
 components_loaded = False
 
 # 响应缓存
-response_cache = {}
+response_cache = ResponseCache.from_config(RESPONSE_CACHE_CONFIG)
+
+# 按路由的延迟直方图
+latency_registry = LatencyRegistry()
+
+# 令牌桶限流（API_CONFIG['rate_limit']，未开启时为None）
+rate_limiter = RateLimiter.from_config(API_CONFIG.get('rate_limit', {}))
+
+# 准入控制（ADMISSION_CONFIG，未开启时为None）
+admission_controller = AdmissionController.from_config(ADMISSION_CONFIG)
+
+# 同步任务执行器: 问答检索、答案评估、PDF表格提取等在线程池/进程池中执行，不阻塞事件循环
+executors = ExecutorRegistry.from_config(EXECUTOR_CONFIG)
+
+# PDF表格提取任务队列（JOB_QUEUE_CONFIG，未开启时为None）
+job_queue = JobQueue.from_config(JOB_QUEUE_CONFIG)
+
+# 列式表格存储（TABLE_STORE_CONFIG，未开启时为None；数据库连接在首次使用时按进程打开）
+table_store = get_table_store()
+table_query = TableQueryEngine(
+    table_store,
+    max_page_size=TABLE_STORE_CONFIG.get('max_page_size', 500),
+    default_page_size=TABLE_STORE_CONFIG.get('default_page_size', 50),
+) if table_store is not None else None
+
+# 分阶段计时: 最慢的追踪记录
+slow_traces = SlowTraceLog(TRACING_CONFIG.get('slow_trace_capacity', 50))
+TRACED_ROUTES = tuple(TRACING_CONFIG.get('routes', ())) if TRACING_CONFIG.get('enabled', True) else ()
+
+# 组件依赖加载器（依赖关系、超时与重试见 COMPONENT_LOADING）
+component_loader = ComponentLoader.from_config(COMPONENT_LOADING)
 
 # 定义应用生命周期管理
 
-# 组件加载函数
-async def load_components_async(component_loaders=None):
-    """组件异步加载函数"""
-    if component_loaders:
-        print("正在加载组件...")
-        for name, loader in component_loaders.items():
-            print(f"加载组件: {name}")
-            success = await loader()
-            print(f"组件 {name} 加载{'成功' if success else '失败'}")
-    else:
-        print("无组件需要加载")
-    return True
+# 组件加载函数（普通函数，由组件加载器放到线程池中执行，不阻塞事件循环）
+def load_data_processing():
+    """加载PDF处理模块"""
+    try:
+        # 正确导入extract_tables函数
+        from app.data_processing import extract_tables, extract_text
+        # 表格、文本、元数据提取结果按文件内容缓存，相同的PDF只解析一次
+        if get_extraction_cache() is not None:
+            install_extraction_cache(EXTRACTION_CACHE_CONFIG.get('targets', {}))
+        print("✅ PDF处理模块加载成功")
+        return True
+    except Exception as e:
+        print(f"❌ PDF处理模块加载失败: {str(e)}")
+        traceback.print_exc()  # 添加堆栈跟踪，方便调试
+        return False
+
+def load_shared_components():
+    """加载共享组件（分词词典、索引快照），fork模式下已在主进程加载，这里直接复用"""
+    try:
+        from app.preload import warm_start
+        warm_start()
+        print("✅ 共享组件预加载完成")
+        return True
+    except Exception as e:
+        print(f"❌ 共享组件预加载失败: {str(e)}")
+        return False
+
+def load_qa_engine():
+    """加载问答引擎"""
+    try:
+        from app.qa import engine
+        print("✅ 问答引擎加载成功")
+        return True
+    except Exception as e:
+        print(f"❌ 问答引擎加载失败: {str(e)}")
+        return False
+
+def load_knowledge_graph():
+    """加载知识图谱模块"""
+    try:
+        from app.models.knowledge_graph import KnowledgeGraph
+        # 直接导入router避免使用.router属性
+        print("✅ 知识图谱模块加载成功")
+        return True
+    except Exception as e:
+        print(f"❌ 知识图谱模块加载失败: {str(e)}")
+        return False
+
+def is_primary_worker():
+    """是否为负责后台工作的进程
+
+    fork模式（preload.serve_forked）下只有一个工作进程导入表格文件、启动提取任务的工作进程，
+    其他进程只处理请求；直接启动时本进程即为主进程。
+    """
+    return os.environ.get(PRELOAD_CONFIG.get('role_env', 'TEDDY_WORKER_ROLE'), 'primary') == 'primary'
+
+def load_table_store():
+    """把新增或修改过的表格文件导入列式存储（未变化的文件跳过）"""
+    if not is_primary_worker():
+        print("ℹ️ 表格存储导入由主工作进程执行，本进程跳过")
+        return True
+    try:
+        for directory in TABLE_STORE_CONFIG.get('import_dirs', []):
+            summary = table_store.import_directory(directory)
+            print(f"✅ 表格存储导入 {directory}: 新导入 {summary['imported']} 个文件，"
+                  f"未变化 {summary['unchanged']} 个，失败 {len(summary['failed'])} 个")
+        return True
+    except Exception as e:
+        print(f"❌ 表格存储导入失败: {str(e)}")
+        return False
+
+# 配置需要加载的组件
+component_loader.register("data_processor", load_data_processing)
+component_loader.register("knowledge_base", load_shared_components)
+component_loader.register("qa_engine", load_qa_engine)
+component_loader.register("knowledge_graph", load_knowledge_graph)
+if table_store is not None and TABLE_STORE_CONFIG.get('import_on_startup', True):
+    component_loader.register("table_store", load_table_store)
+
+async def load_components_async():
+    """按依赖关系并行加载组件，并更新组件健康状态"""
+    global components_loaded
+    report = await component_loader.load_all()
+    components_loaded = True
+    if not USE_SIMPLE_MONITOR:
+        if report["status"] == "completed":
+            register_component_health("模型加载", "healthy", "模型已完全加载")
+        else:
+            failed = [name for name, info in report["components"].items() if info["status"] != "loaded"]
+            register_component_health("模型加载", "warning", f"部分组件未加载: {', '.join(failed)}")
+    return report
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """应用生命周期管理"""
-    global components_loaded
-    
     # 启动时执行
     print("🚀 正在启动应用...")
     
-    # 定义组件加载函数
-    component_loaders = {}
-    
-    # 添加PDF处理模块
-    async def load_data_processing():
-        try:
-            # 正确导入extract_tables函数
-            from app.data_processing import extract_tables, extract_text
-            print("✅ PDF处理模块加载成功")
-            return True
-        except Exception as e:
-            print(f"❌ PDF处理模块加载失败: {str(e)}")
-            traceback.print_exc()  # 添加堆栈跟踪，方便调试
-            return False
-    
-    # 添加问答引擎模块
-    async def load_qa_engine():
-        try:
-            from app.qa import engine
-            print("✅ 问答引擎加载成功")
-            return True
-        except Exception as e:
-            print(f"❌ 问答引擎加载失败: {str(e)}")
-            return False
-    
-    # 添加知识图谱模块
-    async def load_knowledge_graph():
-        try:
-            from app.models.knowledge_graph import KnowledgeGraph
-            # 直接导入router避免使用.router属性
-            print("✅ 知识图谱模块加载成功")
-            return True
-        except Exception as e:
-            print(f"❌ 知识图谱模块加载失败: {str(e)}")
-            return False
-    
-    # 配置需要加载的组件
-    component_loaders["data_processing"] = load_data_processing
-    component_loaders["qa_engine"] = load_qa_engine
-    component_loaders["knowledge_graph"] = load_knowledge_graph
+    if not USE_SIMPLE_MONITOR:
+        init_monitoring()
+        register_component_health("API服务", "healthy", "API服务已启动")
     
-    # 根据不同模块选择不同的加载方式
-    if USE_FAST_STARTER and app_config.FAST_MODE:
-        # 使用优化的快速启动模块 - 后台加载
-        create_background_loader(component_loaders)
-        print("⚡ 使用优化的快速启动模式")
-    elif app_config.FAST_MODE:
-        # 使用传统的快速启动 - 后台加载
+    loading_task = None
+    if app_config.FAST_MODE:
+        # 快速启动 - 后台加载，/health 中可查看各组件进度
         if not USE_SIMPLE_MONITOR:
-            init_monitoring()
-            register_component_health("API服务", "healthy", "API服务已启动")
             register_component_health("模型加载", "loading", "模型正在后台加载中")
-        asyncio.create_task(load_components_async())
+        loading_task = asyncio.create_task(load_components_async())
         print("⚡ 快速启动模式已激活，组件将在后台加载")
     else:
-        # 标准模式 - 同步加载组件
+        # 标准模式 - 等待组件加载完成后再接收请求
         print("📚 正在加载组件...")
-        if USE_FAST_STARTER:
-            # 使用优化的组件加载器
-            await load_components_async(component_loaders)
-        else:
-            # 使用传统的组件加载器
-            if not USE_SIMPLE_MONITOR:
-                init_monitoring()
-            await load_components_async()
-            if not USE_SIMPLE_MONITOR:
-                register_component_health("模型加载", "healthy", "模型已完全加载")
-        
-        components_loaded = True
+        await load_components_async()
         print("✅ 组件加载完成")
     
+    # 启动提取任务的工作进程（重启前未完成的任务会继续执行），fork模式下只由主工作进程启动
+    if job_queue is not None and is_primary_worker():
+        job_queue.start()
+    
+    # 启动完成后可选地在后台预先导入全部路由
+    if LAZY_IMPORT_CONFIG.get('background_warmup'):
+        asyncio.create_task(lazy_routers.load_all())
+    
+    # 启动分析模式: 输出模块导入耗时
+    if import_profiler is not None:
+        import_profiler.mark("startup_complete")
+        import_profiler.stop()
+        print(import_profiler.format_report())
+    
     yield
     
     # 关闭时执行
     print("🛑 正在关闭应用...")
+    if loading_task is not None and not loading_task.done():
+        loading_task.cancel()
+    executors.shutdown()
+    if job_queue is not None:
+        job_queue.stop()
     # 清理资源
     if not USE_SIMPLE_MONITOR:
         cleanup_resources()
@@ -230,30 +302,39 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 路由中通过 request.app.state.executors.run(任务名, 函数, ..., request=request) 执行同步调用
+app.state.executors = executors
+
+@app.exception_handler(ExecutorBusy)
+async def executor_busy_handler(request: Request, exc: ExecutorBusy):
+    """执行器队列已满时返回503"""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "服务繁忙，请稍后再试", "reason": "executor_busy", "retry_after": 1},
+        headers={"Retry-After": "1"},
+    )
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    """客户端已断开，任务已取消（响应不会被读取，仅用于日志记录）"""
+    return Response(status_code=499)
+
 # 配置静态文件
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
 # 配置模板
 templates = Jinja2Templates(directory="app/templates")
 
-# 注册路由
-app.include_router(qa_router.router, prefix="/api", tags=["问答系统"])
-app.include_router(table_router.router, prefix="/api", tags=["表格处理"])
-app.include_router(ui_router.router, tags=["用户界面"])
-app.include_router(session_router.router, prefix="/api", tags=["会话管理"])
-
-# 注册改进版会话API (如果可用)
-if HAS_IMPROVED_SESSION_API:
-    app.include_router(api_session_router.router, prefix="/api", tags=["会话管理API"])
+# 注册路由（问答、表格、界面、会话、知识图谱、健康检查）
+# 路由模块在首个需要它的请求到达时才导入，避免启动时加载pandas等重量级依赖
+lazy_routers = LazyRouterRegistry.from_config(app, LAZY_IMPORT_CONFIG)
 
-# 注册知识图谱API (如果可用)
-if HAS_KNOWLEDGE_GRAPH_API:
-    app.include_router(knowledge_graph_router, prefix="/api", tags=["知识图谱"])
+# 为问答链路上的生成答案、答案评估等方法挂载分阶段计时（随路由模块加载后挂载）
+if TRACED_ROUTES:
+    lazy_routers.on_load(lambda module: instrument_targets(TRACING_CONFIG.get('instrument', {}), import_modules=False))
 
-# 增加直接API路由注册，确保健康检查可被前端访问
-# 直接注册到主应用
-from app.api.health import router as health_router
-app.include_router(health_router, prefix="/api", tags=["健康检查"])
+if not LAZY_IMPORT_CONFIG.get('enabled', True):
+    lazy_routers.load_now()
 
 # 尝试导入和注册会话API
 # try:
@@ -262,26 +343,48 @@ app.include_router(health_router, prefix="/api", tags=["健康检查"])
 # except ImportError:
 #     print("警告: 会话API模块无法导入")
 
+# 准入控制中间件（位于性能监控之内，排队时间与503计入请求延迟）
+if admission_controller is not None:
+    @app.middleware("http")
+    async def admission_middleware(request: Request, call_next):
+        """耗时请求按通道限制并发，预计排队超过截止时间时返回503"""
+        return await admission_controller.handle(request, call_next)
+
 # 性能监控中间件
 @app.middleware("http")
 async def performance_middleware(request: Request, call_next):
     """记录请求处理时间并添加性能指标到响应中"""
-    # 记录开始时间
-    start_time = time.time()
+    # 记录开始时间（单调时钟，纳秒）
+    start_ns = time.perf_counter_ns()
     success = True
+    status_code = 500
+    
+    # 问答等链路开启分阶段计时，各阶段通过 span() 上报到当前请求的追踪记录
+    trace = trace_token = None
+    if TRACED_ROUTES and request.url.path.startswith(TRACED_ROUTES):
+        trace, trace_token = start_trace(f"{request.method} {request.url.path}")
     
     try:
         # 处理请求
         response = await call_next(request)
         
         # 判断是否成功
-        success = response.status_code < 400
+        status_code = response.status_code
+        success = status_code < 400
     except Exception:
         success = False
         raise
     finally:
+        if trace is not None:
+            finish_trace(trace, trace_token, status_code)
+            slow_traces.add(trace)
+        
         # 计算处理时间
-        duration = time.time() - start_time
+        duration_ns = time.perf_counter_ns() - start_ns
+        duration = duration_ns / 1e9
+        
+        # 按路由模板记录延迟直方图，带路径参数的URL归到同一路由
+        latency_registry.record(LatencyRegistry.route_name(request.scope), duration_ns, success=success)
         
         # 使用监控记录请求
         endpoint = f"{request.method} {request.url.path}"
@@ -290,45 +393,48 @@ async def performance_middleware(request: Request, call_next):
         
     # 添加响应头
     response.headers["X-Process-Time"] = str(duration)
+    if trace is not None:
+        response.headers["Server-Timing"] = trace.server_timing()
+        if request.query_params.get(TRACING_CONFIG.get('debug_param', 'debug_timing')) in ("1", "true"):
+            response = await attach_timing_field(response, trace)
     
     return response
 
+async def attach_timing_field(response, trace):
+    """调试模式: 在JSON对象响应中附加 _timing 字段"""
+    if not response.headers.get("content-type", "").startswith("application/json"):
+        return response
+    body = b"".join([chunk async for chunk in response.body_iterator])
+    headers = {k: v for k, v in response.headers.items() if k.lower() != "content-length"}
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        payload = None
+    if isinstance(payload, dict):
+        payload["_timing"] = trace.to_dict()
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+    return Response(content=body, status_code=response.status_code, headers=headers,
+                    background=response.background)
+
 # 缓存中间件
 @app.middleware("http")
 async def cache_middleware(request: Request, call_next):
-    """对频繁访问的只读端点进行缓存"""
-    cache_key = f"{request.method}:{request.url.path}"
-    
-    # 只缓存GET请求的特定路径
-    if request.method == "GET" and any(path in request.url.path for path in ["/tables", "/health"]):
-        if cache_key in response_cache and time.time() - response_cache[cache_key]["timestamp"] < 30:
-            return Response(
-                content=response_cache[cache_key]["content"],
-                media_type=response_cache[cache_key]["media_type"],
-                status_code=200
-            )
-    
-    response = await call_next(request)
-    
-    # 缓存响应
-    if request.method == "GET" and any(path in request.url.path for path in ["/tables", "/health"]):
-        response_body = b""
-        async for chunk in response.body_iterator:
-            response_body += chunk
-            
-        response_cache[cache_key] = {
-            "content": response_body,
-            "media_type": response.media_type,
-            "timestamp": time.time()
-        }
-        
-        return Response(
-            content=response_body,
-            media_type=response.media_type,
-            status_code=response.status_code
-        )
-        
-    return response
+    """对频繁访问的只读端点进行缓存（路由与TTL见 RESPONSE_CACHE_CONFIG）"""
+    return await response_cache.handle(request, call_next)
+
+# 路由延迟加载中间件
+@app.middleware("http")
+async def lazy_router_middleware(request: Request, call_next):
+    """请求需要的路由模块尚未加载时先在线程池中导入并注册"""
+    await lazy_routers.ensure_for_request(request.scope)
+    return await call_next(request)
+
+# 限流中间件（最外层，超限请求直接返回429）
+if rate_limiter is not None:
+    @app.middleware("http")
+    async def rate_limit_middleware(request: Request, call_next):
+        """按客户端和路由限流，超限返回429及Retry-After"""
+        return await rate_limiter.handle(request, call_next)
 
 # 健康检查接口
 @app.get("/health", tags=["系统"])
@@ -341,12 +447,7 @@ async def health_check():
         system_info = monitor.get_system_info()
         
         # 获取组件加载状态
-        if USE_FAST_STARTER:
-            load_status = "completed" if is_components_loaded() else "loading"
-            loading_info = get_loading_status() if not is_components_loaded() else {}
-        else:
-            load_status = "completed" if components_loaded else "loading"
-            loading_info = {}
+        load_status = component_loader.load_status
         
         # 构建响应
         response = {
@@ -354,13 +455,10 @@ async def health_check():
             "system": system_info["system"],
             "process": system_info["process"],
             "load_status": load_status,
+            "loading": component_loader.report(),
             "requests": system_info["requests"],
             "timestamp": datetime.now().isoformat()
         }
-        
-        # 添加组件加载详情
-        if loading_info:
-            response["loading"] = loading_info
             
         return response
     else:
@@ -397,7 +495,7 @@ async def health_check():
                 status = "warning"
         
         # 使用英文的加载状态
-        load_status = "completed" if components_loaded else "loading"
+        load_status = component_loader.load_status
         if not components_loaded and app_config.FAST_MODE:
             load_status += " (Fast Mode)"
         
@@ -405,10 +503,191 @@ async def health_check():
             "status": status,
             "system": system_info,
             "load_status": load_status,
+            "loading": component_loader.report(),
             "components": components,
             "timestamp": health_data["timestamp"]
         }
 
+# 提交PDF表格提取任务
+@app.post("/api/jobs/tables", tags=["表格处理"], status_code=202)
+async def submit_table_job(request: Request, filename: Optional[str] = None):
+    """
+    上传PDF（请求体为文件内容）并提交表格提取任务，立即返回任务ID；
+    相同内容的PDF只解析一次，重复上传返回已有任务
+    """
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="任务队列未开启")
+    try:
+        return await job_queue.submit_upload(request.stream(), filename)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 查询提取任务状态
+@app.get("/api/jobs/{job_id}", tags=["表格处理"])
+async def get_table_job(job_id: str):
+    """
+    获取任务状态及逐页进度
+    """
+    job = job_queue.store.get(job_id) if job_queue is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    return job
+
+# 获取提取任务结果
+@app.get("/api/jobs/{job_id}/result", tags=["表格处理"])
+async def get_table_job_result(job_id: str):
+    """
+    获取已完成任务提取的表格，任务未完成时返回409及当前状态
+    """
+    job = job_queue.store.get(job_id) if job_queue is not None else None
+    if job is None:
+        raise HTTPException(status_code=404, detail="任务不存在")
+    if job["status"] != "done":
+        return JSONResponse(status_code=409, content=job)
+    return {"job_id": job_id, **job_queue.store.result(job_id)}
+
+# 流式提取PDF表格
+@app.post("/api/tables/stream", tags=["表格处理"])
+async def stream_tables(request: Request, format: Optional[str] = None):
+    """
+    上传PDF（请求体为文件内容），逐页解析并在每个表格解析完成后立即推送；
+    format=ndjson（默认）每行一个表格，format=sse 以 Server-Sent Events 推送
+    """
+    if job_queue is None:
+        raise HTTPException(status_code=503, detail="任务队列未开启，无法保存上传文件")
+    try:
+        _, path = await job_queue.save_stream_upload(request.stream())
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    # 解析结束或客户端断开后删除上传的文件
+    return table_stream_response(path, negotiate_format(format, request.headers.get("accept", "")),
+                                 on_close=lambda: job_queue.remove_stream_upload(path))
+
+# 列式表格存储目录
+@app.get("/api/tables/catalog", tags=["表格处理"])
+async def table_catalog(request: Request, source: Optional[str] = None, page: Optional[int] = None):
+    """
+    按来源文件、页码检索已入库的表格
+    """
+    if table_store is None:
+        raise HTTPException(status_code=503, detail="表格存储未开启")
+    tables = await executors.run("table.catalog", table_store.find, source=source, page=page, request=request)
+    return {"tables": tables}
+
+def _read_stored_table(table_id, columns):
+    """读取表格（在执行器中运行），表格不存在时返回None，列不存在时抛出KeyError"""
+    entry = table_store.get(table_id)
+    if entry is None:
+        return None
+    table = table_store.read(table_id, columns)
+    return {**entry, "columns": table.names, "rows": table.to_rows(header=False), "provenance": table.provenance}
+
+# 读取已入库的表格
+@app.get("/api/tables/catalog/{table_id}", tags=["表格处理"])
+async def read_stored_table(request: Request, table_id: str, columns: Optional[str] = None):
+    """
+    读取表格，columns 为逗号分隔的列名时只返回这些列
+    """
+    if table_store is None:
+        raise HTTPException(status_code=503, detail="表格存储未开启")
+    try:
+        result = await executors.run("table.catalog", _read_stored_table, table_id,
+                                     columns.split(",") if columns else None, request=request)
+    except KeyError as e:
+        raise HTTPException(status_code=400, detail=f"列不存在: {e}")
+    if result is None:
+        raise HTTPException(status_code=404, detail="表格不存在")
+    return result
+
+# 查询已入库的表格
+@app.get("/api/tables/catalog/{table_id}/query", tags=["表格处理"])
+async def query_stored_table(
+    request: Request,
+    table_id: str,
+    where: List[str] = Query(default=[]),
+    sort: Optional[str] = None,
+    columns: Optional[str] = None,
+    limit: Optional[int] = None,
+    offset: int = 0,
+    cursor: Optional[str] = None
+):
+    """
+    服务端过滤、排序和分页
+    
+    - where: 条件 "列名:运算符:值"，可重复，运算符为 eq/ne/in/gt/gte/lt/lte/contains/startswith/isnull/notnull，
+      in 的多个值用 | 分隔，如 where=赛道:eq:未来校园
+    - sort: 排序列，逗号分隔，- 表示降序，如 sort=-报名时间,赛项名称
+    - limit/offset 或 cursor（上一页返回的 next_cursor）分页
+    """
+    if table_query is None:
+        raise HTTPException(status_code=503, detail="表格存储未开启")
+    try:
+        return await executors.run(
+            "table.catalog",
+            table_query.query,
+            table_id,
+            filters=parse_filters(where),
+            sort=parse_sort(sort),
+            columns=columns.split(",") if columns else None,
+            limit=limit,
+            offset=offset,
+            cursor=cursor,
+            request=request,
+        )
+    except KeyError:
+        raise HTTPException(status_code=404, detail="表格不存在")
+    except QueryError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+# 导出已入库的表格
+@app.get("/api/tables/catalog/{table_id}/export", tags=["表格处理"])
+async def export_stored_table(request: Request, table_id: str, format: str = "xlsx", columns: Optional[str] = None):
+    """
+    导出单个表格，format 为 xlsx / csv / tsv / parquet
+    """
+    if table_store is None:
+        raise HTTPException(status_code=503, detail="表格存储未开启")
+    entry = table_store.get(table_id)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="表格不存在")
+    if format not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"不支持的导出格式: {format}")
+    
+    temp_dir = tempfile.mkdtemp(prefix="table_export_")
+    filename = f"{os.path.splitext(entry['source'])[0]}_表格{entry['table_no']}.{format}"
+    path = os.path.join(temp_dir, filename)
+    try:
+        await executors.run("table.export", export_table, table_store, table_id, path, format,
+                            columns.split(",") if columns else None, request=request)
+    except (KeyError, ExportError) as e:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise HTTPException(status_code=400, detail=str(e))
+    except BaseException:
+        shutil.rmtree(temp_dir, ignore_errors=True)
+        raise
+    return FileResponse(path, media_type=EXPORT_MEDIA_TYPES[format], filename=filename,
+                        background=BackgroundTask(shutil.rmtree, temp_dir, ignore_errors=True))
+
+# 批量导出表格目录
+@app.post("/api/tables/export", tags=["表格处理"])
+async def export_table_catalog(request: Request, format: str = "xlsx", source: Optional[str] = None):
+    """
+    把已入库的表格并行导出到 TABLE_STORE_CONFIG['export_dir']，每个表格一个文件
+    """
+    if table_store is None:
+        raise HTTPException(status_code=503, detail="表格存储未开启")
+    try:
+        return await executors.run(
+            "table.export", export_catalog, table_store, TABLE_STORE_CONFIG.get('export_dir', 'data/exports'),
+            format, source, TABLE_STORE_CONFIG.get('export_workers', 4), request=request,
+        )
+    except ExportError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
 # 监控指标接口
 @app.get("/monitoring/metrics", tags=["监控"])
 async def system_metrics():
@@ -416,9 +695,69 @@ async def system_metrics():
     获取系统性能指标接口
     """
     if USE_SIMPLE_MONITOR:
-        return monitor.get_detailed_metrics()
+        metrics = dict(monitor.get_detailed_metrics())
     else:
-        return get_performance_metrics()
+        metrics = dict(get_performance_metrics())
+    
+    # 响应缓存命中统计
+    metrics["response_cache"] = response_cache.get_stats()
+    # 按路由的延迟分位数与请求速率
+    metrics["latency"] = latency_registry.snapshot()
+    # 限流计数
+    if rate_limiter is not None:
+        metrics["rate_limit"] = rate_limiter.get_stats()
+    # 准入控制各通道的排队与拒绝情况
+    if admission_controller is not None:
+        metrics["admission"] = admission_controller.get_stats()
+    # 线程池/进程池的排队与执行情况
+    metrics["executors"] = executors.get_stats()
+    # 提取任务队列
+    if job_queue is not None:
+        metrics["jobs"] = job_queue.get_stats()
+    # 列式表格存储
+    if table_store is not None:
+        metrics["table_store"] = table_store.get_stats()
+    # 提取结果缓存（本进程）
+    extraction_cache = get_extraction_cache()
+    if extraction_cache is not None:
+        metrics["extraction_cache"] = extraction_cache.get_stats()
+    return metrics
+
+# Prometheus指标接口
+@app.get("/monitoring/prometheus", tags=["监控"], response_class=PlainTextResponse)
+async def prometheus_metrics():
+    """
+    以Prometheus文本格式导出请求延迟直方图和限流计数
+    """
+    text = latency_registry.render_prometheus()
+    if rate_limiter is not None:
+        text += rate_limiter.render_prometheus()
+    return PlainTextResponse(
+        text,
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
+
+# 慢请求追踪接口
+@app.get("/monitoring/traces", tags=["监控"])
+async def slowest_traces(limit: int = 20, route: Optional[str] = None):
+    """
+    获取耗时最长的请求及其分阶段耗时（分词、检索、生成答案、评估等）
+    """
+    return {
+        "capacity": slow_traces.capacity,
+        "traces": slow_traces.get(limit=max(0, limit), name=route)
+    }
+
+# 启动耗时接口
+@app.get("/monitoring/startup", tags=["监控"])
+async def startup_profile():
+    """
+    获取启动分析结果（模块导入耗时）及各路由模块的延迟加载状态
+    """
+    return {
+        "profile": import_profiler.report() if import_profiler is not None else None,
+        "lazy_routers": lazy_routers.status()
+    }
 
 # 重置监控指标接口
 @app.post("/monitoring/reset", tags=["监控"])
@@ -426,7 +765,14 @@ async def reset_metrics():
     """
     重置性能统计数据
     """
+    latency_registry.reset()
+    slow_traces.clear()
+    if rate_limiter is not None:
+        rate_limiter.reset_stats()
+    if admission_controller is not None:
+        admission_controller.reset_stats()
     if USE_SIMPLE_MONITOR:
+        response_cache.clear()
         return monitor.reset_stats()
     else:
         # 清理资源
@@ -458,6 +804,7 @@ if __name__ == "__main__":
     parser.add_argument("--fast", action="store_true", help="启用快速启动模式")
     parser.add_argument("--optimize", action="store_true", help="启用性能优化")
     parser.add_argument("--ui-priority", action="store_true", help="UI优先模式")
+    parser.add_argument("--profile-startup", action="store_true", help="启动分析模式，记录模块导入耗时")
     args = parser.parse_args()
     
     # 设置环境变量
@@ -467,6 +814,9 @@ if __name__ == "__main__":
     if args.ui_priority:
         os.environ["UI_PRIORITY"] = "1"
     
+    if args.profile_startup:
+        os.environ[STARTUP_MODES['profile']['env_var']] = STARTUP_MODES['profile']['value']
+    
     if args.optimize:
         os.environ["OPTIMIZE_MEMORY"] = "1"
         os.environ["ENABLE_MONITORING"] = "1"
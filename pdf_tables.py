@@ -0,0 +1,264 @@
+# 泰迪杯项目 - PDF表格逐页提取
+# 负责人: B成员
+# 功能: 使用pdfplumber逐页提取表格，支持按页汇报进度，供后台任务队列调用；
+#       页数较多的PDF按页码区间分片到进程池并行提取，再合并跨页续表（见 table_stitch.py）
+
+import os
+import logging
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    from .config import TABLE_PROCESSOR_CONFIG
+    from .config import TABLE_STORE_CONFIG
+    from .extraction_cache import get_extraction_cache
+    from .table_stitch import TableStitcher
+    from .table_store import get_table_store
+except ImportError:
+    from config import TABLE_PROCESSOR_CONFIG
+    from config import TABLE_STORE_CONFIG
+    from extraction_cache import get_extraction_cache
+    from table_stitch import TableStitcher
+    from table_store import get_table_store
+
+logger = logging.getLogger(__name__)
+
+# 提取逻辑的版本号，修改页内提取或续表合并规则时递增，使提取结果缓存失效
+EXTRACTOR_VERSION = "2"
+
+
+def _open_pdf(pdf_path):
+    # pdfplumber 较重，仅在实际解析时导入
+    import pdfplumber
+    return pdfplumber.open(pdf_path)
+
+
+def count_pages(pdf_path):
+    """获取PDF页数"""
+    with _open_pdf(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _column_edges(table, page_width):
+    """表格的列边界（单元格左边界及表格右边界，占页宽的比例），用于续表的列几何指纹"""
+    cells = getattr(table, "cells", None)
+    if not cells or not page_width:
+        return None
+    edges = {cell[0] for cell in cells}
+    edges.add(table.bbox[2])
+    return [round(edge / page_width, 4) for edge in sorted(edges)]
+
+
+def _page_record(page):
+    """提取单页表格及其位置（用于判断跨页续表）"""
+    tables = []
+    for table in page.find_tables():
+        rows = table.extract()
+        if rows:
+            record = {"rows": rows, "top": table.bbox[1], "bottom": table.bbox[3]}
+            edges = _column_edges(table, getattr(page, "width", None))
+            if edges is not None:
+                record["edges"] = edges
+            tables.append(record)
+    return {"page": page.page_number, "height": page.height, "tables": tables}
+
+
+def extract_page_range(pdf_path, start, stop):
+    """提取 [start, stop) 区间（从0开始的页序号）内各页的表格
+
+    Returns:
+        list: 页记录 {"page": 页码, "height": 页高, "tables": [{"rows", "top", "bottom", "edges"}]}
+    """
+    records = []
+    with _open_pdf(pdf_path) as pdf:
+        for page in pdf.pages[start:stop]:
+            records.append(_page_record(page))
+            # 释放页面缓存，避免大文件逐页累积内存
+            page.flush_cache()
+    return records
+
+
+def stitch_tables(pages, edge_margin=None):
+    """合并跨页续表
+
+    Args:
+        pages (list): 按页码排序的页记录（extract_page_range 的返回格式）
+        edge_margin (float): 贴近页边的判定范围（占页高的比例）
+
+    Returns:
+        list: 表格列表，每个表格为行列表
+    """
+    stitcher = TableStitcher(edge_margin)
+    tables = []
+    for page in pages:
+        tables.extend(record["rows"] for record in stitcher.feed(page))
+    tables.extend(record["rows"] for record in stitcher.finish())
+    return tables
+
+
+def _collect(pages, stitch):
+    if stitch:
+        return stitch_tables(pages)
+    return [table["rows"] for page in pages for table in page["tables"]]
+
+
+def iter_page_records(pdf_path, progress=None):
+    """逐页解析并产出页记录，每页解析后立即释放pdfplumber的页面缓存"""
+    with _open_pdf(pdf_path) as pdf:
+        total = len(pdf.pages)
+        for index, page in enumerate(pdf.pages):
+            record = _page_record(page)
+            page.flush_cache()
+            if progress is not None:
+                progress(index + 1, total)
+            yield record
+
+
+def iter_table_records(pdf_path, stitch=True, progress=None):
+    """逐页提取表格，每个表格在所在页（跨页表格为最后一页）解析后立即产出
+
+    Args:
+        pdf_path (str): PDF文件路径
+        stitch (bool): 是否合并跨页续表（贴近页面底部的表格要等下一页解析后才能确定是否结束）
+        progress (callable): 每处理完一页调用 progress(已完成页数, 总页数)
+
+    Yields:
+        dict: {"rows": 行列表, "page_start": 起始页码, "page_end": 结束页码, "provenance": 各片段的页码和行区间}
+    """
+    source = os.path.basename(pdf_path)
+    stitcher = TableStitcher() if stitch else None
+    for page in iter_page_records(pdf_path, progress):
+        if stitcher is not None:
+            yield from stitcher.feed(page, source)
+            continue
+        for index, table in enumerate(page["tables"]):
+            yield {"rows": table["rows"], "page_start": page["page"], "page_end": page["page"],
+                   "provenance": [{"source": source, "page": page["page"], "index": index,
+                                   "row_start": 0, "row_end": len(table["rows"])}]}
+    if stitcher is not None:
+        yield from stitcher.finish()
+
+
+def iter_tables(pdf_path, stitch=True):
+    """extract_tables 的生成器版本，逐个产出表格（行列表），内存占用与页数无关"""
+    for record in iter_table_records(pdf_path, stitch):
+        yield record["rows"]
+
+
+def extract_tables(pdf_path, progress=None, stitch=True):
+    """逐页提取PDF中的全部表格
+
+    Args:
+        pdf_path (str): PDF文件路径
+        progress (callable): 每处理完一页调用 progress(已完成页数, 总页数)
+        stitch (bool): 是否合并跨页续表
+
+    Returns:
+        list: 表格列表，每个表格为行列表（与 TableExtractor.extract_tables 的返回格式相同）
+    """
+    return [record["rows"] for record in iter_table_records(pdf_path, stitch, progress)]
+
+
+def page_shards(total, pages_per_shard):
+    """把页序号切分为连续区间 [(start, stop), ...]"""
+    pages_per_shard = max(1, pages_per_shard)
+    return [(start, min(start + pages_per_shard, total)) for start in range(0, total, pages_per_shard)]
+
+
+def extract_tables_parallel(pdf_path, progress=None, stitch=True, workers=None, pages_per_shard=None,
+                            executor=None):
+    """按页码区间分片并行提取表格，结果与 extract_tables 相同
+
+    每个分片在工作进程中打开PDF并提取对应页，全部分片完成后按页码顺序合并跨页续表。
+    页数少于 TABLE_PROCESSOR_CONFIG['min_parallel_pages'] 时直接顺序提取。
+
+    Args:
+        pdf_path (str): PDF文件路径
+        progress (callable): 每完成一个分片调用 progress(已完成页数, 总页数)
+        stitch (bool): 是否合并跨页续表
+        workers (int): 进程数，默认 TABLE_PROCESSOR_CONFIG['max_workers']
+        pages_per_shard (int): 每个分片的页数
+        executor (Executor): 复用已有的执行器（不传时临时创建进程池）
+
+    Returns:
+        list: 表格列表，每个表格为行列表
+    """
+    workers = workers or TABLE_PROCESSOR_CONFIG.get('max_workers', 4)
+    pages_per_shard = pages_per_shard or TABLE_PROCESSOR_CONFIG.get('pages_per_shard', 8)
+    total = count_pages(pdf_path)
+    if executor is None and (workers <= 1 or total < TABLE_PROCESSOR_CONFIG.get('min_parallel_pages', 16)):
+        return extract_tables(pdf_path, progress, stitch)
+
+    shards = page_shards(total, pages_per_shard)
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=min(workers, len(shards)))
+    try:
+        futures = {
+            executor.submit(extract_page_range, pdf_path, start, stop): index
+            for index, (start, stop) in enumerate(shards)
+        }
+        results = [None] * len(shards)
+        done = 0
+        for future in as_completed(futures):
+            index = futures[future]
+            results[index] = future.result()
+            done += shards[index][1] - shards[index][0]
+            if progress is not None:
+                progress(done, total)
+    finally:
+        if own_executor:
+            executor.shutdown(cancel_futures=True)
+
+    pages = [record for shard in results for record in shard]
+    return _collect(pages, stitch)
+
+
+def cache_version():
+    """提取结果缓存使用的版本（续表判定参数影响合并结果，一并计入）"""
+    return (f"pdf_tables:{EXTRACTOR_VERSION}:{TABLE_PROCESSOR_CONFIG.get('stitch_edge_margin', 0.15)}:"
+            f"{TABLE_PROCESSOR_CONFIG.get('stitch_max_page_gap', 2)}:"
+            f"{TABLE_PROCESSOR_CONFIG.get('stitch_column_precision', 0.02)}")
+
+
+def extract_job(pdf_path, progress=None, filename=None):
+    """后台任务队列的表格提取处理函数，提取结果同时写入列式表格存储
+
+    Args:
+        pdf_path (str): 上传文件路径
+        progress (callable): 进度回调
+        filename (str): 上传时的文件名，作为表格存储中的来源文件名
+
+    Returns:
+        dict: {"tables": 表格列表, "table_count": 表格数, "table_ids": 入库的表格ID（未入库时为None）}
+    """
+    def compute():
+        if TABLE_PROCESSOR_CONFIG.get('page_parallel', True):
+            return extract_tables_parallel(pdf_path, progress)
+        return extract_tables(pdf_path, progress)
+
+    cache = get_extraction_cache()
+    if cache is None:
+        tables = compute()
+    else:
+        tables = cache.get_or_compute(pdf_path, "tables", compute, cache_version())
+    logger.info(f"{pdf_path} 提取到 {len(tables)} 个表格")
+    return {"tables": tables, "table_count": len(tables),
+            "table_ids": _ingest(pdf_path, tables, filename, cache)}
+
+
+def _ingest(pdf_path, tables, filename, cache):
+    """把提取结果写入表格存储，内容未变化时返回已入库的表格ID；存储未开启或写入失败时返回None"""
+    store = get_table_store() if TABLE_STORE_CONFIG.get('ingest_jobs', True) else None
+    if store is None:
+        return None
+    source = filename or os.path.basename(pdf_path)
+    try:
+        entries = store.ingest_tables(source, tables,
+                                      source_hash=cache.content_hash(pdf_path) if cache is not None else None)
+        if entries is None:
+            entries = store.find(source=source)
+    except Exception as e:
+        # 入库失败不影响任务结果
+        logger.warning(f"{source} 的表格写入存储失败: {e}")
+        return None
+    return [entry["table_id"] for entry in entries]
@@ -3,13 +3,22 @@
 
 """
 系统预加载脚本
-用于启动前预热缓存，提高首次响应速度
+用于启动前构建问答索引快照和分词词典缓存，并提供"加载完成后再fork工作进程"的服务模式，
+让工作进程直接继承已加载的索引、词典和模型，首个请求即可达到稳定状态的响应速度
+
+用法:
+    python preload.py                  # 构建索引快照等磁盘产物，工作进程启动时通过mmap共享加载
+    python preload.py --serve          # 在主进程中预加载全部组件后fork出多个uvicorn工作进程
 """
 
 import os
+import gc
 import sys
 import time
-import multiprocessing as mp
+import signal
+import socket
+import argparse
+import threading
 from pathlib import Path
 import logging
 import importlib
@@ -18,30 +27,42 @@ import importlib
 ROOT_DIR = Path(__file__).parent.parent.absolute()
 sys.path.append(str(ROOT_DIR))
 
-# 配置日志
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+try:
+    from app.config import QA_ENGINE_CONFIG, PRELOAD_CONFIG
+    from app.qa_engine import KeywordQA
+    from app.knowledge_snapshot import write_snapshot
+    from app.text_tokenizer import get_tokenizer
+except ImportError:
+    from config import QA_ENGINE_CONFIG, PRELOAD_CONFIG
+    from qa_engine import KeywordQA
+    from knowledge_snapshot import write_snapshot
+    from text_tokenizer import get_tokenizer
+
 logger = logging.getLogger('preload')
 
+DEFAULT_PORT = 53085
+
+# 当前进程中已预加载的组件，结构: {组件名: 实例}
+_warm_components = {}
+_warm_lock = threading.Lock()
+
 def preload_pdf_processor():
     """预加载PDF处理模块"""
     logger.info("正在预加载PDF处理模块...")
     start_time = time.time()
-    
+
     try:
         # 导入相关模块
         from app.data_processing import extract_tables, extract_text
-        
+
         # 预热表格提取器
         logger.info("初始化表格提取器...")
         extractor = extract_tables.TableExtractor()
-        
+
         # 预热文本提取器
         logger.info("初始化文本提取器...")
         text_processor = extract_text.TextExtractor()
-        
+
         # 尝试预处理一个小型PDF文件（如果存在）
         pdf_samples = list(Path(ROOT_DIR / "data" / "samples").glob("*.pdf"))
         if pdf_samples:
@@ -51,7 +72,7 @@ def preload_pdf_processor():
             _ = extractor.extract_tables(sample_pdf)
             # 提取文本
             _ = text_processor.extract_text(sample_pdf)
-        
+
         elapsed = time.time() - start_time
         logger.info(f"PDF处理模块预加载完成，耗时: {elapsed:.2f}秒")
         return True
@@ -59,35 +80,11 @@ def preload_pdf_processor():
         logger.error(f"PDF处理模块预加载失败: {str(e)}")
         return False
 
-def preload_qa_engine():
-    """预加载问答引擎"""
-    logger.info("正在预加载问答引擎...")
-    start_time = time.time()
-    
-    try:
-        # 导入相关模块
-        from app.qa import engine
-        
-        # 初始化问答引擎
-        logger.info("初始化问答引擎...")
-        qa_engine = engine.QAEngine()
-        
-        # 预热引擎 - 处理一个简单问题
-        logger.info("预热问答引擎...")
-        _ = qa_engine.answer("比赛时间是什么时候?")
-        
-        elapsed = time.time() - start_time
-        logger.info(f"问答引擎预加载完成，耗时: {elapsed:.2f}秒")
-        return True
-    except Exception as e:
-        logger.error(f"问答引擎预加载失败: {str(e)}")
-        return False
-
 def preload_common_modules():
     """预加载公共模块"""
     logger.info("正在预加载公共模块...")
     start_time = time.time()
-    
+
     modules_to_load = [
         "fastapi",
         "uvicorn",
@@ -97,7 +94,7 @@ def preload_common_modules():
         "app.utils.performance",
         "app.core.simple_monitor"
     ]
-    
+
     success_count = 0
     for module_name in modules_to_load:
         try:
@@ -105,53 +102,325 @@ def preload_common_modules():
             success_count += 1
         except ImportError as e:
             logger.warning(f"无法导入模块 {module_name}: {str(e)}")
-    
+
     elapsed = time.time() - start_time
     logger.info(f"公共模块预加载完成 ({success_count}/{len(modules_to_load)})，耗时: {elapsed:.2f}秒")
     return success_count > 0
 
-def preload_component(name):
-    """预加载单个组件的包装函数"""
-    if name == "pdf":
-        return preload_pdf_processor()
-    elif name == "qa":
-        return preload_qa_engine()
-    elif name == "common":
-        return preload_common_modules()
+def snapshot_is_fresh(snapshot_path, knowledge_dir):
+    """判断索引快照是否比知识目录中的所有文件都新
+
+    Args:
+        snapshot_path (str): 快照路径
+        knowledge_dir (str): 知识文件目录
+
+    Returns:
+        bool: 快照存在且无需重建
+    """
+    if not os.path.exists(snapshot_path):
+        return False
+    if not os.path.isdir(knowledge_dir):
+        return True
+
+    # 目录本身的修改时间覆盖文件删除和重命名
+    latest = os.stat(knowledge_dir).st_mtime_ns
+    for entry in os.scandir(knowledge_dir):
+        if entry.name.endswith('.txt') and entry.is_file():
+            latest = max(latest, entry.stat().st_mtime_ns)
+    return os.stat(snapshot_path).st_mtime_ns >= latest
+
+def build_qa_snapshot(knowledge_dir=None, snapshot_path=None, force=False):
+    """构建问答索引快照，供各工作进程通过mmap共享加载
+
+    Args:
+        knowledge_dir (str): 知识文件目录，默认取 QA_ENGINE_CONFIG['knowledge_dir']
+        snapshot_path (str): 快照路径，默认取 QA_ENGINE_CONFIG['snapshot_path']
+        force (bool): 是否忽略已有快照强制重建
+
+    Returns:
+        bool: 是否重新构建了快照
+    """
+    knowledge_dir = knowledge_dir or QA_ENGINE_CONFIG['knowledge_dir']
+    snapshot_path = snapshot_path or QA_ENGINE_CONFIG['snapshot_path']
+
+    if not force and snapshot_is_fresh(snapshot_path, knowledge_dir):
+        logger.info(f"索引快照已是最新: {snapshot_path}")
+        return False
+
+    logger.info(f"正在构建问答索引快照: {knowledge_dir} -> {snapshot_path}")
+    start_time = time.time()
+    engine = KeywordQA(knowledge_dir=knowledge_dir)
+    write_snapshot(engine.index, snapshot_path)
+    logger.info(f"索引快照构建完成（{engine.index.paragraph_count} 个段落），耗时: {time.time() - start_time:.2f}秒")
+    return True
+
+def _rebuild_stale_snapshot(knowledge_dir, snapshot_path):
+    """快照过期或不存在时重建，多个工作进程同时启动时只有一个进程重建
+
+    用 "<快照>.lock" 文件作为跨进程锁（超过 PRELOAD_CONFIG['snapshot_lock_timeout'] 秒的锁视为遗留并清除）。
+
+    Returns:
+        bool: 快照是否已是最新（本进程重建成功）
+    """
+    lock_path = snapshot_path + ".lock"
+    os.makedirs(os.path.dirname(os.path.abspath(snapshot_path)), exist_ok=True)
+    for _ in range(2):
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            break
+        except FileExistsError:
+            try:
+                age = time.time() - os.stat(lock_path).st_mtime
+            except OSError:
+                continue
+            if age < PRELOAD_CONFIG.get('snapshot_lock_timeout', 600):
+                return False
+            os.remove(lock_path)
     else:
-        logger.error(f"未知组件: {name}")
         return False
+    try:
+        os.close(fd)
+        build_qa_snapshot(knowledge_dir, snapshot_path, force=True)
+        return True
+    except Exception as e:
+        logger.error(f"重建索引快照失败: {str(e)}")
+        return False
+    finally:
+        if os.path.exists(lock_path):
+            os.remove(lock_path)
+
+def build_tokenizer_cache():
+    """加载jieba词典
+
+    jieba首次加载时会把解析后的词典缓存到临时目录，之后启动的进程直接读取缓存。
+    """
+    start_time = time.time()
+    get_tokenizer().initialize()
+    logger.info(f"分词词典加载完成，耗时: {time.time() - start_time:.2f}秒")
+
+def warm_start(knowledge_dir=None, snapshot_path=None):
+    """在当前进程中加载共享组件（重复调用只加载一次）
+
+    fork模式下在主进程调用，工作进程直接继承；普通多进程部署下每个工作进程启动时调用，
+    索引从快照mmap加载，各进程共享同一份物理内存。
+
+    Returns:
+        dict: {组件名: 实例}
+    """
+    with _warm_lock:
+        if _warm_components:
+            return _warm_components
+
+        knowledge_dir = knowledge_dir or QA_ENGINE_CONFIG['knowledge_dir']
+        snapshot_path = snapshot_path or QA_ENGINE_CONFIG['snapshot_path']
+        start_time = time.time()
+
+        # 分词词典
+        tokenizer = get_tokenizer()
+        tokenizer.initialize()
+
+        # 问答索引：快照是最新的时直接映射；过期或不存在时先重建快照，
+        # 其他进程正在重建时本进程直接从知识目录构建，不使用过期快照
+        if not snapshot_is_fresh(snapshot_path, knowledge_dir):
+            logger.warning(f"索引快照已过期或不存在，正在重建: {snapshot_path}")
+            if not _rebuild_stale_snapshot(knowledge_dir, snapshot_path):
+                logger.warning("索引快照正由其他进程重建或重建失败，本进程从知识目录构建索引")
+                snapshot_path = None
+        keyword_qa = KeywordQA(knowledge_dir=knowledge_dir, snapshot_path=snapshot_path)
+        keyword_qa.search(PRELOAD_CONFIG.get('warm_question', "比赛时间是什么时候?"))
+
+        components = {"tokenizer": tokenizer, "keyword_qa": keyword_qa}
+
+        # 知识图谱（可选组件）
+        try:
+            from app.models.knowledge_graph import KnowledgeGraph
+            components["knowledge_graph"] = KnowledgeGraph()
+        except Exception as e:
+            logger.warning(f"知识图谱预加载失败: {str(e)}")
+
+        _warm_components.update(components)
+        logger.info(f"共享组件预加载完成: {', '.join(components)}，耗时: {time.time() - start_time:.2f}秒")
+        return _warm_components
+
+def get_warm_component(name):
+    """获取当前进程中已预加载的组件，未加载时返回None"""
+    return _warm_components.get(name)
+
+def warm_search(query, top_k=5, scoring=None):
+    """使用预加载的问答索引检索（供进程池调用，参数和返回值均可pickle）
+
+    Args:
+        query (str): 问题
+        top_k (int): 返回结果数
+        scoring (str): 评分方式，默认使用引擎配置
+
+    Returns:
+        list: 检索结果
+    """
+    return warm_start()["keyword_qa"].search(query, top_k=top_k, scoring=scoring)
+
+def _import_app(app_path):
+    """按 "模块:属性" 导入ASGI应用"""
+    module_name, _, attr = app_path.partition(":")
+    module = importlib.import_module(module_name)
+    return module, getattr(module, attr or "app")
+
+def _run_worker(app, sock):
+    """工作进程: 在继承的监听套接字上运行uvicorn"""
+    import uvicorn
+
+    # 恢复默认信号处理，由uvicorn自行接管
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    server = uvicorn.Server(uvicorn.Config(app, log_level="info"))
+    server.run(sockets=[sock])
+
+def serve_forked(app_path=None, host=None, port=None, workers=None):
+    """先在主进程中完成全部预加载，再fork出多个工作进程共享同一监听端口
+
+    工作进程通过写时复制继承索引、词典和已导入的模块，无需各自重新加载。
+    第一个工作进程（及其重启后的替代进程）标记为 primary，只有它导入表格文件并启动提取任务的工作进程，
+    角色通过 PRELOAD_CONFIG['role_env'] 环境变量传给应用。
+    不支持fork的平台（Windows）退化为单进程启动。
+
+    Args:
+        app_path (str): ASGI应用路径，默认取 PRELOAD_CONFIG['app']
+        host (str): 监听地址
+        port (int): 监听端口，默认读取 teddy_config.txt
+        workers (int): 工作进程数
+    """
+    import uvicorn
+
+    app_path = app_path or PRELOAD_CONFIG.get('app', 'app.main:app')
+    host = host or PRELOAD_CONFIG.get('host', '0.0.0.0')
+    workers = max(1, workers or PRELOAD_CONFIG.get('workers', 1))
+
+    warm_start()
+    preload_common_modules()
+    preload_pdf_processor()
+    module, app = _import_app(app_path)
+    if port is None:
+        read_port = getattr(module, "read_port_from_config", None)
+        port = read_port() if read_port else DEFAULT_PORT
+
+    if not hasattr(os, "fork"):
+        logger.warning("当前平台不支持fork，以单进程方式启动")
+        uvicorn.run(app, host=host, port=port)
+        return
+
+    # 把预加载的对象移出GC跟踪，避免子进程中的垃圾回收改写这些对象所在的内存页
+    gc.collect()
+    gc.freeze()
+
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(2048)
+    sock.set_inheritable(True)
+
+    children = {}
+    stopping = False
+    primary = None
+    role_env = PRELOAD_CONFIG.get('role_env', 'TEDDY_WORKER_ROLE')
+
+    def spawn(is_primary):
+        nonlocal primary
+        pid = os.fork()
+        if pid == 0:
+            exit_code = 0
+            try:
+                os.environ[role_env] = "primary" if is_primary else "secondary"
+                _run_worker(app, sock)
+            except BaseException:
+                logger.exception("工作进程异常退出")
+                exit_code = 1
+            finally:
+                os._exit(exit_code)
+        children[pid] = time.monotonic()
+        if is_primary:
+            primary = pid
+        logger.info(f"工作进程已启动: pid={pid}{'（主工作进程）' if is_primary else ''}")
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    logger.info(f"服务监听 http://{host}:{port}，工作进程数: {workers}")
+    for index in range(workers):
+        spawn(index == 0)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = children.pop(pid, None)
+        if stopping or started is None:
+            continue
+        # 启动后立即退出的进程不再重启，避免配置错误时无限重启
+        if time.monotonic() - started < 5:
+            logger.error(f"工作进程 {pid} 启动后立即退出（状态 {status}），不再重启")
+            continue
+        logger.warning(f"工作进程 {pid} 已退出（状态 {status}），正在重启")
+        spawn(pid == primary)
+
+    sock.close()
+    logger.info("所有工作进程已退出")
 
 def main():
-    """主函数 - 并行预加载所有组件"""
+    """主函数 - 构建共享的磁盘产物，可选以fork模式启动服务"""
+    parser = argparse.ArgumentParser(description="泰迪杯系统预加载")
+    parser.add_argument("--serve", action="store_true", help="预加载后以fork模式启动API服务")
+    parser.add_argument("--workers", type=int, default=None, help="fork模式下的工作进程数")
+    parser.add_argument("--host", default=None, help="监听地址")
+    parser.add_argument("--port", type=int, default=None, help="监听端口")
+    parser.add_argument("--force", action="store_true", help="强制重建索引快照")
+    args = parser.parse_args()
+
     logger.info("=" * 50)
     logger.info("系统预加载开始")
     logger.info("=" * 50)
-    
+
     start_time = time.time()
-    
-    # 确定CPU核心数，用于并行处理
-    cpu_count = max(1, mp.cpu_count() - 1)  # 保留一个核心给系统
-    logger.info(f"检测到 {cpu_count+1} 个CPU核心，将使用 {cpu_count} 个核心进行预加载")
-    
-    # 需要预加载的组件
-    components = ["common", "pdf", "qa"]
-    
-    # 使用进程池并行预加载
-    with mp.Pool(min(len(components), cpu_count)) as pool:
-        results = pool.map(preload_component, components)
-    
-    # 汇总结果
-    success_count = sum(results)
+    success = True
+
+    try:
+        build_qa_snapshot(force=args.force)
+    except Exception as e:
+        logger.error(f"索引快照构建失败: {str(e)}")
+        success = False
+
+    try:
+        build_tokenizer_cache()
+    except Exception as e:
+        logger.error(f"分词词典加载失败: {str(e)}")
+        success = False
+
     total_time = time.time() - start_time
-    
+
     logger.info("=" * 50)
-    logger.info(f"预加载完成: {success_count}/{len(components)} 组件加载成功")
+    logger.info(f"预加载完成: {'全部成功' if success else '部分失败'}")
     logger.info(f"总耗时: {total_time:.2f}秒")
     logger.info("=" * 50)
-    
-    return success_count == len(components)
+
+    if args.serve:
+        serve_forked(host=args.host, port=args.port, workers=args.workers)
+
+    return success
 
 if __name__ == "__main__":
+    # 配置日志（作为模块被服务导入时沿用服务的日志配置）
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
     success = main()
-    sys.exit(0 if success else 1) 
\ No newline at end of file
+    sys.exit(0 if success else 1)
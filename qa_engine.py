@@ -4,19 +4,124 @@
 # 更新日期: 2025-03-20
 
 import os
-import jieba
+import heapq
+import hashlib
+import threading
 import json
 import re
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from operator import itemgetter
+
+try:
+    from .knowledge_index import KnowledgeIndex, SCORING_MODES
+    from .knowledge_snapshot import SNAPSHOT_SUFFIX, is_snapshot, load_snapshot, write_snapshot
+    from .text_tokenizer import STOPWORDS, get_tokenizer
+    from .request_tracing import span
+    from .config import TABLE_PROCESSOR_CONFIG
+except ImportError:
+    from knowledge_index import KnowledgeIndex, SCORING_MODES
+    from knowledge_snapshot import SNAPSHOT_SUFFIX, is_snapshot, load_snapshot, write_snapshot
+    from text_tokenizer import STOPWORDS, get_tokenizer
+    from request_tracing import span
+    from config import TABLE_PROCESSOR_CONFIG
+
+# 知识文件指纹: 修改时间(ns)、文件大小、内容SHA-256
+FileFingerprint = namedtuple("FileFingerprint", ["mtime_ns", "size", "sha256"])
+
+def filter_keywords(words, reverse_synonyms):
+    """对分词结果做同义词归一并过滤停用词和短词
+    
+    Args:
+        words (iterable): 分词结果
+        reverse_synonyms (dict): 反向同义词表，结构: {词: 标准词}
+        
+    Returns:
+        list: 关键词列表
+    """
+    filtered_words = []
+    
+    for word in words:
+        # 如果词在同义词表中，替换为标准词
+        word = reverse_synonyms.get(word, word)
+        
+        if len(word) > 1 and word not in STOPWORDS:
+            filtered_words.append(word)
+    
+    return filtered_words
+
+def build_file_index(content, reverse_synonyms, tokenizer=None):
+    """对单个知识文件的内容分词并构建局部索引
+    
+    Args:
+        content (str): 文件内容
+        reverse_synonyms (dict): 反向同义词表
+        tokenizer (TokenizerService): 分词服务，默认使用进程内共享实例
+        
+    Returns:
+        KnowledgeIndex: 该文件的局部索引
+    """
+    tokenizer = tokenizer or get_tokenizer()
+    index = KnowledgeIndex()
+    
+    # 按段落拆分，整个文件的段落一次批量分词
+    paragraphs = [para.strip() for para in content.split('\n\n')]
+    paragraphs = [para for para in paragraphs if para]
+    for para, words in zip(paragraphs, tokenizer.cut_batch(paragraphs)):
+        # 按关键词索引存入知识库（重复段落自动跳过）
+        index.add_paragraph(para, filter_keywords(words, reverse_synonyms))
+    return index
+
+def _build_shard(items, reverse_synonyms):
+    """子进程任务：为一组知识文件构建局部索引
+    
+    Args:
+        items (list): [(文件路径, 文件内容), ...]
+        reverse_synonyms (dict): 反向同义词表
+        
+    Returns:
+        list: [(文件路径, KnowledgeIndex), ...]
+    """
+    return [(filepath, build_file_index(content, reverse_synonyms)) for filepath, content in items]
+
+def _split_shards(items, shard_count):
+    """按内容长度把文件均衡分配到各分片（大文件优先分配给当前最轻的分片）"""
+    shards = [[] for _ in range(shard_count)]
+    loads = [0] * shard_count
+    for item in sorted(items, key=lambda x: len(x[1]), reverse=True):
+        lightest = loads.index(min(loads))
+        shards[lightest].append(item)
+        loads[lightest] += len(item[1])
+    return [shard for shard in shards if shard]
 
 class KeywordQA:
-    def __init__(self, knowledge_dir="data/processed"):
+    # 待索引内容总量低于该值时不启用进程池（子进程加载jieba词典的开销更大）
+    parallel_min_bytes = 512 * 1024
+    
+    def __init__(self, knowledge_dir="data/processed", scoring="count", snapshot_path=None, tokenizer=None,
+                 max_workers=None):
         """初始化问答引擎
         
         Args:
             knowledge_dir (str): 知识文件所在目录
+            scoring (str): 默认打分方式，count(关键词命中计数) / tfidf / bm25
+            snapshot_path (str): 二进制快照路径，存在时直接映射加载，不再重新分词
+            tokenizer (TokenizerService): 分词服务，默认使用进程内共享实例
+            max_workers (int): 建索引的进程数，默认取 TABLE_PROCESSOR_CONFIG['max_workers']
         """
-        # 知识库字典，结构: {关键词: [文本段落列表]}
-        self.knowledge_base = {}
+        if scoring not in SCORING_MODES:
+            raise ValueError(f"不支持的打分方式: {scoring}，可选: {', '.join(SCORING_MODES)}")
+        self.scoring = scoring
+        self.tokenizer = tokenizer or get_tokenizer()
+        self.max_workers = max_workers or TABLE_PROCESSOR_CONFIG.get('max_workers', 1)
+        
+        # 知识库倒排索引: 段落存储 + {关键词: 段落ID列表}
+        self.index = KnowledgeIndex()
+        
+        # 已索引的知识文件，结构: {文件路径: (FileFingerprint, 该文件的局部索引)}
+        self.knowledge_dir = knowledge_dir
+        self._file_indexes = {}
+        self._reload_lock = threading.Lock()
         
         # 同义词词典，结构: {词: 标准词}
         self.synonyms = {
@@ -34,52 +139,155 @@ class KeywordQA:
             for word in syn_list:
                 self.reverse_synonyms[word] = std_word
         
-        # 加载知识库
-        self.load_knowledge(knowledge_dir)
+        # 加载知识库：优先从快照冷启动
+        if not (snapshot_path and os.path.exists(snapshot_path) and self.load_knowledge_base(snapshot_path)):
+            self.load_knowledge(knowledge_dir)
+    
+    @property
+    def knowledge_base(self):
+        """知识库字典视图，结构: {关键词: [文本段落列表]}
+        
+        每次访问都会从索引重新生成，仅用于兼容和导出，检索请直接使用 self.index
+        """
+        return self.index.to_mapping()
         
-    def load_knowledge(self, directory):
+    def load_knowledge(self, directory, incremental=False):
         """从文本文件加载知识
         
         Args:
             directory (str): 知识文件所在目录
+            incremental (bool): 是否增量加载，仅重新索引新增、修改或删除的文件
+            
+        Returns:
+            dict: 本次加载的文件变更统计
+        """
+        # 统一为绝对路径，避免 "kq/" 与 "kq" 等写法导致按目录比对文件时漏判删除的文件
+        directory = os.path.normpath(os.path.abspath(directory))
+        with self._reload_lock:
+            if not incremental:
+                # 全量加载：丢弃该目录下已记录的文件指纹
+                self._file_indexes = {
+                    path: entry for path, entry in self._file_indexes.items()
+                    if os.path.dirname(path) != directory
+                }
+            return self._refresh_directory(directory)
+    
+    def reload(self, directory=None):
+        """增量重新加载知识目录
+        
+        根据文件修改时间、大小和内容哈希判断变更，只对新增和修改的文件重新分词；
+        新索引构建完成后整体替换，重新加载期间的查询继续使用旧索引。
+        
+        Args:
+            directory (str): 知识文件所在目录，默认为初始化时的目录
+            
+        Returns:
+            dict: 文件变更统计，包含 added / changed / removed / unchanged
         """
+        return self.load_knowledge(directory or self.knowledge_dir, incremental=True)
+    
+    def _refresh_directory(self, directory):
+        """扫描目录并重建索引（调用方需持有 _reload_lock）"""
+        changes = {"added": [], "changed": [], "removed": [], "unchanged": []}
+        
         # 检查目录是否存在
         if not os.path.exists(directory):
             print(f"警告: 知识目录 {directory} 不存在")
-            return
-        
-        # 遍历目录中的文本文件
-        for filename in os.listdir(directory):
-            if filename.endswith('.txt'):
-                filepath = os.path.join(directory, filename)
-                try:
-                    with open(filepath, 'r', encoding='utf-8') as f:
-                        content = f.read()
-                    
-                    # 按段落拆分
-                    paragraphs = content.split('\n\n')
-                    for para in paragraphs:
-                        para = para.strip()
-                        if para:
-                            # 提取段落关键词
-                            keywords = self.extract_keywords(para)
-                            
-                            # 将段落按关键词索引存入知识库
-                            for keyword in keywords:
-                                if keyword not in self.knowledge_base:
-                                    self.knowledge_base[keyword] = []
-                                # 避免重复添加相同段落
-                                if para not in self.knowledge_base[keyword]:
-                                    self.knowledge_base[keyword].append(para)
-                    
-                    print(f"已加载知识文件: {filename}")
-                except Exception as e:
-                    print(f"加载文件 {filename} 时出错: {e}")
+            return changes
+        
+        file_indexes = {
+            path: entry for path, entry in self._file_indexes.items()
+            if os.path.dirname(path) != directory
+        }
+        
+        # 第一阶段：比对文件指纹，收集需要重新索引的文件
+        pending = []
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith('.txt'):
+                continue
+            filepath = os.path.join(directory, filename)
+            previous = self._file_indexes.get(filepath)
+            try:
+                stat = os.stat(filepath)
+                if previous and previous[0][:2] == (stat.st_mtime_ns, stat.st_size):
+                    file_indexes[filepath] = previous
+                    changes["unchanged"].append(filename)
+                    continue
+                
+                with open(filepath, 'rb') as f:
+                    data = f.read()
+                fingerprint = FileFingerprint(stat.st_mtime_ns, stat.st_size, hashlib.sha256(data).hexdigest())
+                
+                # 仅修改时间变化而内容未变，沿用原有局部索引
+                if previous and previous[0].sha256 == fingerprint.sha256:
+                    file_indexes[filepath] = (fingerprint, previous[1])
+                    changes["unchanged"].append(filename)
+                    continue
+                
+                # 与文本模式读取一致，统一换行符
+                content = data.decode('utf-8').replace('\r\n', '\n').replace('\r', '\n')
+                pending.append((filepath, fingerprint, content))
+                changes["changed" if previous else "added"].append(filename)
+            except Exception as e:
+                print(f"加载文件 {filename} 时出错: {e}")
+                # 读取失败时保留上一次成功加载的内容
+                if previous:
+                    file_indexes[filepath] = previous
+        
+        # 第二阶段：分词并构建各文件的局部索引
+        fingerprints = {filepath: fingerprint for filepath, fingerprint, _ in pending}
+        for filepath, partial_index in self._build_file_indexes([(path, content) for path, _, content in pending]):
+            file_indexes[filepath] = (fingerprints[filepath], partial_index)
+            print(f"已加载知识文件: {os.path.basename(filepath)}")
+        
+        changes["removed"] = sorted(
+            os.path.basename(path) for path in self._file_indexes
+            if os.path.dirname(path) == directory and path not in file_indexes
+        )
+        
+        if changes["added"] or changes["changed"] or changes["removed"] or not self._file_indexes:
+            # 按文件路径顺序合并局部索引，预计算IDF和段落长度归一化系数后整体替换
+            index = KnowledgeIndex.merge([file_indexes[path][1] for path in sorted(file_indexes)])
+            index.prepare_scoring()
+            self.index = index
+        self._file_indexes = file_indexes
         
         # 打印知识库统计信息
-        keyword_count = len(self.knowledge_base)
-        paragraph_count = sum(len(paras) for paras in self.knowledge_base.values())
+        keyword_count = self.index.keyword_count
+        paragraph_count = self.index.paragraph_count
         print(f"知识库加载完成，包含 {keyword_count} 个关键词，{paragraph_count} 个知识段落")
+        return changes
+    
+    def _build_file_indexes(self, items):
+        """为待索引文件构建局部索引
+        
+        文件较多且内容较大时按内容长度分片到进程池并行分词，否则在当前进程中执行。
+        各局部索引最终按文件路径顺序合并，因此结果与分片方式无关。
+        
+        Args:
+            items (list): [(文件路径, 文件内容), ...]
+            
+        Returns:
+            list: [(文件路径, KnowledgeIndex), ...]
+        """
+        total_bytes = sum(len(content) for _, content in items)
+        workers = min(self.max_workers, len(items))
+        if workers > 1 and total_bytes >= self.parallel_min_bytes:
+            try:
+                results = []
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    for shard_result in executor.map(_build_shard, _split_shards(items, workers),
+                                                     [self.reverse_synonyms] * workers):
+                        results.extend(shard_result)
+                print(f"已使用 {workers} 个进程并行构建 {len(items)} 个文件的索引")
+                return results
+            except Exception as e:
+                print(f"并行构建索引失败，改为单进程构建: {e}")
+        
+        return [
+            (filepath, build_file_index(content, self.reverse_synonyms, self.tokenizer))
+            for filepath, content in items
+        ]
     
     def extract_keywords(self, text):
         """提取文本中的关键词
@@ -90,54 +298,47 @@ class KeywordQA:
         Returns:
             list: 关键词列表
         """
-        # 使用jieba分词
-        words = list(jieba.cut(text))
-        
-        # 过滤掉停用词和短词
-        filtered_words = []
-        stopwords = {'的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也', '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'}
+        # 使用共享分词服务（带缓存）
+        return self.filter_keywords(self.tokenizer.cut(text))
+    
+    def filter_keywords(self, words):
+        """对分词结果做同义词归一并过滤停用词和短词
         
-        for word in words:
-            # 如果词在同义词表中，替换为标准词
-            if word in self.reverse_synonyms:
-                word = self.reverse_synonyms[word]
+        Args:
+            words (iterable): 分词结果
             
-            if len(word) > 1 and word not in stopwords:
-                filtered_words.append(word)
-        
-        return filtered_words
+        Returns:
+            list: 关键词列表
+        """
+        return filter_keywords(words, self.reverse_synonyms)
     
-    def search(self, query, top_k=5):
+    def search(self, query, top_k=5, scoring=None):
         """搜索与查询相关的内容
         
         Args:
             query (str): 查询内容
             top_k (int): 返回结果数量上限
+            scoring (str): 打分方式，count / tfidf / bm25，默认使用初始化时的设置
             
         Returns:
             list: 相关段落列表
         """
         # 提取查询中的关键词
-        keywords = self.extract_keywords(query)
+        with span("tokenize"):
+            keywords = self.extract_keywords(query)
         
-        # 匹配结果与权重
-        results = {}
+        # 取一次索引引用，检索过程中使用同一份数据
+        index = self.index
         
-        # 对每个关键词在知识库中查找匹配段落
-        for keyword in keywords:
-            if keyword in self.knowledge_base:
-                for para in self.knowledge_base[keyword]:
-                    # 如果段落已在结果中，增加权重；否则添加新结果
-                    if para in results:
-                        results[para] += 1
-                    else:
-                        results[para] = 1
-        
-        # 按权重排序
-        sorted_results = sorted(results.items(), key=lambda x: x[1], reverse=True)
-        
-        # 返回top_k个结果
-        return [para for para, weight in sorted_results[:top_k]]
+        with span("retrieval"):
+            # 匹配结果与权重，结构: {段落ID: 得分}
+            results = index.score(keywords, scoring or self.scoring)
+            
+            # 用堆取top_k，结果与稳定降序排序后截断一致（同分保持首次命中顺序）
+            top_results = heapq.nlargest(top_k, results.items(), key=itemgetter(1))
+            
+            # 返回top_k个结果
+            return [index.get_paragraph(para_id) for para_id, weight in top_results]
     
     def answer(self, question):
         """回答问题
@@ -165,15 +366,21 @@ class KeywordQA:
                 "answers": ["抱歉，没有找到相关信息"]
             }
     
-    def save_knowledge_base(self, filepath="data/knowledge_base.json"):
+    def save_knowledge_base(self, filepath="data/knowledge_base.json", binary=None):
         """保存知识库到文件
         
         Args:
             filepath (str): 保存路径
+            binary (bool): 是否保存为二进制快照，默认按扩展名判断（.kqa为快照，其余为JSON）
         """
+        if binary is None:
+            binary = filepath.endswith(SNAPSHOT_SUFFIX)
         try:
-            with open(filepath, 'w', encoding='utf-8') as f:
-                json.dump(self.knowledge_base, f, ensure_ascii=False, indent=2)
+            if binary:
+                write_snapshot(self.index, filepath)
+            else:
+                with open(filepath, 'w', encoding='utf-8') as f:
+                    json.dump(self.knowledge_base, f, ensure_ascii=False, indent=2)
             print(f"知识库已保存到: {filepath}")
         except Exception as e:
             print(f"保存知识库时出错: {e}")
@@ -181,15 +388,28 @@ class KeywordQA:
     def load_knowledge_base(self, filepath="data/knowledge_base.json"):
         """从文件加载知识库
         
+        二进制快照通过mmap映射，不解析、不拷贝段落文本；JSON文件按旧格式解析。
+        
         Args:
             filepath (str): 加载路径
+            
+        Returns:
+            bool: 是否加载成功
         """
         try:
-            with open(filepath, 'r', encoding='utf-8') as f:
-                self.knowledge_base = json.load(f)
+            if is_snapshot(filepath):
+                self.index = load_snapshot(filepath)
+            else:
+                with open(filepath, 'r', encoding='utf-8') as f:
+                    self.index = KnowledgeIndex.from_mapping(json.load(f))
+                self.index.prepare_scoring()
+            # 索引不再对应已记录的知识文件，下次reload时全量重建
+            self._file_indexes = {}
             print(f"已从 {filepath} 加载知识库")
+            return True
         except Exception as e:
             print(f"加载知识库时出错: {e}")
+            return False
 
 # 当直接运行脚本时，进行简单测试
 if __name__ == "__main__":
@@ -0,0 +1,283 @@
+"""
+泰迪杯项目 - 令牌桶限流
+功能: 按客户端+路由的令牌桶限流，实现 API_CONFIG['rate_limit']；
+      默认使用进程内存储，多个工作进程可通过SQLite文件共享令牌计数；
+      超限请求返回429及Retry-After，并导出限流计数
+"""
+
+import os
+import math
+import time
+import asyncio
+import sqlite3
+import logging
+import threading
+
+from starlette.responses import JSONResponse
+
+logger = logging.getLogger(__name__)
+
+
+class MemoryBucketStore:
+    """进程内令牌桶存储
+
+    每个桶的状态是不可变元组 (令牌数, 更新时间, 回满时间)，计算后一次赋值替换，不加锁。
+    事件循环中读取与赋值之间没有await，协程之间不会交错；线程并发时最坏多放行一个请求。
+    """
+
+    def __init__(self, max_keys=10000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self.buckets = {}
+
+    def take(self, key, rate, capacity, cost=1.0):
+        """尝试从桶中取出令牌
+
+        Args:
+            key (str): 桶标识
+            rate (float): 每秒补充的令牌数
+            capacity (float): 桶容量（允许的突发请求数）
+            cost (float): 本次请求消耗的令牌数
+
+        Returns:
+            tuple: (是否放行, 剩余令牌数, 需要等待的秒数)
+        """
+        now = self.clock()
+        tokens, updated, _ = self.buckets.get(key, (capacity, now, now))
+        tokens = min(capacity, tokens + (now - updated) * rate)
+        allowed = tokens >= cost
+        if allowed:
+            tokens -= cost
+        self.buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+        if len(self.buckets) > self.max_keys:
+            self._prune(now)
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+    def _prune(self, now):
+        """清理已经回满的空闲桶（与新建桶等价）"""
+        for key, (_, _, full_at) in list(self.buckets.items()):
+            if full_at <= now:
+                self.buckets.pop(key, None)
+
+    def clear(self):
+        self.buckets.clear()
+
+
+class SQLiteBucketStore:
+    """基于SQLite文件的共享令牌桶存储，多个工作进程共享同一份计数
+
+    访问会阻塞（等待其他进程的写锁），由 RateLimiter 放到线程中执行；
+    等锁超过 timeout 时抛出 sqlite3.OperationalError，限流器按放行处理。
+    """
+
+    # 存储访问会阻塞，不能在事件循环中直接调用
+    blocking = True
+
+    def __init__(self, path, timeout=0.05, clock=time.time):
+        self.path = path
+        self.timeout = timeout
+        self.clock = clock
+        self._local = threading.local()
+        self._last_prune = 0.0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS buckets ("
+                "key TEXT PRIMARY KEY, tokens REAL NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=self.timeout, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def take(self, key, rate, capacity, cost=1.0):
+        """同 MemoryBucketStore.take，读改写在一个写事务中完成"""
+        conn = self._connect()
+        now = self.clock()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT tokens, updated FROM buckets WHERE key = ?", (key,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+            allowed = tokens >= cost
+            if allowed:
+                tokens -= cost
+            conn.execute(
+                "INSERT INTO buckets (key, tokens, updated) VALUES (?, ?, ?) "
+                "ON CONFLICT(key) DO UPDATE SET tokens = excluded.tokens, updated = excluded.updated",
+                (key, tokens, now),
+            )
+            if now - self._last_prune > 300:
+                # 清理一小时未访问的桶
+                self._last_prune = now
+                conn.execute("DELETE FROM buckets WHERE updated < ?", (now - 3600,))
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        return allowed, tokens, 0.0 if allowed else (cost - tokens) / rate
+
+    def clear(self):
+        self._connect().execute("DELETE FROM buckets")
+
+
+class RateLimiter:
+    """按客户端和路由的令牌桶限流
+
+    每个客户端在每条配置了单独限额的路由上有独立的桶，其余路由共享一个桶，
+    批量调用的客户端耗尽自己的令牌后不会影响其他用户。
+    """
+
+    def __init__(self, requests_per_minute=60, burst=None, routes=None, exempt_paths=(),
+                 store=None, trust_forwarded_for=False):
+        """初始化限流器
+
+        Args:
+            requests_per_minute (float): 默认每分钟请求数
+            burst (int): 桶容量（允许的突发请求数），默认等于每分钟请求数
+            routes (dict): {路径前缀: 每分钟请求数}，单独计数的路由
+            exempt_paths (list): 不限流的路径前缀
+            store: 令牌桶存储，默认 MemoryBucketStore
+            trust_forwarded_for (bool): 是否使用 X-Forwarded-For 识别客户端（部署在反向代理后时开启）
+        """
+        self.requests_per_minute = requests_per_minute
+        self.burst = burst
+        # 前缀越长越优先
+        self.routes = sorted((routes or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.exempt_paths = tuple(exempt_paths)
+        self.store = store or MemoryBucketStore()
+        self.trust_forwarded_for = trust_forwarded_for
+        self.allowed = {}
+        self.limited = {}
+        self.store_errors = 0
+        # 阻塞型存储在线程中调用 check，计数需要加锁
+        self._stats_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 API_CONFIG['rate_limit'] 创建，未开启时返回None"""
+        if not config.get('enabled'):
+            return None
+        if config.get('backend', 'memory') == 'sqlite':
+            store = SQLiteBucketStore(config.get('sqlite_path', 'data/cache/rate_limit.db'),
+                                      timeout=config.get('sqlite_timeout', 0.05))
+        else:
+            store = MemoryBucketStore()
+        return cls(
+            requests_per_minute=config.get('requests_per_minute', 60),
+            burst=config.get('burst'),
+            routes=config.get('routes'),
+            exempt_paths=config.get('exempt_paths', ()),
+            store=store,
+            trust_forwarded_for=config.get('trust_forwarded_for', False),
+        )
+
+    def _limit_for(self, path):
+        """返回 (计数分组, 每分钟请求数)"""
+        for prefix, per_minute in self.routes:
+            if path.startswith(prefix):
+                return prefix, per_minute
+        return "*", self.requests_per_minute
+
+    def client_id(self, request):
+        if self.trust_forwarded_for:
+            forwarded = request.headers.get("x-forwarded-for")
+            if forwarded:
+                return forwarded.split(",")[0].strip()
+        return request.client.host if request.client else "unknown"
+
+    def check(self, client, path):
+        """检查一次请求
+
+        Returns:
+            tuple: (是否放行, 分组, 每分钟限额, 剩余令牌数, 需要等待的秒数)
+        """
+        group, per_minute = self._limit_for(path)
+        rate = per_minute / 60.0
+        capacity = self.burst if self.burst and group == "*" else per_minute
+        try:
+            allowed, remaining, retry_after = self.store.take(f"{client}|{group}", rate, capacity)
+        except sqlite3.Error as e:
+            # 共享存储不可用或等锁超时时放行，避免限流故障导致服务不可用
+            with self._stats_lock:
+                self.store_errors += 1
+            logger.warning(f"限流存储访问失败，本次请求直接放行: {e}")
+            return True, group, per_minute, None, 0.0
+        counter = self.allowed if allowed else self.limited
+        with self._stats_lock:
+            counter[group] = counter.get(group, 0) + 1
+        return allowed, group, per_minute, remaining, retry_after
+
+    async def handle(self, request, call_next):
+        """HTTP中间件入口"""
+        path = request.url.path
+        if path.startswith(self.exempt_paths):
+            return await call_next(request)
+
+        client = self.client_id(request)
+        if getattr(self.store, "blocking", False):
+            # SQLite存储的写事务可能等待其他进程的锁，放到线程中执行，不阻塞事件循环
+            result = await asyncio.to_thread(self.check, client, path)
+        else:
+            result = self.check(client, path)
+        allowed, group, per_minute, remaining, retry_after = result
+        if not allowed:
+            retry_seconds = max(1, math.ceil(retry_after))
+            return JSONResponse(
+                status_code=429,
+                content={"detail": "请求过于频繁，请稍后再试", "retry_after": retry_seconds},
+                headers={
+                    "Retry-After": str(retry_seconds),
+                    "X-RateLimit-Limit": str(per_minute),
+                    "X-RateLimit-Remaining": "0",
+                },
+            )
+
+        response = await call_next(request)
+        response.headers["X-RateLimit-Limit"] = str(per_minute)
+        if remaining is not None:
+            response.headers["X-RateLimit-Remaining"] = str(int(remaining))
+        return response
+
+    def get_stats(self):
+        """限流统计"""
+        return {
+            "requests_per_minute": self.requests_per_minute,
+            "backend": type(self.store).__name__,
+            "allowed": dict(self.allowed),
+            "limited": dict(self.limited),
+            "limited_total": sum(self.limited.values()),
+            "store_errors": self.store_errors,
+        }
+
+    def render_prometheus(self, prefix="teddy_http"):
+        """导出为Prometheus文本格式"""
+        lines = [
+            f"# HELP {prefix}_rate_limit_allowed_total Requests admitted by the rate limiter",
+            f"# TYPE {prefix}_rate_limit_allowed_total counter",
+        ]
+        for group, count in sorted(self.allowed.items()):
+            lines.append(f'{prefix}_rate_limit_allowed_total{{group="{group}"}} {count}')
+        lines += [
+            f"# HELP {prefix}_rate_limited_total Requests rejected with 429",
+            f"# TYPE {prefix}_rate_limited_total counter",
+        ]
+        for group, count in sorted(self.limited.items()):
+            lines.append(f'{prefix}_rate_limited_total{{group="{group}"}} {count}')
+        lines += [
+            f"# HELP {prefix}_rate_limit_store_errors_total Rate limiter backend failures",
+            f"# TYPE {prefix}_rate_limit_store_errors_total counter",
+            f"{prefix}_rate_limit_store_errors_total {self.store_errors}",
+        ]
+        return "\n".join(lines) + "\n"
+
+    def reset_stats(self):
+        self.allowed.clear()
+        self.limited.clear()
+        self.store_errors = 0
@@ -0,0 +1,230 @@
+"""
+泰迪杯项目 - 请求分阶段计时
+功能: 轻量级的请求追踪，问答链路各阶段（分词、检索、生成答案、答案评估、会话读写）
+      通过 span() / traced() 上报耗时；结果以 Server-Timing 响应头输出，
+      并保留最慢的N条追踪记录供监控接口查询
+"""
+
+import sys
+import time
+import uuid
+import heapq
+import inspect
+import importlib
+import itertools
+import functools
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+# 当前请求的追踪对象；未开启追踪时为None，span() 直接跳过
+_current_trace = ContextVar("teddy_current_trace", default=None)
+
+
+class Trace:
+    """单个请求的追踪记录"""
+
+    __slots__ = ("trace_id", "name", "started_at", "start_ns", "duration_ns", "spans", "status_code")
+
+    def __init__(self, name):
+        self.trace_id = uuid.uuid4().hex[:16]
+        self.name = name
+        self.started_at = time.time()
+        self.start_ns = time.perf_counter_ns()
+        self.duration_ns = None
+        self.status_code = None
+        # [(阶段名称, 相对请求开始的偏移ns, 耗时ns)]
+        self.spans = []
+
+    def add_span(self, name, start_ns, duration_ns):
+        # list.append 在多线程下是原子操作，线程池中执行的阶段也可以直接上报
+        self.spans.append((name, start_ns - self.start_ns, duration_ns))
+
+    def finish(self, status_code=None):
+        self.duration_ns = time.perf_counter_ns() - self.start_ns
+        self.status_code = status_code
+
+    def stage_totals(self):
+        """按阶段名称汇总耗时，保持首次出现的顺序
+
+        Returns:
+            dict: {阶段名称: (总耗时ns, 次数)}
+        """
+        totals = {}
+        for name, _, duration_ns in self.spans:
+            total, count = totals.get(name, (0, 0))
+            totals[name] = (total + duration_ns, count + 1)
+        return totals
+
+    def server_timing(self):
+        """生成 Server-Timing 响应头的值"""
+        parts = [
+            f"{_metric_name(name)};dur={total / 1e6:.2f}"
+            for name, (total, _) in self.stage_totals().items()
+        ]
+        if self.duration_ns is not None:
+            parts.append(f"total;dur={self.duration_ns / 1e6:.2f}")
+        return ", ".join(parts)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "name": self.name,
+            "started_at": self.started_at,
+            "duration_ms": round(self.duration_ns / 1e6, 3) if self.duration_ns is not None else None,
+            "status_code": self.status_code,
+            "stages": {
+                name: {"duration_ms": round(total / 1e6, 3), "count": count}
+                for name, (total, count) in self.stage_totals().items()
+            },
+            "spans": [
+                {"name": name, "offset_ms": round(offset / 1e6, 3), "duration_ms": round(duration / 1e6, 3)}
+                for name, offset, duration in self.spans
+            ],
+        }
+
+
+def _metric_name(name):
+    """Server-Timing 的指标名只能使用token字符"""
+    return "".join(ch if ch.isalnum() or ch in "-_." else "_" for ch in name)
+
+
+def start_trace(name):
+    """开始追踪当前请求
+
+    Returns:
+        tuple: (Trace, 用于 finish_trace 的上下文令牌)
+    """
+    trace = Trace(name)
+    return trace, _current_trace.set(trace)
+
+
+def finish_trace(trace, token, status_code=None):
+    """结束追踪并恢复上下文"""
+    trace.finish(status_code)
+    _current_trace.reset(token)
+    return trace
+
+
+def current_trace():
+    """获取当前请求的追踪对象"""
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name):
+    """记录一个阶段的耗时；当前没有追踪时几乎没有开销
+
+    用法:
+        with span("retrieval"):
+            results = index.score(keywords)
+    """
+    trace = _current_trace.get()
+    if trace is None:
+        yield
+        return
+    start_ns = time.perf_counter_ns()
+    try:
+        yield
+    finally:
+        trace.add_span(name, start_ns, time.perf_counter_ns() - start_ns)
+
+
+def traced(name):
+    """把函数（同步或异步）的整个执行过程记录为一个阶段"""
+    def decorator(func):
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with span(name):
+                    return await func(*args, **kwargs)
+            async_wrapper.__traced__ = name
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(name):
+                return func(*args, **kwargs)
+        wrapper.__traced__ = name
+        return wrapper
+    return decorator
+
+
+def instrument(cls, method_name, span_name):
+    """为已有类的方法挂载阶段计时（重复调用不会重复包装）
+
+    Returns:
+        bool: 是否成功挂载
+    """
+    method = inspect.getattr_static(cls, method_name, None)
+    if method is None:
+        return False
+    wrapper_type = None
+    if isinstance(method, (staticmethod, classmethod)):
+        wrapper_type = type(method)
+        method = method.__func__
+    if getattr(method, "__traced__", None):
+        return True
+    wrapped = traced(span_name)(method)
+    setattr(cls, method_name, wrapper_type(wrapped) if wrapper_type else wrapped)
+    return True
+
+
+def instrument_targets(targets, import_modules=True):
+    """按配置为问答链路上的类方法挂载计时，模块不存在时跳过
+
+    Args:
+        targets (dict): {"模块路径:类名.方法名": 阶段名称}
+        import_modules (bool): 是否导入尚未加载的模块；为False时只处理已导入的模块，
+            适合路由延迟加载时在每次加载后调用
+
+    Returns:
+        list: 成功挂载的目标
+    """
+    instrumented = []
+    for target, span_name in targets.items():
+        module_name, _, attr_path = target.partition(":")
+        class_name, _, method_name = attr_path.rpartition(".")
+        try:
+            if import_modules:
+                module = importlib.import_module(module_name)
+            else:
+                module = sys.modules[module_name]
+            cls = getattr(module, class_name)
+        except (ImportError, KeyError, AttributeError):
+            continue
+        if instrument(cls, method_name, span_name):
+            instrumented.append(target)
+    return instrumented
+
+
+class SlowTraceLog:
+    """保留耗时最长的N条追踪记录（最小堆，内存固定）"""
+
+    def __init__(self, capacity=50):
+        self.capacity = capacity
+        self._heap = []
+        self._counter = itertools.count()
+
+    def add(self, trace):
+        if self.capacity <= 0 or trace.duration_ns is None:
+            return
+        item = (trace.duration_ns, next(self._counter), trace)
+        if len(self._heap) < self.capacity:
+            heapq.heappush(self._heap, item)
+        elif trace.duration_ns > self._heap[0][0]:
+            heapq.heapreplace(self._heap, item)
+
+    def get(self, limit=None, name=None):
+        """按耗时从高到低返回追踪记录
+
+        Args:
+            limit (int): 返回条数上限
+            name (str): 只返回名称包含该字符串的记录（如 "/api/ask"）
+        """
+        traces = [trace for _, _, trace in sorted(self._heap, reverse=True, key=lambda item: item[:2])]
+        if name:
+            traces = [trace for trace in traces if name in trace.name]
+        return [trace.to_dict() for trace in traces[:limit]]
+
+    def clear(self):
+        self._heap.clear()
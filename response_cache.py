@@ -0,0 +1,436 @@
+"""
+泰迪杯项目 - API响应缓存
+功能: 为只读端点提供按条数和字节数限制的LRU缓存，支持按路由设置TTL、
+      查询参数与Vary请求头参与缓存键、过期重建时的防击穿锁以及命中统计；
+      缓存条目附带内容哈希ETag和基于数据文件的Last-Modified，支持条件请求返回304
+"""
+
+import os
+import time
+import asyncio
+import hashlib
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+from urllib.parse import parse_qsl, urlencode
+
+from starlette.requests import Request
+from starlette.responses import Response
+
+# 不写入缓存的响应头（由缓存命中时重新生成或与单次请求相关）
+_SKIP_HEADERS = {b"content-length", b"x-process-time", b"x-cache", b"age", b"date", b"server"}
+
+
+class SourceMtime:
+    """统计若干数据目录（或单个文件）中文件的最新修改时间，结果在短时间内复用，避免每个请求都遍历目录"""
+
+    def __init__(self, directories, interval=2.0, clock=time.monotonic):
+        self.directories = list(directories)
+        self.interval = interval
+        self.clock = clock
+        self._checked_at = None
+        self._value = None
+
+    def _scan(self):
+        latest = None
+        for directory in self.directories:
+            if os.path.isfile(directory):
+                # 单个文件，如表格存储的目录索引 catalog.db
+                mtime = os.stat(directory).st_mtime
+                if latest is None or mtime > latest:
+                    latest = mtime
+                continue
+            if not os.path.isdir(directory):
+                continue
+            for root, _, files in os.walk(directory):
+                for name in files:
+                    try:
+                        mtime = os.stat(os.path.join(root, name)).st_mtime
+                    except OSError:
+                        continue
+                    if latest is None or mtime > latest:
+                        latest = mtime
+        # HTTP日期精确到秒
+        return int(latest) if latest is not None else None
+
+    def __call__(self):
+        now = self.clock()
+        if self._checked_at is None or now - self._checked_at >= self.interval:
+            self._value = self._scan()
+            self._checked_at = now
+        return self._value
+
+
+class CacheEntry:
+    """缓存条目: 完整保留状态码、响应头和响应体，并记录ETag和数据文件修改时间"""
+
+    __slots__ = ("status_code", "raw_headers", "body", "created", "expires", "etag", "last_modified")
+
+    def __init__(self, status_code, raw_headers, body, created, expires, last_modified=None):
+        self.status_code = status_code
+        self.raw_headers = raw_headers
+        self.body = body
+        self.created = created
+        self.expires = expires
+        self.last_modified = last_modified
+
+        # 优先沿用接口自身给出的ETag，否则按内容哈希生成强ETag
+        etag = None
+        for name, value in raw_headers:
+            if name.lower() == b"etag":
+                etag = value.decode("latin-1")
+                break
+        self.etag = etag or '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+
+    @property
+    def size(self):
+        return len(self.body) + sum(len(k) + len(v) for k, v in self.raw_headers)
+
+
+class ResponseCache:
+    """有界LRU响应缓存
+
+    - 缓存键: 请求方法 + 路径 + 规范化后的查询参数 + 响应Vary头所列请求头的取值
+    - 容量: 同时限制条目数和总字节数，超出时淘汰最久未使用的条目
+    - TTL: 按路径前缀配置，未配置的路径不缓存
+    - 防击穿: 同一路径与查询参数同一时刻只有一个请求回源，其余请求等待后直接读取新缓存
+      （长度未知的流式响应在交给服务器发送时即释放锁，发送完成后才写入缓存）
+    - 条件请求: 响应带ETag（内容哈希）和Last-Modified（数据文件最新修改时间），
+      If-None-Match / If-Modified-Since 匹配时返回304；数据文件更新后对应缓存立即失效
+    """
+
+    def __init__(self, routes, max_entries=512, max_bytes=32 * 1024 * 1024,
+                 max_entry_bytes=2 * 1024 * 1024, lock_timeout=10.0, last_modified_sources=None,
+                 clock=time.monotonic):
+        """初始化响应缓存
+
+        Args:
+            routes (dict): 路径前缀到TTL秒数的映射
+            max_entries (int): 最大条目数
+            max_bytes (int): 缓存总字节数上限
+            max_entry_bytes (int): 单个响应可缓存的最大字节数，超过时直接透传
+            lock_timeout (float): 等待其他请求回源的最长秒数，超时后不经缓存直接处理
+            last_modified_sources (dict): 路径前缀到数据目录列表（或返回时间戳的可调用对象）的映射，
+                用于生成Last-Modified
+            clock (callable): 单调时钟，便于测试替换
+        """
+        # 最长前缀优先匹配
+        self.routes = sorted(routes.items(), key=lambda item: len(item[0]), reverse=True)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.lock_timeout = lock_timeout
+        self.clock = clock
+
+        self.last_modified_sources = sorted(
+            (
+                (prefix, source if callable(source) else SourceMtime(source))
+                for prefix, source in (last_modified_sources or {}).items()
+            ),
+            key=lambda item: len(item[0]),
+            reverse=True,
+        )
+
+        self._entries = OrderedDict()
+        self._bytes = 0
+        # 基础键 -> 响应Vary头中的请求头名称，随该基础键最后一个条目一起删除
+        self._vary = {}
+        # 基础键 -> 缓存中该基础键的条目数
+        self._variants = {}
+        # 基础键 -> [锁, 等待者数量]
+        self._locks = {}
+
+        self._stats = {
+            "hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "stores": 0,
+            "evictions": 0,
+            "expired": 0,
+            "invalidated": 0,
+            "not_modified": 0,
+            "bypassed": 0,
+            "lock_timeouts": 0,
+        }
+
+    @classmethod
+    def from_config(cls, config):
+        """根据配置字典创建缓存"""
+        return cls(
+            routes=config.get("routes", {}),
+            max_entries=config.get("max_entries", 512),
+            max_bytes=config.get("max_bytes", 32 * 1024 * 1024),
+            max_entry_bytes=config.get("max_entry_bytes", 2 * 1024 * 1024),
+            lock_timeout=config.get("lock_timeout", 10.0),
+            last_modified_sources=config.get("last_modified_sources"),
+        )
+
+    @staticmethod
+    def _match_prefix(rules, path):
+        for prefix, value in rules:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return value
+        return None
+
+    def route_ttl(self, path):
+        """获取路径的缓存TTL，不缓存的路径返回None"""
+        return self._match_prefix(self.routes, path)
+
+    def source_mtime(self, path):
+        """获取路径对应数据文件的最新修改时间（秒级时间戳），未配置数据源时返回None"""
+        source = self._match_prefix(self.last_modified_sources, path)
+        return source() if source is not None else None
+
+    def _base_key(self, request):
+        query = urlencode(sorted(parse_qsl(request.url.query, keep_blank_values=True)))
+        return (request.method, request.url.path, query)
+
+    def _full_key(self, request, base_key):
+        names = self._vary.get(base_key, ())
+        return base_key + tuple(request.headers.get(name, "") for name in names)
+
+    def get(self, key, source_mtime=None):
+        """读取未过期的缓存条目并刷新其LRU位置
+
+        Args:
+            key (tuple): 缓存键
+            source_mtime (int): 数据文件当前的最新修改时间，比条目记录的更新时条目失效
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry.expires <= self.clock():
+            self._remove(key)
+            self._stats["expired"] += 1
+            return None
+        if source_mtime is not None and entry.last_modified is not None and source_mtime > entry.last_modified:
+            self._remove(key)
+            self._stats["invalidated"] += 1
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key, entry, vary_names=()):
+        """写入缓存条目，超出容量时按LRU淘汰
+
+        Args:
+            key (tuple): 缓存键（基础键 + Vary请求头取值）
+            entry (CacheEntry): 缓存条目
+            vary_names (tuple): 响应Vary头中的请求头名称
+        """
+        if key in self._entries:
+            self._remove(key)
+        base_key = key[:3]
+        self._vary[base_key] = vary_names
+        self._variants[base_key] = self._variants.get(base_key, 0) + 1
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self._stats["stores"] += 1
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self._stats["evictions"] += 1
+
+    def _remove(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.size
+        base_key = key[:3]
+        remaining = self._variants.get(base_key, 1) - 1
+        if remaining > 0:
+            self._variants[base_key] = remaining
+        else:
+            # 基础键含查询参数，不随条目删除会随不同的查询参数无限增长
+            self._variants.pop(base_key, None)
+            self._vary.pop(base_key, None)
+
+    def clear(self):
+        """清空缓存条目（统计数据保留）"""
+        self._entries.clear()
+        self._vary.clear()
+        self._variants.clear()
+        self._bytes = 0
+
+    def get_stats(self):
+        """获取缓存统计"""
+        lookups = self._stats["hits"] + self._stats["misses"]
+        return {
+            **self._stats,
+            "hit_ratio": round(self._stats["hits"] / lookups, 4) if lookups else 0.0,
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "pending_locks": len(self._locks),
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+        }
+
+    def _validator_headers(self, entry, label):
+        """ETag / Last-Modified 及缓存状态响应头"""
+        names = {name.lower() for name, _ in entry.raw_headers}
+        headers = []
+        if b"etag" not in names:
+            headers.append((b"etag", entry.etag.encode("latin-1")))
+        if entry.last_modified is not None and b"last-modified" not in names:
+            headers.append((b"last-modified", formatdate(entry.last_modified, usegmt=True).encode("latin-1")))
+        headers.append((b"x-cache", label.encode("latin-1")))
+        headers.append((b"age", str(int(self.clock() - entry.created)).encode("latin-1")))
+        return headers
+
+    @staticmethod
+    def _is_not_modified(request, entry):
+        """判断条件请求是否命中（If-None-Match 优先于 If-Modified-Since）"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is not None:
+            if if_none_match.strip() == "*":
+                return True
+            # 弱比较：忽略 W/ 前缀
+            etag = entry.etag[2:] if entry.etag.startswith("W/") else entry.etag
+            for candidate in if_none_match.split(","):
+                candidate = candidate.strip()
+                if candidate.startswith("W/"):
+                    candidate = candidate[2:]
+                if candidate == etag:
+                    return True
+            return False
+
+        if_modified_since = request.headers.get("if-modified-since")
+        if if_modified_since is not None and entry.last_modified is not None:
+            try:
+                since = parsedate_to_datetime(if_modified_since).timestamp()
+            except (TypeError, ValueError):
+                return False
+            return entry.last_modified <= since
+        return False
+
+    def _build_response(self, request, entry, label):
+        if self._is_not_modified(request, entry):
+            self._stats["not_modified"] += 1
+            response = Response(status_code=304)
+            # 304响应只携带校验相关的响应头
+            keep = {b"cache-control", b"vary", b"expires", b"content-location"}
+            response.raw_headers = [
+                (name, value) for name, value in entry.raw_headers if name.lower() in keep
+            ] + self._validator_headers(entry, label)
+            return response
+
+        response = Response(content=entry.body, status_code=entry.status_code)
+        response.raw_headers = list(entry.raw_headers) + [
+            (b"content-length", str(len(entry.body)).encode("latin-1")),
+        ] + self._validator_headers(entry, label)
+        return response
+
+    def _make_entry(self, status_code, raw_headers, body, ttl, source_mtime):
+        now = self.clock()
+        return CacheEntry(status_code, raw_headers, body, now, now + ttl, last_modified=source_mtime)
+
+    @staticmethod
+    def _vary_names(response):
+        vary = response.headers.get("vary")
+        if not vary:
+            return ()
+        return tuple(sorted({name.strip().lower() for name in vary.split(",") if name.strip()}))
+
+    def _is_cacheable(self, response):
+        if response.status_code != 200:
+            return False
+        if "set-cookie" in response.headers:
+            return False
+        cache_control = response.headers.get("cache-control", "").lower()
+        if "no-store" in cache_control or "private" in cache_control:
+            return False
+        content_length = response.headers.get("content-length")
+        if content_length is not None and int(content_length) > self.max_entry_bytes:
+            return False
+        return True
+
+    def _acquire_slot(self, base_key):
+        slot = self._locks.get(base_key)
+        if slot is None:
+            slot = self._locks[base_key] = [asyncio.Lock(), 0]
+        slot[1] += 1
+        return slot
+
+    def _release_slot(self, base_key, slot, acquired=True):
+        if acquired:
+            slot[0].release()
+        slot[1] -= 1
+        if slot[1] == 0 and self._locks.get(base_key) is slot:
+            del self._locks[base_key]
+
+    async def handle(self, request: Request, call_next):
+        """缓存中间件处理入口"""
+        ttl = self.route_ttl(request.url.path)
+        if request.method != "GET" or ttl is None or ttl <= 0:
+            return await call_next(request)
+        if "no-cache" in request.headers.get("cache-control", "").lower():
+            self._stats["bypassed"] += 1
+            return await call_next(request)
+
+        base_key = self._base_key(request)
+        source_mtime = self.source_mtime(request.url.path)
+        entry = self.get(self._full_key(request, base_key), source_mtime)
+        if entry is not None:
+            self._stats["hits"] += 1
+            return self._build_response(request, entry, "HIT")
+
+        # 缓存未命中，同一基础键只允许一个请求回源
+        slot = self._acquire_slot(base_key)
+        try:
+            await asyncio.wait_for(slot[0].acquire(), timeout=self.lock_timeout)
+        except asyncio.TimeoutError:
+            self._stats["lock_timeouts"] += 1
+            self._release_slot(base_key, slot, acquired=False)
+            return await call_next(request)
+
+        try:
+            # 等锁期间其他请求可能已经写入缓存
+            entry = self.get(self._full_key(request, base_key), source_mtime)
+            if entry is not None:
+                self._stats["coalesced"] += 1
+                return self._build_response(request, entry, "HIT")
+
+            self._stats["misses"] += 1
+            response = await call_next(request)
+            vary_names = self._vary_names(response)
+            if not self._is_cacheable(response) or "*" in vary_names:
+                self._stats["bypassed"] += 1
+                response.headers["x-cache"] = "BYPASS"
+                return response
+            key = base_key + tuple(request.headers.get(name, "") for name in vary_names)
+
+            raw_headers = [(k, v) for k, v in response.raw_headers if k.lower() not in _SKIP_HEADERS]
+
+            if "content-length" in response.headers:
+                # 已知长度且不超过单条上限：先收集响应体，以便本次响应就带上ETag并处理条件请求
+                body = b"".join([chunk async for chunk in response.body_iterator])
+                entry = self._make_entry(response.status_code, raw_headers, body, ttl, source_mtime)
+                self.put(key, entry, vary_names)
+                return self._build_response(request, entry, "MISS")
+
+            # 长度未知的流式响应：边发送边收集，ETag从下一次命中开始提供。
+            # 响应体可能永远不会开始发送（如客户端提前断开），锁不能等到发送结束再释放
+            response.body_iterator = self._tee_body(
+                response.body_iterator, key, response.status_code, raw_headers, ttl, source_mtime, vary_names
+            )
+            response.headers["x-cache"] = "MISS"
+            return response
+        finally:
+            self._release_slot(base_key, slot)
+
+    async def _tee_body(self, body_iterator, key, status_code, raw_headers, ttl, source_mtime, vary_names):
+        """边向客户端发送响应体边收集，发送完成后写入缓存；超过单条上限时只透传"""
+        chunks = []
+        size = 0
+        cacheable = True
+        async for chunk in body_iterator:
+            if cacheable:
+                size += len(chunk)
+                if size > self.max_entry_bytes:
+                    cacheable = False
+                    chunks = []
+                else:
+                    chunks.append(chunk)
+            yield chunk
+
+        if cacheable:
+            self.put(key, self._make_entry(status_code, raw_headers, b"".join(chunks), ttl, source_mtime), vary_names)
+        else:
+            self._stats["bypassed"] += 1
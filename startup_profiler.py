@@ -0,0 +1,190 @@
+"""
+泰迪杯项目 - 启动耗时分析
+功能: 启动分析模式下记录每个模块的导入耗时（类似 -X importtime，但输出结构化数据），
+      以及启动各阶段的时间点，用于定位拖慢服务启动的依赖
+"""
+
+import os
+import sys
+import time
+import threading
+from importlib.abc import MetaPathFinder
+
+
+class _TimingFinder(MetaPathFinder):
+    """包装后续查找器返回的loader，统计模块执行耗时"""
+
+    def __init__(self, profiler):
+        self.profiler = profiler
+        self._local = threading.local()
+
+    def find_spec(self, fullname, path, target=None):
+        # 避免递归: 向其余查找器查询时跳过自身
+        if getattr(self._local, "searching", False):
+            return None
+        self._local.searching = True
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._local.searching = False
+
+        loader = spec.loader
+        if loader is None or not hasattr(loader, "exec_module"):
+            return spec
+        spec.loader = _TimedLoader(loader, self.profiler)
+        return spec
+
+
+class _TimedLoader:
+    """记录 exec_module 耗时，执行后把模块上的loader还原为原始对象"""
+
+    def __init__(self, loader, profiler):
+        self.loader = loader
+        self.profiler = profiler
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        spec = module.__spec__
+        spec.loader = self.loader
+        module.__loader__ = self.loader
+        with self.profiler.measure(spec.name):
+            self.loader.exec_module(module)
+
+
+class ImportProfiler:
+    """模块导入耗时统计
+
+    用法:
+        profiler = ImportProfiler().start()
+        import heavy_module
+        profiler.stop()
+        profiler.report()
+    """
+
+    def __init__(self):
+        self.records = {}
+        self.phases = []
+        self.started = None
+        self._finder = _TimingFinder(self)
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, env_var="STARTUP_PROFILE", value="1"):
+        """环境变量开启时创建并启动分析器，否则返回None"""
+        if os.environ.get(env_var) != value:
+            return None
+        return cls().start()
+
+    @property
+    def active(self):
+        return self._finder in sys.meta_path
+
+    def start(self):
+        if not self.active:
+            self.started = time.perf_counter()
+            sys.meta_path.insert(0, self._finder)
+        return self
+
+    def stop(self):
+        if self.active:
+            sys.meta_path.remove(self._finder)
+        return self
+
+    def measure(self, name):
+        return _Measurement(self, name)
+
+    def _stack(self):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    def mark(self, phase):
+        """记录启动阶段的时间点（相对分析开始）"""
+        if self.started is not None:
+            self.phases.append((phase, time.perf_counter() - self.started))
+
+    def report(self, top=30):
+        """生成报告
+
+        Args:
+            top (int): 按累计耗时输出的模块数
+
+        Returns:
+            dict: 总耗时、阶段时间点和耗时最多的模块
+        """
+        with self._lock:
+            records = list(self.records.values())
+        # 顶层导入的累计耗时之和即为导入总耗时（嵌套导入已包含在父模块中）
+        total = sum(record["cumulative"] for record in records if record["parent"] is None)
+        records.sort(key=lambda record: record["cumulative"], reverse=True)
+        return {
+            "module_count": len(records),
+            "import_ms": round(total * 1000, 2),
+            "phases": [{"phase": phase, "at_ms": round(at * 1000, 2)} for phase, at in self.phases],
+            "modules": [
+                {
+                    "module": record["module"],
+                    "self_ms": round(record["self"] * 1000, 2),
+                    "cumulative_ms": round(record["cumulative"] * 1000, 2),
+                    "parent": record["parent"],
+                }
+                for record in records[:top]
+            ],
+        }
+
+    def format_report(self, top=15):
+        """格式化为可打印的文本"""
+        report = self.report(top)
+        lines = [f"模块导入总耗时: {report['import_ms']:.1f}ms（{report['module_count']} 个模块）"]
+        for phase in report["phases"]:
+            lines.append(f"  阶段 {phase['phase']}: {phase['at_ms']:.1f}ms")
+        lines.append(f"  {'累计ms':>10} {'自身ms':>10}  模块")
+        for module in report["modules"]:
+            lines.append(f"  {module['cumulative_ms']:>10.1f} {module['self_ms']:>10.1f}  {module['module']}")
+        return "\n".join(lines)
+
+
+class _Measurement:
+    """单个模块的计时，自身耗时扣除期间嵌套导入的模块"""
+
+    __slots__ = ("profiler", "name", "start", "child_time")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.child_time = 0.0
+        self.profiler._stack().append(self)
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        elapsed = time.perf_counter() - self.start
+        stack = self.profiler._stack()
+        stack.pop()
+        parent = stack[-1] if stack else None
+        if parent is not None:
+            parent.child_time += elapsed
+        with self.profiler._lock:
+            self.profiler.records[self.name] = {
+                "module": self.name,
+                "self": elapsed - self.child_time,
+                "cumulative": elapsed,
+                "parent": parent.name if parent is not None else None,
+            }
+        return False
@@ -0,0 +1,286 @@
+"""
+泰迪杯项目 - 表格批量导出
+功能: 逐行流式写出表格，Excel使用openpyxl的只写模式（内存占用与行数无关），
+      另支持更快的CSV、TSV和Parquet格式；先写临时文件再原子重命名，
+      目标文件被占用时重试而不是留下 *_backup<时间戳>.xlsx 之类的副本；多个表格可并行导出
+"""
+
+import os
+import csv
+import time
+import uuid
+import logging
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+
+try:
+    from .table_store import TableStore, SUMMARY_SHEET
+except ImportError:
+    from table_store import TableStore, SUMMARY_SHEET
+
+logger = logging.getLogger(__name__)
+
+FORMATS = ("xlsx", "csv", "tsv", "parquet")
+
+MEDIA_TYPES = {
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+    "csv": "text/csv; charset=utf-8",
+    "tsv": "text/tab-separated-values; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Excel工作表名最长31个字符，且不能包含这些字符
+_SHEET_INVALID = str.maketrans({char: "_" for char in "[]:*?/\\"})
+
+
+class ExportError(Exception):
+    """导出失败"""
+
+
+def export_format(path, fmt=None):
+    """按参数或文件扩展名确定导出格式"""
+    fmt = (fmt or os.path.splitext(path)[1].lstrip(".")).lower()
+    if fmt not in FORMATS:
+        raise ExportError(f"不支持的导出格式: {fmt}")
+    return fmt
+
+
+@contextmanager
+def atomic_output(path, retries=5, retry_delay=0.5):
+    """在目标目录中写临时文件，完成后重命名为目标文件
+
+    目标文件被其他程序（如Excel）占用导致重命名失败时按间隔重试，仍失败则删除临时文件并抛出 ExportError，
+    不会留下写了一半的文件或备份副本。
+
+    Yields:
+        str: 临时文件路径
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    temp_path = os.path.join(directory, f".{os.path.basename(path)}.{uuid.uuid4().hex}.tmp")
+    try:
+        yield temp_path
+        for attempt in range(retries + 1):
+            try:
+                os.replace(temp_path, path)
+                break
+            except PermissionError:
+                if attempt == retries:
+                    raise ExportError(f"目标文件被占用，请关闭后重试: {path}") from None
+                time.sleep(retry_delay)
+    finally:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+
+def _write_delimited(temp_path, header, rows, delimiter):
+    count = 0
+    # utf-8-sig: Excel直接打开时中文不乱码
+    with open(temp_path, "w", encoding="utf-8-sig", newline="") as f:
+        writer = csv.writer(f, delimiter=delimiter)
+        if header:
+            writer.writerow(header)
+        for row in rows:
+            writer.writerow(["" if value is None else value for value in row])
+            count += 1
+    return count
+
+
+def _sheet_title(name, used):
+    title = (str(name).translate(_SHEET_INVALID).strip() or "Sheet")[:31]
+    base, suffix = title, 1
+    while title in used:
+        suffix += 1
+        title = f"{base[:31 - len(str(suffix)) - 1]}_{suffix}"
+    used.add(title)
+    return title
+
+
+def _write_xlsx(temp_path, sheets):
+    """sheets: [(工作表名, 表头, 行迭代器)]，返回总行数"""
+    from openpyxl import Workbook
+    workbook = Workbook(write_only=True)
+    used = set()
+    count = 0
+    for name, header, rows in sheets:
+        sheet = workbook.create_sheet(_sheet_title(name, used))
+        if header:
+            sheet.append(list(header))
+        for row in rows:
+            sheet.append(list(row))
+            count += 1
+    if not used:
+        workbook.create_sheet("Sheet")
+    workbook.save(temp_path)
+    return count
+
+
+def _write_parquet(temp_path, header, chunks):
+    """chunks: 列字典的迭代器 {列名: 值列表}，逐批写入"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("导出Parquet需要安装 pyarrow") from None
+    writer = None
+    count = 0
+    try:
+        for chunk in chunks:
+            batch = pa.table({name: chunk[name] for name in header})
+            if writer is None:
+                writer = pq.ParquetWriter(temp_path, batch.schema)
+            writer.write_table(batch)
+            count += batch.num_rows
+        if writer is None:
+            pq.write_table(pa.table({name: pa.array([], pa.string()) for name in header}), temp_path)
+    finally:
+        if writer is not None:
+            writer.close()
+    return count
+
+
+def write_rows(path, header, rows, fmt=None, sheet_name="Sheet1"):
+    """流式导出一个表格
+
+    Args:
+        path (str): 目标文件
+        header (list): 表头
+        rows: 行迭代器
+        fmt (str): xlsx / csv / tsv / parquet，默认按扩展名
+        sheet_name (str): Excel工作表名
+
+    Returns:
+        int: 导出的行数
+    """
+    fmt = export_format(path, fmt)
+    with atomic_output(path) as temp_path:
+        if fmt == "xlsx":
+            return _write_xlsx(temp_path, [(sheet_name, header, rows)])
+        if fmt == "parquet":
+            return _write_parquet(temp_path, header, _rows_to_chunks(header, rows))
+        return _write_delimited(temp_path, header, rows, "\t" if fmt == "tsv" else ",")
+
+
+def _rows_to_chunks(header, rows, chunk_rows=10000):
+    chunk = []
+    for row in rows:
+        chunk.append(row)
+        if len(chunk) >= chunk_rows:
+            yield {name: [item[index] for item in chunk] for index, name in enumerate(header)}
+            chunk = []
+    if chunk:
+        yield {name: [item[index] for item in chunk] for index, name in enumerate(header)}
+
+
+def frame_rows(frame):
+    """按行迭代 DataFrame（代替 DataFrame.to_excel，配合 write_rows 流式导出），缺失值为None"""
+    for row in frame.itertuples(index=False, name=None):
+        yield [None if value is None or value != value else value for value in row]
+
+
+def _column_chunk(table, name, start, stop):
+    column = table.column(name)[start:stop]
+    if column.dtype.kind == "M":
+        # 转为微秒精度后 tolist() 得到 datetime，Excel中显示为日期
+        values = column.astype("datetime64[us]").tolist()
+    else:
+        values = column.tolist()
+    mask = table.masks.get(name)
+    if mask is not None:
+        values = [None if missing else value for value, missing in zip(values, mask[start:stop].tolist())]
+    return values
+
+
+def table_chunks(table, columns=None, chunk_rows=5000):
+    """从列式存储中按块读取，产出 {列名: 值列表}，每次只物化一个块"""
+    names = list(columns or table.names)
+    for start in range(0, table.n_rows, chunk_rows):
+        stop = min(start + chunk_rows, table.n_rows)
+        yield {name: _column_chunk(table, name, start, stop) for name in names}
+
+
+def table_rows(table, columns=None, chunk_rows=5000):
+    """从列式存储中按行迭代"""
+    names = list(columns or table.names)
+    for chunk in table_chunks(table, names, chunk_rows):
+        yield from zip(*(chunk[name] for name in names))
+
+
+def export_table(store, table_id, path, fmt=None, columns=None):
+    """导出列式存储中的一个表格
+
+    Returns:
+        dict: {"table_id", "path", "rows", "seconds"}
+    """
+    start = time.perf_counter()
+    fmt = export_format(path, fmt)
+    table = store.read(table_id, columns)
+    header = table.names
+    if fmt == "parquet":
+        with atomic_output(path) as temp_path:
+            count = _write_parquet(temp_path, header, table_chunks(table))
+    else:
+        count = write_rows(path, header, table_rows(table), fmt, sheet_name=f"表格_{table.meta['table_no']}")
+    return {"table_id": table_id, "path": path, "rows": count, "seconds": round(time.perf_counter() - start, 3)}
+
+
+def export_source_workbook(store, source, path):
+    """把一个来源文件的全部表格导出到一个Excel工作簿（每个表格一个工作表，附汇总工作表）
+
+    Returns:
+        int: 导出的表格数
+    """
+    entries = store.find(source=source)
+    with atomic_output(path) as temp_path:
+        sheets = []
+        for entry in entries:
+            table = store.read(entry["table_id"])
+            sheets.append((f"表格_{entry['table_no']}", table.names, table_rows(table)))
+        summary = [(entry["table_no"], entry["page"], len(entry["columns"]), entry["n_rows"]) for entry in entries]
+        sheets.append((SUMMARY_SHEET, ["表格序号", "页码", "列数", "行数"], iter(summary)))
+        _write_xlsx(temp_path, sheets)
+    return len(entries)
+
+
+def _export_worker(root, table_id, path, fmt):
+    """进程池任务: 在子进程中打开存储并导出（只传路径，避免序列化表格数据）"""
+    return export_table(TableStore(root), table_id, path, fmt)
+
+
+def export_catalog(store, output_dir, fmt="xlsx", source=None, max_workers=4, use_processes=True):
+    """并行导出目录中的表格
+
+    Excel写出是纯Python的CPU密集操作，默认使用进程池；CSV等格式主要是IO，可改用线程池。
+
+    Args:
+        store (TableStore): 列式表格存储
+        output_dir (str): 输出目录
+        fmt (str): 导出格式
+        source (str): 只导出该来源文件的表格
+        max_workers (int): 并行数
+        use_processes (bool): 是否使用进程池
+
+    Returns:
+        dict: {"exported": [结果], "failed": {table_id: 错误}}
+    """
+    fmt = export_format("", fmt)
+    entries = store.find(source=source)
+    results = {"exported": [], "failed": {}}
+    if not entries:
+        return results
+    pool_class = ProcessPoolExecutor if use_processes else ThreadPoolExecutor
+    with pool_class(max_workers=min(max_workers, len(entries))) as executor:
+        futures = {}
+        for entry in entries:
+            stem = os.path.splitext(entry["source"])[0]
+            page = entry["page"] if entry["page"] is not None else 0
+            path = os.path.join(output_dir, f"{stem}_p{page}_t{entry['table_no']}.{fmt}")
+            futures[executor.submit(_export_worker, store.root, entry["table_id"], path, fmt)] = entry["table_id"]
+        for future in as_completed(futures):
+            try:
+                results["exported"].append(future.result())
+            except Exception as e:
+                logger.error(f"表格 {futures[future]} 导出失败: {e}")
+                results["failed"][futures[future]] = str(e)
+    results["exported"].sort(key=lambda result: result["path"])
+    return results
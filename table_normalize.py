@@ -0,0 +1,138 @@
+"""
+泰迪杯项目 - 表格单元格规范化
+功能: 表格入库时一次性清洗单元格文本: 去掉PDF换行、列表序号前缀，规范网址，
+      把"2024年4月15日-5月15日"之类的中文日期和日期区间解析为日期类型列；
+      全部使用pandas向量化字符串操作和预编译正则，下游不必再逐行解析
+"""
+
+import re
+
+import pandas as pd
+
+# 规范化规则的版本号，修改规则后递增，已入库的表格会重新导入
+NORMALIZER_VERSION = "2"
+
+# PDF折行: 两个中文字符之间的换行
+_CJK_BREAK = re.compile(r"(?<=[㐀-鿿＀-￯])\s*\n\s*(?=[㐀-鿿＀-￯])")
+_WHITESPACE = re.compile(r"\s+")
+
+# 列表序号前缀: "2." "3、" "(1)" "（一）" "一、" "①" "⚫" "•"，不匹配 "2.4 Ghz" 之类的小数；
+# 后面必须还有内容，整格只有序号（如序号列的 "1." "2."）时保留
+_ENUM_PREFIX = re.compile(
+    r"^\s*(?:\d{1,2}\s*[.．、)）](?!\d)|[（(]\s*(?:\d{1,2}|[一二三四五六七八九十]{1,3})\s*[)）]"
+    r"|[一二三四五六七八九十]{1,3}\s*、|[①-⑳]|[⚫●•·▪■◆])\s*(?=\S)"
+)
+
+# 整个单元格是一个网址（允许末尾带中英文标点）
+_URL = re.compile(r"^\s*((?:https?://|www\.)[^\s，,；;。、]+?)[\s，,；;。、.)）]*$", re.IGNORECASE)
+_URL_HOST = re.compile(r"^(?:(https?)://)?([^/?#]+)(.*)$", re.IGNORECASE)
+
+# 中文日期及日期区间: "2024年4月15日" "2024年4月15日-5月15日" "2024.4.15至2024.5.1" "2024-04-15"，
+# 日期后可以带时刻（只取日期），末尾可以带 "前" "止" 等截止说明，如 "2024年12月31日 24:00前"
+_TIME = r"(?:\s*\d{1,2}\s*[:：]\s*\d{2}(?:\s*[:：]\s*\d{2})?)?"
+_DATE_RANGE = re.compile(
+    r"^\s*(?P<y1>\d{4})\s*[年./\-]\s*(?P<m1>\d{1,2})\s*[月./\-]\s*(?P<d1>\d{1,2})\s*日?" + _TIME +
+    r"(?:\s*(?:-|—|–|~|～|至|到)\s*"
+    r"(?:(?P<y2>\d{4})\s*[年./\-]\s*)?(?:(?P<m2>\d{1,2})\s*[月./\-]\s*)?(?P<d2>\d{1,2})\s*日?" + _TIME +
+    r")?(?:\s*(?:之前|以前|前|止|截止))?\s*$"
+)
+
+# 列名包含这些词时按日期列处理；其他列解析成功率达到 DATE_RATIO 时也按日期列处理
+DATE_NAME_HINTS = ("时间", "日期", "截止", "期限")
+DATE_RATIO = 0.8
+
+
+def _is_text(series):
+    return series.dtype == object or isinstance(series.dtype, pd.StringDtype)
+
+
+def clean_text(series):
+    """去掉PDF折行、多余空白和列表序号前缀"""
+    text = series.astype("string")
+    text = text.str.replace(_CJK_BREAK, "", regex=True)
+    text = text.str.replace(_WHITESPACE, " ", regex=True).str.strip()
+    text = text.str.replace(_ENUM_PREFIX, "", regex=True)
+    return text.mask(text == "")
+
+
+def canonicalize_urls(series):
+    """规范整格为网址的单元格: 去掉末尾标点，补全协议，协议和域名转为小写"""
+    extracted = series.str.extract(_URL, expand=False)
+    is_url = extracted.notna()
+    if not is_url.any():
+        return series
+    parts = extracted[is_url].str.extract(_URL_HOST)
+    scheme = parts[0].fillna("http").str.lower()
+    urls = scheme + "://" + parts[1].str.lower() + parts[2].fillna("")
+    result = series.copy()
+    result[is_url] = urls
+    return result
+
+
+def parse_date_ranges(series):
+    """解析中文日期和日期区间
+
+    区间结束日期省略年份或月份时沿用开始日期的年份、月份。
+
+    Returns:
+        tuple: (开始日期, 结束日期, 是否为区间)，日期为 datetime64 列，无法解析的为 NaT
+    """
+    parts = series.str.extract(_DATE_RANGE)
+    parts = parts.apply(pd.to_numeric, errors="coerce").astype("float64")
+    start = pd.to_datetime(
+        pd.DataFrame({"year": parts["y1"], "month": parts["m1"], "day": parts["d1"]}), errors="coerce"
+    )
+    is_range = parts["d2"].notna()
+    end_parts = pd.DataFrame({
+        "year": parts["y2"].fillna(parts["y1"]),
+        "month": parts["m2"].fillna(parts["m1"]),
+        "day": parts["d2"].fillna(parts["d1"]),
+    })
+    end = pd.to_datetime(end_parts, errors="coerce").where(start.notna())
+    return start, end, is_range & start.notna()
+
+
+def _looks_like_date(name, parsed, text):
+    if any(hint in str(name) for hint in DATE_NAME_HINTS):
+        return parsed.notna().any()
+    filled = text.notna().sum()
+    return bool(filled) and parsed.notna().sum() / filled >= DATE_RATIO
+
+
+def normalize_frame(frame):
+    """规范化一个表格
+
+    文本列清洗后原位替换；日期列保留清洗后的原文，并追加类型化的列:
+    含日期区间的列追加 "<列名>_开始" 和 "<列名>_结束"，只有单个日期的列追加 "<列名>_日期"。
+
+    Args:
+        frame (DataFrame): 原始表格
+
+    Returns:
+        DataFrame: 规范化后的新表格
+    """
+    result = {}
+    for name, series in frame.items():
+        if not _is_text(series):
+            result[name] = series
+            continue
+        text = canonicalize_urls(clean_text(series))
+        result[name] = text.astype(object).where(text.notna(), None)
+
+        start, end, is_range = parse_date_ranges(text)
+        if not _looks_like_date(name, start, text):
+            continue
+        if is_range.any():
+            result[f"{name}_开始"] = start
+            result[f"{name}_结束"] = end
+        else:
+            result[f"{name}_日期"] = start
+    return pd.DataFrame(result, index=frame.index)
+
+
+normalize_frame.version = NORMALIZER_VERSION
+
+
+__all__ = [
+    "NORMALIZER_VERSION", "clean_text", "canonicalize_urls", "parse_date_ranges", "normalize_frame",
+]
@@ -0,0 +1,336 @@
+"""
+泰迪杯项目 - 表格查询
+功能: 在服务端对列式存储中的表格做条件过滤、排序和分页，只返回当前页的数据；
+      条件和排序在NumPy数组上向量化执行，建立了排序索引的列（赛项名称、赛道、报名时间等）
+      的等值、范围和前缀查询使用二分查找
+"""
+
+import json
+import base64
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+try:
+    from .table_store import sort_order
+except ImportError:
+    from table_store import sort_order
+
+# 支持的条件运算符
+OPERATORS = ("eq", "ne", "in", "gt", "gte", "lt", "lte", "contains", "startswith", "isnull", "notnull")
+
+# 可以使用排序索引的运算符
+INDEXED_OPERATORS = ("eq", "in", "gt", "gte", "lt", "lte", "startswith")
+
+
+class QueryError(ValueError):
+    """查询参数错误"""
+
+
+def parse_filters(expressions):
+    """解析条件表达式 "列名:运算符:值"，in 的多个值用 | 分隔
+
+    Returns:
+        list: [(列名, 运算符, 值)]
+    """
+    filters = []
+    for expression in expressions or []:
+        parts = expression.split(":", 2)
+        if len(parts) < 2 or parts[1] not in OPERATORS:
+            raise QueryError(f"无效的查询条件: {expression}")
+        column, op = parts[0], parts[1]
+        value = parts[2] if len(parts) == 3 else None
+        if op not in ("isnull", "notnull") and value is None:
+            raise QueryError(f"查询条件缺少值: {expression}")
+        filters.append((column, op, value.split("|") if op == "in" else value))
+    return filters
+
+
+def parse_sort(expression):
+    """解析排序表达式 "列1,-列2"（- 表示降序）
+
+    Returns:
+        list: [(列名, 是否降序)]
+    """
+    keys = []
+    for item in (expression or "").split(","):
+        item = item.strip()
+        if item:
+            keys.append((item[1:], True) if item.startswith("-") else (item, False))
+    return keys
+
+
+def _cast(value, dtype):
+    """把查询值转换为列的类型"""
+    try:
+        if dtype.kind == "U":
+            return str(value)
+        if dtype.kind in "iuf":
+            return float(value)
+        if dtype.kind == "b":
+            return str(value).lower() in ("1", "true", "yes", "是")
+        if dtype.kind == "M":
+            return np.datetime64(value).astype(dtype)
+    except ValueError:
+        raise QueryError(f"查询值 {value} 与列类型不匹配") from None
+    return value
+
+
+class SortedColumn:
+    """按排序索引排好序的列值（非缺失部分），用于二分查找"""
+
+    __slots__ = ("order", "values", "n_valid")
+
+    def __init__(self, order, values, n_valid):
+        self.order = order
+        self.values = values
+        self.n_valid = n_valid
+
+    def range(self, low=None, high=None, low_inclusive=True, high_inclusive=True):
+        """值在 [low, high] 区间内的行号"""
+        start = 0 if low is None else np.searchsorted(self.values, low, "left" if low_inclusive else "right")
+        stop = self.n_valid if high is None else np.searchsorted(
+            self.values, high, "right" if high_inclusive else "left")
+        return self.order[start:max(start, stop)]
+
+
+class TableQueryEngine:
+    """表格查询
+
+    排序索引的有序列值和排序结果按表格版本缓存在内存中，表格被替换后自动失效。
+    """
+
+    def __init__(self, store, max_page_size=500, default_page_size=50, cache_size=64):
+        """初始化查询引擎
+
+        Args:
+            store (TableStore): 列式表格存储
+            max_page_size (int): 每页最大行数
+            default_page_size (int): 未指定时的每页行数
+            cache_size (int): 缓存的有序列和排序结果数
+        """
+        self.store = store
+        self.max_page_size = max_page_size
+        self.default_page_size = default_page_size
+        self.cache_size = cache_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _cached(self, key, build):
+        with self._lock:
+            if key in self._cache:
+                self._cache.move_to_end(key)
+                return self._cache[key]
+        value = build()
+        with self._lock:
+            self._cache[key] = value
+            while len(self._cache) > self.cache_size:
+                self._cache.popitem(last=False)
+        return value
+
+    def _sorted_column(self, table_id, table, name):
+        """有序列值，列未建立索引时返回None"""
+        def build():
+            order = self.store.column_order(table_id, name, table)
+            if order is None:
+                return None
+            n_valid = table.n_rows - int(table.is_missing(name).sum())
+            order = np.asarray(order)
+            return SortedColumn(order, np.asarray(table.column(name))[order[:n_valid]], n_valid)
+
+        return self._cached(("sorted", table_id, table.version, name), build)
+
+    def _filter(self, table_id, table, column, op, value):
+        """计算单个条件的行掩码"""
+        data = table.column(column)
+        missing = table.is_missing(column)
+        if op == "isnull":
+            return np.array(missing, dtype=bool)
+        if op == "notnull":
+            return ~missing
+
+        if op in ("contains", "startswith") and data.dtype.kind != "U":
+            raise QueryError(f"{op} 只能用于文本列: {column}")
+        values = [_cast(item, data.dtype) for item in value] if op == "in" else _cast(value, data.dtype)
+
+        index = self._sorted_column(table_id, table, column) if op in INDEXED_OPERATORS else None
+        if index is not None:
+            if op == "eq":
+                rows = index.range(values, values)
+            elif op == "in":
+                rows = np.concatenate([index.range(item, item) for item in values]) if values else []
+            elif op == "startswith":
+                # 前缀查询转换为区间 [前缀, 前缀 + 最大码位)
+                rows = index.range(values, values + "\U0010ffff", high_inclusive=False)
+            else:
+                bounds = {
+                    "gt": dict(low=values, low_inclusive=False),
+                    "gte": dict(low=values),
+                    "lt": dict(high=values, high_inclusive=False),
+                    "lte": dict(high=values),
+                }[op]
+                rows = index.range(**bounds)
+            mask = np.zeros(table.n_rows, dtype=bool)
+            mask[rows] = True
+            return mask
+
+        data = np.asarray(data)
+        if op == "eq":
+            mask = data == values
+        elif op == "ne":
+            mask = data != values
+        elif op == "in":
+            mask = np.isin(data, values)
+        elif op == "gt":
+            mask = data > values
+        elif op == "gte":
+            mask = data >= values
+        elif op == "lt":
+            mask = data < values
+        elif op == "lte":
+            mask = data <= values
+        elif op == "contains":
+            mask = np.char.find(data, values) >= 0
+        else:
+            mask = np.char.startswith(data, values)
+        return np.asarray(mask, dtype=bool) & ~missing
+
+    def _ranks(self, table_id, table, name):
+        """列值的排名（相同值排名相同，缺失值排名最大）"""
+        def build():
+            data = np.asarray(table.column(name))
+            missing = table.is_missing(name)
+            index = self._sorted_column(table_id, table, name)
+            if index is None:
+                order = sort_order(data, table.masks.get(name))
+                n_valid = table.n_rows - int(missing.sum())
+                values = data[order[:n_valid]]
+            else:
+                order, values, n_valid = index.order, index.values, index.n_valid
+            starts = np.ones(n_valid, dtype=bool)
+            if n_valid > 1:
+                starts[1:] = values[1:] != values[:-1]
+            ranks = np.full(table.n_rows, n_valid, dtype=np.int64)
+            ranks[order[:n_valid]] = np.cumsum(starts) - 1
+            return ranks
+
+        return self._cached(("ranks", table_id, table.version, name), build)
+
+    def _order(self, table_id, table, sort):
+        """按排序键排列的全部行号"""
+        if not sort:
+            return np.arange(table.n_rows)
+        if len(sort) == 1 and not sort[0][1]:
+            index = self._sorted_column(table_id, table, sort[0][0])
+            if index is not None:
+                return index.order
+        keys = []
+        for name, descending in sort:
+            ranks = self._ranks(table_id, table, name)
+            if descending:
+                # 降序时缺失值仍排在最后
+                missing = table.is_missing(name)
+                ranks = np.where(missing, ranks.max(initial=0) + 1, -ranks)
+            keys.append(ranks)
+        # lexsort 以最后一个键为主键
+        return np.lexsort(keys[::-1])
+
+    @staticmethod
+    def _fingerprint(filters, sort):
+        raw = json.dumps([filters, sort], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _encode_cursor(payload):
+        raw = json.dumps(payload, separators=(",", ":")).encode("utf-8")
+        return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+    @staticmethod
+    def _decode_cursor(cursor):
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            payload = json.loads(raw)
+        except ValueError:
+            raise QueryError("无效的分页游标") from None
+        # 客户端可以传入任意内容，解码成功也要检查结构
+        offset = payload.get("o") if isinstance(payload, dict) else None
+        if type(offset) is not int or offset < 0:
+            raise QueryError("无效的分页游标")
+        return payload
+
+    @staticmethod
+    def _values(table, name, rows):
+        column = np.asarray(table.column(name))[rows]
+        if column.dtype.kind == "M":
+            # 日期列输出为 YYYY-MM-DD
+            text = np.datetime_as_string(column, unit="D")
+            values = [None if missing else item for item, missing in zip(text.tolist(), np.isnat(column).tolist())]
+        else:
+            values = column.tolist()
+        mask = table.masks.get(name)
+        if mask is not None:
+            missing = np.asarray(mask)[rows].tolist()
+            values = [None if miss else value for value, miss in zip(values, missing)]
+        return values
+
+    def query(self, table_id, filters=None, sort=None, columns=None, limit=None, offset=0, cursor=None):
+        """查询表格
+
+        Args:
+            table_id (str): 表格ID
+            filters (list): [(列名, 运算符, 值)]，多个条件之间为"且"
+            sort (list): [(列名, 是否降序)]
+            columns (list): 返回的列，默认全部列
+            limit (int): 每页行数
+            offset (int): 起始行（与 cursor 二选一）
+            cursor (str): 上一页返回的 next_cursor
+
+        Returns:
+            dict: {"table_id", "columns", "rows", "total", "offset", "limit", "next_cursor"}
+
+        Raises:
+            KeyError: 表格不存在
+            QueryError: 列不存在、条件无效或游标已失效
+        """
+        filters = filters or []
+        sort = sort or []
+        needed = list(dict.fromkeys([name for name, _, _ in filters] + [name for name, _ in sort]))
+        table = self.store.read(table_id)
+        for name in needed + list(columns or []):
+            if name not in table.columns:
+                raise QueryError(f"列不存在: {name}")
+        output = list(columns) if columns else table.names
+
+        limit = min(max(1, limit or self.default_page_size), self.max_page_size)
+        fingerprint = self._fingerprint(filters, sort)
+        if cursor:
+            payload = self._decode_cursor(cursor)
+            if payload.get("t") != table_id or payload.get("v") != table.version or payload.get("q") != fingerprint:
+                raise QueryError("分页游标已失效，请重新查询")
+            offset = payload["o"]
+        offset = max(0, offset or 0)
+
+        mask = np.ones(table.n_rows, dtype=bool)
+        for name, op, value in filters:
+            mask &= self._filter(table_id, table, name, op, value)
+        order = self._order(table_id, table, sort)
+        selected = order[mask[order]]
+        total = len(selected)
+        rows = selected[offset:offset + limit]
+
+        values = [self._values(table, name, rows) for name in output]
+        next_cursor = None
+        if offset + limit < total:
+            next_cursor = self._encode_cursor({"t": table_id, "v": table.version, "q": fingerprint,
+                                               "o": offset + limit})
+        return {
+            "table_id": table_id,
+            "columns": output,
+            "rows": [list(row) for row in zip(*values)] if values else [],
+            "total": total,
+            "offset": offset,
+            "limit": limit,
+            "next_cursor": next_cursor,
+        }
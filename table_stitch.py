@@ -0,0 +1,230 @@
+# 泰迪杯项目 - 跨页续表合并
+# 负责人: B成员
+# 功能: 按表头和列几何特征给每个表格计算指纹并放入哈希索引，逐页扫描时按指纹直接查找可延续的表格，
+#       不再两两比较候选表格；一次扫描可处理多个文档，合并后的表格记录各片段的来源（文件、页码、页内序号、行区间）
+
+import re
+
+try:
+    from .config import TABLE_PROCESSOR_CONFIG
+except ImportError:
+    from config import TABLE_PROCESSOR_CONFIG
+
+_SPACES = re.compile(r"\s+")
+
+
+def header_key(row):
+    """表头指纹: 去掉空白（PDF折行）后的单元格文本"""
+    return tuple("" if cell is None else _SPACES.sub("", str(cell)) for cell in row)
+
+
+def geometry_key(table, precision):
+    """列几何指纹: 列数，以及按 precision（占页宽比例）取整的列边界
+
+    没有列边界信息的表格（如从Excel导入的表格）只比较列数。
+    """
+    width = max(len(row) for row in table["rows"])
+    edges = table.get("edges")
+    if not edges:
+        return (width,)
+    return (width,) + tuple(int(round(edge / precision)) for edge in edges)
+
+
+class TableStitcher:
+    """逐页合并跨页续表
+
+    每个未结束的表格（链）在索引中登记两个键: (文件, 表头, 列几何) 和 (文件, 列几何)。
+    新一页贴近页面顶部的表格先按表头查找（续表重复了表头，合并时去掉重复的表头），
+    再按列几何查找（续表没有重复表头，且首行不是本文件中任何已知表格的表头）。
+    可延续的链只能是上一个有表格的页面上贴近底部的表格，中间允许隔着不超过 max_page_gap - 1 个没有表格的页面。
+    没有位置信息的表格，以页内第一个/最后一个表格视为贴近顶部/底部，只能按重复的表头合并:
+    仅凭列数相同不足以判断是续表（如从Excel导入的表格），按列几何合并要求有列边界和上下位置。
+    """
+
+    def __init__(self, edge_margin=None, max_page_gap=None, precision=None):
+        """初始化
+
+        Args:
+            edge_margin (float): 贴近页边的判定范围（占页高的比例）
+            max_page_gap (int): 续表与上一片段的最大页码差，1 表示只合并相邻页
+            precision (float): 列边界取整的精度（占页宽的比例）
+        """
+        if edge_margin is None:
+            edge_margin = TABLE_PROCESSOR_CONFIG.get('stitch_edge_margin', 0.15)
+        if max_page_gap is None:
+            max_page_gap = TABLE_PROCESSOR_CONFIG.get('stitch_max_page_gap', 2)
+        if precision is None:
+            precision = TABLE_PROCESSOR_CONFIG.get('stitch_column_precision', 0.02)
+        self.edge_margin = edge_margin
+        self.max_page_gap = max(1, max_page_gap)
+        self.precision = precision
+        self._open = {}          # 序号 -> 未结束的链
+        self._by_header = {}     # (文件, 表头, 列几何) -> 链
+        self._by_geometry = {}   # (文件, 列几何) -> [链]
+        self._headers = set()    # (文件, 表头): 已出现过的表头
+        self._source = None
+        self._seq = 0
+
+    def _at_top(self, page, table, index):
+        if table.get("top") is None or not page.get("height"):
+            return index == 0
+        return table["top"] <= page["height"] * self.edge_margin
+
+    def _at_bottom(self, page, table, index):
+        if table.get("bottom") is None or not page.get("height"):
+            return index == len(page["tables"]) - 1
+        return table["bottom"] >= page["height"] * (1 - self.edge_margin)
+
+    @staticmethod
+    def _has_geometry(page, table):
+        """表格是否有列边界和页面内的上下位置"""
+        return bool(table.get("edges")) and table.get("top") is not None and bool(page.get("height"))
+
+    def _match(self, source, number, rows, geometry, by_geometry=True):
+        """查找当前表格可延续的链，返回 (链, 是否重复了表头)
+
+        by_geometry 为False时只按重复的表头查找。
+        """
+        head = header_key(rows[0])
+        chain = self._by_header.get((source, head, geometry))
+        if chain is not None and chain["expect"] == number:
+            return chain, True
+        if not by_geometry:
+            return None, False
+        # 首行是已知表格的表头时，只能延续表头相同的链，否则是一个新表格
+        known = (source, head) in self._headers
+        for chain in self._by_geometry.get((source, geometry), ()):
+            if chain["expect"] == number and (not known or chain["keys"][0][1] == head):
+                return chain, known
+        return None, False
+
+    def _start(self, source, number, index, rows, geometry):
+        self._seq += 1
+        head = header_key(rows[0])
+        chain = {
+            "seq": self._seq,
+            "source": source,
+            "rows": list(rows),
+            "page_start": number,
+            "page_end": number,
+            "expect": number + 1,
+            "keys": ((source, head, geometry), (source, geometry)),
+            "provenance": [{"source": source, "page": number, "index": index, "row_start": 0, "row_end": len(rows)}],
+        }
+        self._headers.add((source, head))
+        self._open[chain["seq"]] = chain
+        self._by_header.setdefault(chain["keys"][0], chain)
+        self._by_geometry.setdefault(chain["keys"][1], []).append(chain)
+        return chain
+
+    @staticmethod
+    def _extend(chain, number, index, rows, repeated_header):
+        if repeated_header:
+            rows = rows[1:]
+        start = len(chain["rows"])
+        chain["rows"].extend(rows)
+        chain["page_end"] = number
+        chain["expect"] = number + 1
+        chain["provenance"].append({"source": chain["source"], "page": number, "index": index,
+                                    "row_start": start, "row_end": start + len(rows)})
+
+    def _close(self, chain):
+        self._open.pop(chain["seq"], None)
+        header, geometry = chain["keys"]
+        if self._by_header.get(header) is chain:
+            del self._by_header[header]
+        chains = [other for other in self._by_geometry.get(geometry, ()) if other is not chain]
+        if chains:
+            self._by_geometry[geometry] = chains
+        else:
+            self._by_geometry.pop(geometry, None)
+        return {"rows": chain["rows"], "page_start": chain["page_start"], "page_end": chain["page_end"],
+                "provenance": chain["provenance"]}
+
+    def feed(self, page, source=None):
+        """加入一页的表格
+
+        Args:
+            page (dict): 页记录 {"page", "height", "tables": [{"rows", "top", "bottom", "edges"}]}，
+                位置和列边界可以缺省
+            source (str): 来源文件，多个文件依次送入时用于区分
+
+        Returns:
+            list: 已确定不会再延续的表格 {"rows", "page_start", "page_end", "provenance"}，按起始位置排序
+        """
+        source = page.get("source", source)
+        number = page["page"]
+        closing = {}
+        if source != self._source:
+            # 换了文件，上一个文件的表格全部结束
+            closing.update(self._open)
+            self._headers.clear()
+            self._source = source
+
+        tables = [(index, table) for index, table in enumerate(page["tables"]) if table["rows"]]
+        touched = {}
+        for index, table in tables:
+            rows = table["rows"]
+            geometry = geometry_key(table, self.precision)
+            chain, repeated = (None, False)
+            if self._at_top(page, table, index):
+                chain, repeated = self._match(source, number, rows, geometry, self._has_geometry(page, table))
+            if chain is not None:
+                self._extend(chain, number, index, rows, repeated)
+            else:
+                chain = self._start(source, number, index, rows, geometry)
+            touched[chain["seq"]] = self._at_bottom(page, table, index)
+
+        for seq, chain in list(self._open.items()):
+            if seq in closing:
+                continue
+            if seq in touched:
+                # 最后一个片段不贴近页面底部，不会在后面的页面延续
+                if not touched[seq]:
+                    closing[seq] = chain
+            elif tables or chain["expect"] != number or number - chain["page_end"] >= self.max_page_gap:
+                closing[seq] = chain
+            else:
+                # 没有表格的页面（如整页插图），续表可以出现在下一页
+                chain["expect"] = number + 1
+        return [self._close(closing[seq]) for seq in sorted(closing)]
+
+    def finish(self):
+        """输出全部未结束的表格"""
+        return [self._close(self._open[seq]) for seq in sorted(self._open)]
+
+
+def stitch_records(pages, source=None, **options):
+    """合并一个文档中的跨页续表
+
+    Args:
+        pages (list): 按页码排序的页记录
+        source (str): 来源文件
+        **options: TableStitcher 的参数
+
+    Returns:
+        list: 表格记录 {"rows", "page_start", "page_end", "provenance"}
+    """
+    return stitch_documents([(source, pages)], **options)
+
+
+def stitch_documents(documents, **options):
+    """用同一个索引一次扫描合并多个文档中的跨页续表（续表不会跨文件合并）
+
+    Args:
+        documents: [(来源文件, 页记录列表)]
+        **options: TableStitcher 的参数
+
+    Returns:
+        list: 表格记录 {"rows", "page_start", "page_end", "provenance"}，按文件和起始位置排序
+    """
+    stitcher = TableStitcher(**options)
+    records = []
+    for source, pages in documents:
+        for page in pages:
+            records.extend(stitcher.feed(page, source))
+    records.extend(stitcher.finish())
+    return records
+
+
+__all__ = ["header_key", "geometry_key", "TableStitcher", "stitch_records", "stitch_documents"]
@@ -0,0 +1,633 @@
+"""
+泰迪杯项目 - 列式表格存储
+功能: 提取出的表格只在入库时解析一次，按列保存为NumPy二进制文件（每列一个 .npy），
+      目录索引（SQLite）按来源PDF、页码和表格序号检索；
+      读取时内存映射，只加载请求的列，不再每次通过pandas/openpyxl重新解析Excel和CSV
+"""
+
+import os
+import json
+import time
+import uuid
+import shutil
+import sqlite3
+import hashlib
+import logging
+import threading
+
+import numpy as np
+
+try:
+    from .config import TABLE_STORE_CONFIG
+except ImportError:
+    from config import TABLE_STORE_CONFIG
+
+logger = logging.getLogger(__name__)
+
+# Excel导出文件中的汇总工作表（记录各表格的页码）
+SUMMARY_SHEET = "汇总信息"
+
+
+def _column_names(header, width):
+    """规范化表头: 空列名补为"列N"，重复列名追加序号"""
+    names = []
+    seen = {}
+    for index in range(width):
+        name = header[index] if index < len(header) else None
+        name = str(name).strip() if not _is_missing(name) and str(name).strip() else f"列{index + 1}"
+        if name in seen:
+            seen[name] += 1
+            name = f"{name}_{seen[name]}"
+        else:
+            seen[name] = 1
+        names.append(name)
+    return names
+
+
+def _header_frame(raw):
+    """把按 header=None 读取的工作表首行作为表头，空表头单元格为None（不使用pandas的 "Unnamed: N" 占位名）"""
+    if raw.empty:
+        return raw
+    frame = raw.iloc[1:].reset_index(drop=True)
+    frame.columns = [None if _is_missing(value) else value for value in raw.iloc[0].tolist()]
+    # 去掉表头行后，数值、日期列恢复原类型
+    return frame.infer_objects()
+
+
+def _sheet_rows(raw):
+    """工作表的全部行（含首行），缺失值为None"""
+    return raw.astype(object).where(raw.notna(), None).values.tolist()
+
+
+def _is_missing(value):
+    if value is None:
+        return True
+    try:
+        return bool(value != value)  # NaN / NaT
+    except (TypeError, ValueError):
+        return False
+
+
+def _encode_column(values):
+    """把一列转换为可内存映射的数组
+
+    数值、布尔、日期列保持原类型；其余按字符串保存为定长Unicode数组（可直接做向量化比较、排序）。
+
+    Returns:
+        tuple: (数据数组, 缺失值掩码或None)
+    """
+    array = np.asarray(values)
+    if array.dtype.kind in "biufM":
+        mask = np.isnat(array) if array.dtype.kind == "M" else (
+            np.isnan(array) if array.dtype.kind == "f" else None
+        )
+        return array, mask if mask is not None and mask.any() else None
+    missing = np.fromiter((_is_missing(value) for value in values), dtype=bool, count=len(values))
+    strings = ["" if miss else str(value) for value, miss in zip(values, missing)]
+    data = np.array(strings, dtype=str) if strings else np.array([], dtype="<U1")
+    return data, missing if missing.any() else None
+
+
+def sort_order(data, mask=None):
+    """升序排列的行号（稳定排序，缺失值排在最后）"""
+    if mask is None:
+        return np.argsort(data, kind="stable")
+    return np.lexsort((data, mask))
+
+
+class ColumnTable:
+    """读取出的表格: 按列访问，字符串列为定长Unicode数组，缺失值通过掩码标记"""
+
+    def __init__(self, meta, columns, masks):
+        self.meta = meta
+        self.columns = columns
+        self.masks = masks
+
+    @property
+    def names(self):
+        return list(self.columns)
+
+    @property
+    def n_rows(self):
+        return self.meta["n_rows"]
+
+    @property
+    def version(self):
+        """写入版本，表格被替换后变化"""
+        return self.meta.get("version", 0)
+
+    @property
+    def provenance(self):
+        """合并了跨页续表的表格各片段的来源（页码、原表格序号、行区间），未合并时为None"""
+        return self.meta.get("provenance")
+
+    def column(self, name):
+        return self.columns[name]
+
+    def is_missing(self, name):
+        """缺失值掩码（无缺失值时全为False）"""
+        mask = self.masks.get(name)
+        return mask if mask is not None else np.zeros(self.n_rows, dtype=bool)
+
+    def to_rows(self, header=True):
+        """转换为行列表（与 extract_tables 的表格格式相同），缺失值为None"""
+        names = self.names
+        values = []
+        for name in names:
+            column = self.columns[name].tolist()
+            mask = self.masks.get(name)
+            if mask is not None:
+                column = [None if miss else value for value, miss in zip(column, mask.tolist())]
+            values.append(column)
+        rows = [list(row) for row in zip(*values)] if values else []
+        return [names] + rows if header else rows
+
+    def to_frame(self):
+        """转换为 pandas DataFrame"""
+        import pandas as pd
+        data = {}
+        for name, column in self.columns.items():
+            mask = self.masks.get(name)
+            if mask is None:
+                data[name] = np.asarray(column)
+            elif column.dtype.kind in "fM":
+                data[name] = np.asarray(column)
+            else:
+                data[name] = pd.Series(np.asarray(column), dtype=object).mask(mask)
+        return pd.DataFrame(data, columns=self.names)
+
+
+class TableStore:
+    """列式表格存储"""
+
+    def __init__(self, root, index_columns=(), normalizer=None, stitch=False):
+        """初始化存储
+
+        Args:
+            root (str): 存储根目录，包含 catalog.db 和 tables/ 子目录
+            index_columns (list): 写入时建立排序索引的列名（常用的查询、排序字段）
+            normalizer (callable): 写入前对 DataFrame 做的规范化（如 table_normalize.normalize_frame），
+                其 version 属性参与来源文件的内容哈希，规则变化后会重新导入
+            stitch (bool): 导入Excel时是否合并跨页续表的工作表
+        """
+        self.root = root
+        self.index_columns = frozenset(index_columns)
+        self.normalizer = normalizer
+        self.stitch = stitch
+        self.tables_dir = os.path.join(root, "tables")
+        os.makedirs(self.tables_dir, exist_ok=True)
+        self._local = threading.local()
+        self._cache = {}
+        self._cache_lock = threading.Lock()
+
+    @classmethod
+    def from_config(cls, config):
+        """根据 TABLE_STORE_CONFIG 创建，未开启时返回None"""
+        if not config.get('enabled'):
+            return None
+        normalizer = None
+        if config.get('normalize'):
+            try:
+                from .table_normalize import normalize_frame
+            except ImportError:
+                from table_normalize import normalize_frame
+            normalizer = normalize_frame
+        return cls(config.get('root', 'data/table_store'), config.get('index_columns', ()), normalizer,
+                   config.get('stitch', False))
+
+    def _connect(self):
+        """每个线程一个连接，首次使用时打开；按进程号区分，fork出的进程不会使用父进程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(os.path.join(self.root, "catalog.db"), timeout=5.0, isolation_level=None)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS tables ("
+                "table_id TEXT PRIMARY KEY, source TEXT NOT NULL, page INTEGER, table_no INTEGER NOT NULL, "
+                "columns TEXT NOT NULL, n_rows INTEGER NOT NULL, source_hash TEXT, created REAL NOT NULL, "
+                "directory TEXT)"
+            )
+            # 旧版本的目录索引没有 directory 列（表格保存在以 table_id 命名的目录中）
+            if "directory" not in {row["name"] for row in conn.execute("PRAGMA table_info(tables)")}:
+                try:
+                    conn.execute("ALTER TABLE tables ADD COLUMN directory TEXT")
+                except sqlite3.OperationalError:
+                    pass  # 其他进程已添加
+            conn.execute("CREATE UNIQUE INDEX IF NOT EXISTS tables_location ON tables (source, page, table_no)")
+            conn.execute("CREATE TABLE IF NOT EXISTS sources (source TEXT PRIMARY KEY, source_hash TEXT NOT NULL)")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def table_id(source, page, table_no):
+        raw = f"{source}|{page}|{table_no}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()[:16]
+
+    @staticmethod
+    def _entry(row):
+        return {
+            "table_id": row["table_id"],
+            "source": row["source"],
+            "page": row["page"],
+            "table_no": row["table_no"],
+            "columns": json.loads(row["columns"]),
+            "n_rows": row["n_rows"],
+        }
+
+    def put_columns(self, source, page, table_no, columns, source_hash=None, provenance=None):
+        """写入一个表格
+
+        Args:
+            source (str): 来源文件名（如PDF文件名）
+            page (int): 所在页码，未知时为None（跨页表格为起始页）
+            table_no (int): 表格在来源文件中的序号
+            columns (dict): {列名: 列值序列}，各列长度相同
+            source_hash (str): 来源文件内容哈希
+            provenance (list): 合并跨页续表时各片段的来源，保存在表格元数据中
+
+        Returns:
+            dict: 目录条目
+        """
+        table_id = self.table_id(source, page, table_no)
+        names = list(columns)
+        n_rows = len(columns[names[0]]) if names else 0
+        # 每次写入使用新的版本目录，写完后在目录索引中切换，读取方不会看到写了一半或正在删除的表格
+        version = time.time_ns()
+        directory = f"{table_id}.{version}.{uuid.uuid4().hex[:8]}"
+        temp_dir = os.path.join(self.tables_dir, directory)
+        os.makedirs(temp_dir)
+        try:
+            meta_columns = []
+            for index, name in enumerate(names):
+                data, mask = _encode_column(columns[name])
+                np.save(os.path.join(temp_dir, f"c{index}.npy"), data, allow_pickle=False)
+                if mask is not None:
+                    np.save(os.path.join(temp_dir, f"c{index}.mask.npy"), mask, allow_pickle=False)
+                indexed = name in self.index_columns
+                if indexed:
+                    # 排序索引: 按该列升序排列的行号，等值/范围查询用二分查找，排序直接复用
+                    np.save(os.path.join(temp_dir, f"c{index}.order.npy"), sort_order(data, mask),
+                            allow_pickle=False)
+                meta_columns.append({"name": name, "file": f"c{index}", "dtype": data.dtype.str,
+                                     "nullable": mask is not None, "indexed": indexed})
+            meta = {"table_id": table_id, "source": source, "page": page, "table_no": table_no,
+                    "n_rows": n_rows, "columns": meta_columns, "version": version}
+            if provenance:
+                meta["provenance"] = provenance
+            with open(os.path.join(temp_dir, "meta.json"), "w", encoding="utf-8") as f:
+                json.dump(meta, f, ensure_ascii=False)
+            old = self._switch(table_id, (
+                table_id, source, page, table_no, json.dumps(names, ensure_ascii=False), n_rows, source_hash,
+                time.time(), directory,
+            ))
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        if old is not None and old != directory:
+            # 切换后再删除旧版本；正在读取旧版本的请求会按新版本重新读取（见 read）
+            shutil.rmtree(os.path.join(self.tables_dir, old), ignore_errors=True)
+            with self._cache_lock:
+                self._cache.pop(old, None)
+        return {"table_id": table_id, "source": source, "page": page, "table_no": table_no,
+                "columns": names, "n_rows": n_rows}
+
+    def put_rows(self, source, page, table_no, rows, source_hash=None, provenance=None):
+        """写入行列表格式的表格（首行为表头）"""
+        width = max((len(row) for row in rows), default=0)
+        names = _column_names(rows[0] if rows else [], width)
+        body = rows[1:]
+        columns = {
+            name: [row[index] if index < len(row) else None for row in body]
+            for index, name in enumerate(names)
+        }
+        if self.normalizer is not None:
+            import pandas as pd
+            return self.put_frame(source, page, table_no, pd.DataFrame(columns, dtype=object), source_hash,
+                                  provenance)
+        return self.put_columns(source, page, table_no, columns, source_hash, provenance)
+
+    def put_frame(self, source, page, table_no, frame, source_hash=None, provenance=None):
+        """写入 pandas DataFrame（保留数值、日期列的类型），设置了 normalizer 时先规范化"""
+        frame = frame.set_axis(_column_names(list(frame.columns), len(frame.columns)), axis=1)
+        if self.normalizer is not None:
+            frame = self.normalizer(frame)
+        columns = {}
+        for name, series in frame.items():
+            kind = series.dtype.kind if isinstance(series.dtype, np.dtype) else "O"
+            columns[name] = series.to_numpy() if kind in "biufM" else series.astype(object).tolist()
+        return self.put_columns(source, page, table_no, columns, source_hash, provenance)
+
+    def _switch(self, table_id, values):
+        """在写事务中把表格的目录索引切换到新版本目录，返回旧版本目录（没有时为None）
+
+        写事务使同一表格的并发写入（包括其他进程）依次切换，每次切换都能拿到上一个版本并删除，不会遗留目录。
+        """
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT directory FROM tables WHERE table_id = ?", (table_id,)).fetchone()
+            conn.execute(
+                "INSERT OR REPLACE INTO tables "
+                "(table_id, source, page, table_no, columns, n_rows, source_hash, created, directory) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values,
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        if row is None:
+            return None
+        return row["directory"] or table_id
+
+    def _directory(self, table_id):
+        """表格当前版本所在的目录名
+
+        Raises:
+            KeyError: 表格不存在
+        """
+        row = self._connect().execute("SELECT directory FROM tables WHERE table_id = ?", (table_id,)).fetchone()
+        if row is None:
+            raise KeyError(table_id)
+        return row["directory"] or table_id
+
+    def remove_source(self, source):
+        """删除某个来源文件的全部表格"""
+        conn = self._connect()
+        rows = conn.execute("SELECT table_id, directory FROM tables WHERE source = ?", (source,)).fetchall()
+        conn.execute("DELETE FROM tables WHERE source = ?", (source,))
+        conn.execute("DELETE FROM sources WHERE source = ?", (source,))
+        for row in rows:
+            directory = row["directory"] or row["table_id"]
+            shutil.rmtree(os.path.join(self.tables_dir, directory), ignore_errors=True)
+            with self._cache_lock:
+                self._cache.pop(directory, None)
+
+    def find(self, source=None, page=None, table_no=None):
+        """按来源、页码、表格序号检索目录"""
+        clauses, params = [], []
+        for column, value in (("source", source), ("page", page), ("table_no", table_no)):
+            if value is not None:
+                clauses.append(f"{column} = ?")
+                params.append(value)
+        sql = "SELECT * FROM tables"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY source, page, table_no"
+        return [self._entry(row) for row in self._connect().execute(sql, params).fetchall()]
+
+    def get(self, table_id):
+        """获取目录条目，不存在时返回None"""
+        row = self._connect().execute("SELECT * FROM tables WHERE table_id = ?", (table_id,)).fetchone()
+        return self._entry(row) if row is not None else None
+
+    def _meta(self, directory):
+        """版本目录的元数据，按版本目录缓存（版本目录写入后不再修改）"""
+        with self._cache_lock:
+            cached = self._cache.get(directory)
+        if cached is not None:
+            return cached
+        path = os.path.join(self.tables_dir, directory)
+        with open(os.path.join(path, "meta.json"), encoding="utf-8") as f:
+            meta = json.load(f)
+        meta["by_name"] = {column["name"]: column for column in meta["columns"]}
+        meta["directory"] = path
+        with self._cache_lock:
+            self._cache[directory] = meta
+        return meta
+
+    def read(self, table_id, columns=None):
+        """读取表格（内存映射，只加载请求的列）
+
+        Args:
+            table_id (str): 表格ID
+            columns (list): 需要的列名，默认全部列
+
+        Returns:
+            ColumnTable
+
+        Raises:
+            KeyError: 表格或列不存在
+        """
+        directory = self._directory(table_id)
+        while True:
+            try:
+                return self._read(directory, columns)
+            except FileNotFoundError:
+                # 读取期间表格被替换、旧版本目录已删除，按新版本重新读取；版本未变说明文件确实缺失
+                current = self._directory(table_id)
+                if current == directory:
+                    raise KeyError(table_id) from None
+                directory = current
+
+    def _read(self, directory, columns):
+        meta = self._meta(directory)
+        names = list(columns) if columns else [column["name"] for column in meta["columns"]]
+        directory = meta["directory"]
+        data, masks = {}, {}
+        for name in names:
+            column = meta["by_name"].get(name)
+            if column is None:
+                raise KeyError(name)
+            path = os.path.join(directory, column["file"] + ".npy")
+            # 空数组无法内存映射
+            data[name] = np.load(path, mmap_mode="r" if meta["n_rows"] else None, allow_pickle=False)
+            if column["nullable"]:
+                masks[name] = np.load(os.path.join(directory, column["file"] + ".mask.npy"), mmap_mode="r",
+                                      allow_pickle=False)
+        return ColumnTable(meta, data, masks)
+
+    def column_order(self, table_id, name, table=None):
+        """读取列的排序索引（内存映射），该列未建立索引时返回None
+
+        Args:
+            table (ColumnTable): 已读取的表格，提供时读取同一版本的索引
+        """
+        meta = table.meta if table is not None else self._meta(self._directory(table_id))
+        column = meta["by_name"].get(name)
+        if column is None:
+            raise KeyError(name)
+        if not column.get("indexed") or not meta["n_rows"]:
+            return None
+        path = os.path.join(meta["directory"], column["file"] + ".order.npy")
+        try:
+            return np.load(path, mmap_mode="r", allow_pickle=False)
+        except FileNotFoundError:
+            if table is None:
+                raise
+            # 已读取的版本在查询期间被替换删除，按未建立索引处理（列数据已映射，仍可读取）
+            return None
+
+    def _source_hash(self, source):
+        row = self._connect().execute("SELECT source_hash FROM sources WHERE source = ?", (source,)).fetchone()
+        return row["source_hash"] if row is not None else None
+
+    def _content_key(self, source_hash):
+        """来源文件的内容哈希加上规范化规则版本和是否合并续表，这些设置变化后视为内容变化"""
+        version = getattr(self.normalizer, "version", None) if self.normalizer is not None else None
+        key = f"{source_hash}:n{version}" if version is not None else source_hash
+        return f"{key}:stitch" if self.stitch else key
+
+    def _file_hash(self, path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return self._content_key(digest.hexdigest())
+
+    def _replace_source(self, source, source_hash, tables):
+        """用新的表格替换来源文件的全部表格，tables 为 [(页码, 序号, 写入函数)]"""
+        self.remove_source(source)
+        entries = [write(source, page, table_no, source_hash) for page, table_no, write in tables]
+        self._connect().execute(
+            "INSERT OR REPLACE INTO sources (source, source_hash) VALUES (?, ?)", (source, source_hash)
+        )
+        return entries
+
+    def ingest_tables(self, source, tables, pages=None, source_hash=None):
+        """写入一个PDF提取出的全部表格
+
+        Args:
+            source (str): 来源PDF文件名
+            tables (list): 行列表格式的表格列表（extract_tables 的返回值）
+            pages (list): 各表格所在页码
+            source_hash (str): PDF内容哈希，与已入库的相同时跳过
+
+        Returns:
+            list: 目录条目，内容未变化时为None
+        """
+        if source_hash is not None:
+            source_hash = self._content_key(source_hash)
+            if self._source_hash(source) == source_hash:
+                return None
+        pages = pages or [None] * len(tables)
+        return self._replace_source(source, source_hash or "", [
+            (page, number, lambda s, p, n, h, rows=rows: self.put_rows(s, p, n, rows, h))
+            for number, (rows, page) in enumerate(zip(tables, pages), start=1)
+        ])
+
+    def import_excel(self, path, source=None):
+        """导入表格提取输出的Excel文件（每个工作表一个表格，页码取自汇总工作表）
+
+        Returns:
+            list: 目录条目，文件未变化时为None
+        """
+        import pandas as pd
+        source = source or os.path.basename(path)
+        source_hash = self._file_hash(path)
+        if self._source_hash(source) == source_hash:
+            return None
+        # 不让pandas处理表头: 续表工作表的首行是数据行，不能被改写为 "Unnamed: N" 或去重后的列名
+        sheets = pd.read_excel(path, sheet_name=None, header=None)
+        pages = {}
+        summary = sheets.pop(SUMMARY_SHEET, None)
+        summary = _header_frame(summary) if summary is not None else None
+        if summary is not None and {"表格序号", "页码"} <= set(summary.columns):
+            pages = {int(number): int(page) for number, page in zip(summary["表格序号"], summary["页码"])}
+        raws = list(sheets.values())
+        frames = [_header_frame(raw) for raw in raws]
+        if self.stitch:
+            return self._replace_source(source, source_hash, self._stitch_sheets(source, raws, frames, pages))
+        tables = []
+        for number, frame in enumerate(frames, start=1):
+            tables.append((pages.get(number), number,
+                           lambda s, p, n, h, frame=frame: self.put_frame(s, p, n, frame, h)))
+        return self._replace_source(source, source_hash, tables)
+
+    def _stitch_sheets(self, source, raws, frames, pages):
+        """合并表格提取输出中跨页断开的工作表（旧的提取流程按页输出，续表是单独的工作表）
+
+        续表的首行可能是数据行，按原始行列表（raws，header=None 读取）合并；未合并的工作表仍按DataFrame写入，
+        保留列类型。没有页码的工作表不参与合并。工作表没有列边界和位置信息，只有重复了表头的续表会被合并。
+
+        Returns:
+            list: [(页码, 序号, 写入函数)]
+        """
+        try:
+            from .table_stitch import stitch_records
+        except ImportError:
+            from table_stitch import stitch_records
+        by_page = {}
+        for number, raw in enumerate(raws, start=1):
+            if pages.get(number) is not None and not raw.empty:
+                by_page.setdefault(pages[number], []).append((number, _sheet_rows(raw)))
+        records = stitch_records(
+            [{"page": page, "tables": [{"rows": rows} for _, rows in by_page[page]]} for page in sorted(by_page)],
+            source,
+        )
+
+        tables = []
+        for record in records:
+            provenance = [dict(item, table_no=by_page[item["page"]][item["index"]][0]) for item in record["provenance"]]
+            table_no = len(tables) + 1
+            if len(provenance) == 1:
+                frame = frames[provenance[0]["table_no"] - 1]
+                tables.append((record["page_start"], table_no,
+                               lambda s, p, n, h, frame=frame: self.put_frame(s, p, n, frame, h)))
+            else:
+                tables.append((record["page_start"], table_no,
+                               lambda s, p, n, h, rows=record["rows"], provenance=provenance:
+                               self.put_rows(s, p, n, rows, h, provenance)))
+        for number, frame in enumerate(frames, start=1):
+            if pages.get(number) is None:
+                tables.append((None, len(tables) + 1,
+                               lambda s, p, n, h, frame=frame: self.put_frame(s, p, n, frame, h)))
+        return tables
+
+    def import_csv(self, path, source=None):
+        """导入CSV文件（作为一个表格）"""
+        import pandas as pd
+        source = source or os.path.basename(path)
+        source_hash = self._file_hash(path)
+        if self._source_hash(source) == source_hash:
+            return None
+        frame = pd.read_csv(path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+        return self._replace_source(source, source_hash, [
+            (None, 1, lambda s, p, n, h: self.put_frame(s, p, n, frame, h))
+        ])
+
+    def import_directory(self, directory):
+        """导入目录下的全部 .xlsx / .csv 文件，未变化的文件跳过
+
+        Returns:
+            dict: {"imported": 导入的文件数, "unchanged": 跳过的文件数, "failed": {文件名: 错误}}
+        """
+        summary = {"imported": 0, "unchanged": 0, "failed": {}}
+        if not os.path.isdir(directory):
+            return summary
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            lower = name.lower()
+            if name.startswith(("~$", ".")) or not lower.endswith((".xlsx", ".csv")):
+                continue
+            try:
+                result = self.import_excel(path) if lower.endswith(".xlsx") else self.import_csv(path)
+            except Exception as e:
+                logger.warning(f"表格文件导入失败 {name}: {e}")
+                summary["failed"][name] = str(e)
+                continue
+            summary["imported" if result is not None else "unchanged"] += 1
+        return summary
+
+    def get_stats(self):
+        row = self._connect().execute(
+            "SELECT COUNT(*) AS tables, COUNT(DISTINCT source) AS sources, COALESCE(SUM(n_rows), 0) AS rows "
+            "FROM tables"
+        ).fetchone()
+        return {"tables": row["tables"], "sources": row["sources"], "rows": row["rows"]}
+
+
+_default_store = None
+_default_lock = threading.Lock()
+
+
+def get_table_store():
+    """获取按 TABLE_STORE_CONFIG 创建的进程级表格存储实例，未开启时返回None"""
+    global _default_store
+    if _default_store is None:
+        with _default_lock:
+            if _default_store is None:
+                _default_store = TableStore.from_config(TABLE_STORE_CONFIG) or False
+    return _default_store or None
@@ -0,0 +1,115 @@
+"""
+泰迪杯项目 - 表格流式输出
+功能: 逐页解析PDF，每个表格解析完成后立即以NDJSON或SSE推送给客户端，
+      客户端不必等待整个文件解析完成，服务端内存占用与页数无关
+"""
+
+import json
+import logging
+
+from starlette.background import BackgroundTask
+from starlette.responses import StreamingResponse
+
+try:
+    from .pdf_tables import iter_table_records, cache_version
+    from .extraction_cache import get_extraction_cache
+except ImportError:
+    from pdf_tables import iter_table_records, cache_version
+    from extraction_cache import get_extraction_cache
+
+logger = logging.getLogger(__name__)
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+def negotiate_format(fmt=None, accept=""):
+    """按查询参数或Accept请求头选择输出格式，默认NDJSON"""
+    if fmt in MEDIA_TYPES:
+        return fmt
+    if "text/event-stream" in (accept or ""):
+        return "sse"
+    return "ndjson"
+
+
+def table_records(pdf_path, cache=None):
+    """产出表格记录，已缓存的文件直接读取缓存，完整解析后写入缓存
+
+    Yields:
+        dict: {"index", "page_start", "page_end", "rows"}，缓存命中时页码为None
+    """
+    cache = cache or get_extraction_cache()
+    version = cache_version()
+    if cache is not None:
+        hit, tables = cache.get(pdf_path, "tables", version)
+        if hit:
+            for index, rows in enumerate(tables):
+                yield {"index": index, "page_start": None, "page_end": None, "rows": rows}
+            return
+
+    tables = []
+    for index, record in enumerate(iter_table_records(pdf_path)):
+        tables.append(record["rows"])
+        yield dict(record, index=index)
+    # 客户端中途断开时生成器被关闭，不会执行到这里，不完整的结果不写入缓存
+    if cache is not None:
+        cache.put(pdf_path, "tables", tables, version)
+
+
+def ndjson_lines(records):
+    """每个表格一行JSON，解析出错时输出 {"error": ...} 后结束"""
+    try:
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False) + "\n"
+    except Exception as e:
+        logger.error(f"表格流式解析失败: {str(e)}")
+        yield json.dumps({"error": str(e)}, ensure_ascii=False) + "\n"
+
+
+def sse_events(records):
+    """每个表格一个 table 事件，结束时发送 end 事件，出错时发送 error 事件"""
+    count = 0
+    try:
+        for record in records:
+            count += 1
+            yield f"event: table\ndata: {json.dumps(record, ensure_ascii=False)}\n\n"
+    except Exception as e:
+        logger.error(f"表格流式解析失败: {str(e)}")
+        yield f"event: error\ndata: {json.dumps({'error': str(e)}, ensure_ascii=False)}\n\n"
+        return
+    yield f"event: end\ndata: {json.dumps({'table_count': count})}\n\n"
+
+
+def _closing(body, on_close):
+    """响应体结束、出错或客户端断开（生成器被关闭）时调用 on_close"""
+    try:
+        yield from body
+    finally:
+        on_close()
+
+
+def table_stream_response(pdf_path, fmt="ndjson", cache=None, on_close=None):
+    """创建流式响应（同步生成器由Starlette放到线程池中逐块执行，不阻塞事件循环）
+
+    Args:
+        pdf_path (str): PDF文件路径
+        fmt (str): ndjson / sse
+        cache (ExtractionCache): 提取结果缓存
+        on_close (callable): 响应体结束后调用，如删除上传的临时文件；可能被调用多次
+    """
+    records = table_records(pdf_path, cache)
+    body = sse_events(records) if fmt == "sse" else ndjson_lines(records)
+    background = None
+    if on_close is not None:
+        body = _closing(body, on_close)
+        # 响应体未开始发送时生成器的 finally 不会执行，由后台任务兜底
+        background = BackgroundTask(on_close)
+    return StreamingResponse(
+        body,
+        media_type=MEDIA_TYPES[fmt],
+        # 关闭反向代理缓冲，表格解析后立即到达客户端
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        background=background,
+    )
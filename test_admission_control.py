@@ -0,0 +1,181 @@
+"""
+准入控制测试
+测试通道并发上限、有界队列、按预计等待时间拒绝及轻量请求的保留通道
+"""
+
+import os
+import sys
+import asyncio
+
+import httpx
+import pytest
+from fastapi import FastAPI, Request
+from starlette.responses import StreamingResponse
+
+# 确保能导入同目录下的准入控制模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from admission_control import AdmissionController, AdmissionLane, Overloaded
+
+
+class TestAdmissionLane:
+    """通道测试类"""
+
+    def test_fifo_handoff(self):
+        """测试超出并发上限的请求排队，并按到达顺序获得名额"""
+        async def run():
+            lane = AdmissionLane("qa", max_concurrency=1, max_queue=5, deadline=1.0)
+            order = []
+
+            async def worker(i):
+                await lane.acquire()
+                order.append(i)
+                await asyncio.sleep(0.01)
+                lane.release(0.01)
+
+            await asyncio.gather(*(worker(i) for i in range(4)))
+            return lane, order
+
+        lane, order = asyncio.run(run())
+        assert order == [0, 1, 2, 3]
+        assert lane.active == 0 and not lane.waiters
+        assert lane.get_stats()["admitted"] == 4
+
+    def test_queue_full_and_deadline(self):
+        """测试队列已满或预计等待超过截止时间时立即拒绝"""
+        async def run():
+            lane = AdmissionLane("qa", max_concurrency=1, max_queue=1, deadline=1.0)
+            await lane.acquire()
+            waiter = asyncio.ensure_future(lane.acquire())
+            await asyncio.sleep(0)
+            with pytest.raises(Overloaded) as full:
+                await lane.acquire()
+
+            lane.max_queue = 10
+            lane.avg_service = 2.0
+            with pytest.raises(Overloaded) as deadline:
+                await lane.acquire()
+
+            lane.release(2.0)
+            await waiter
+            lane.release(2.0)
+            return lane, full.value, deadline.value
+
+        lane, full, deadline = asyncio.run(run())
+        assert full.reason == "queue_full"
+        assert deadline.reason == "deadline" and deadline.retry_after > 1.0
+        assert lane.rejected == 2
+        assert lane.active == 0
+
+    def test_timeout_and_cancel_do_not_leak(self):
+        """测试排队超时和客户端取消后名额不泄漏"""
+        async def run():
+            lane = AdmissionLane("qa", max_concurrency=1, max_queue=5, deadline=0.05)
+            await lane.acquire()
+            with pytest.raises(Overloaded) as timeout:
+                await lane.acquire()
+
+            cancelled = asyncio.ensure_future(lane.acquire())
+            await asyncio.sleep(0)
+            cancelled.cancel()
+            with pytest.raises(asyncio.CancelledError):
+                await cancelled
+
+            lane.release(0.01)
+            assert lane.active == 0 and not lane.waiters
+            await lane.acquire()
+            return lane, timeout.value
+
+        lane, timeout = asyncio.run(run())
+        assert timeout.reason == "timeout"
+        assert lane.timed_out == 1
+        assert lane.active == 1
+
+
+class TestAdmissionController:
+    """准入控制中间件测试类"""
+
+    def test_overload_returns_503_and_light_lane_stays_open(self):
+        """测试问答通道饱和时返回503，健康检查不受影响"""
+        controller = AdmissionController.from_config({
+            'enabled': True,
+            'lanes': {
+                'qa': {'max_concurrency': 1, 'max_queue': 1, 'deadline': 5.0},
+                'light': {'max_concurrency': 4, 'max_queue': 4, 'deadline': 1.0},
+            },
+            'routes': {'/api/ask': 'qa', '/health': 'light'},
+        })
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def admission_middleware(request: Request, call_next):
+            return await controller.handle(request, call_next)
+
+        release = asyncio.Event()
+
+        @app.get("/api/ask")
+        async def ask():
+            await release.wait()
+            return {"answer": "ok"}
+
+        @app.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                first = asyncio.ensure_future(client.get("/api/ask"))
+                second = asyncio.ensure_future(client.get("/api/ask"))
+                while controller.lanes["qa"].active < 1 or len(controller.lanes["qa"].waiters) < 1:
+                    await asyncio.sleep(0.01)
+                rejected = await client.get("/api/ask")
+                health = await client.get("/health")
+                release.set()
+                return rejected, health, await first, await second
+
+        rejected, health, first, second = asyncio.run(run())
+        assert rejected.status_code == 503
+        assert rejected.headers["Retry-After"] == "5"
+        assert rejected.json()["reason"] == "queue_full"
+        assert health.status_code == 200
+        assert first.status_code == 200 and second.status_code == 200
+        assert float(second.headers["X-Queue-Wait"]) > 0
+        assert controller.get_stats()["qa"]["rejected"] == 1
+
+    def test_streaming_body_holds_lane(self):
+        """测试流式响应在响应体发送完成后才释放名额"""
+        controller = AdmissionController.from_config({
+            'enabled': True,
+            'lanes': {'extraction': {'max_concurrency': 1, 'max_queue': 1, 'deadline': 5.0}},
+            'routes': {'/api/tables': 'extraction'},
+        })
+        lane = controller.lanes["extraction"]
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def admission_middleware(request: Request, call_next):
+            return await controller.handle(request, call_next)
+
+        active_during_body = []
+
+        async def body():
+            for part in (b"a", b"b", b"c"):
+                await asyncio.sleep(0.01)
+                active_during_body.append(lane.active)
+                yield part
+
+        @app.get("/api/tables/stream")
+        async def stream():
+            return StreamingResponse(body())
+
+        async def run():
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await client.get("/api/tables/stream")
+
+        response = asyncio.run(run())
+        assert response.content == b"abc"
+        assert active_during_body == [1, 1, 1]
+        assert lane.active == 0
+        assert lane.avg_service >= 0.03
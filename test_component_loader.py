@@ -0,0 +1,116 @@
+"""
+组件依赖加载器测试
+测试并发加载、依赖顺序、超时、重试与失败降级
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+# 确保能导入同目录下的加载器模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from component_loader import ComponentLoader
+
+
+def sleeper(seconds, log=None, name=None):
+    """返回一个阻塞指定秒数的加载函数"""
+    def load():
+        time.sleep(seconds)
+        if log is not None:
+            log.append(name)
+        return True
+    return load
+
+
+class TestComponentLoader:
+    """组件加载器测试类"""
+
+    def test_independent_components_load_concurrently(self):
+        """测试无依赖的组件并发加载，且不阻塞事件循环"""
+        loader = ComponentLoader(max_workers=4)
+        for name in ("a", "b", "c"):
+            loader.register(name, sleeper(0.2))
+
+        async def run():
+            ticks = 0
+
+            async def ticker():
+                nonlocal ticks
+                while True:
+                    await asyncio.sleep(0.01)
+                    ticks += 1
+
+            task = asyncio.create_task(ticker())
+            start = time.perf_counter()
+            report = await loader.load_all()
+            task.cancel()
+            return report, time.perf_counter() - start, ticks
+
+        report, elapsed, ticks = asyncio.run(run())
+        assert report["status"] == "completed"
+        assert elapsed < 0.5
+        assert ticks >= 5
+        assert all(info["duration"] >= 0.2 for info in report["components"].values())
+
+    def test_dependencies_run_in_order(self):
+        """测试组件在其依赖加载完成后才开始"""
+        log = []
+        loader = ComponentLoader(dependencies={"graph": ["base"], "qa": ["base"]})
+        loader.register("graph", sleeper(0, log, "graph"))
+        loader.register("qa", sleeper(0, log, "qa"))
+        loader.register("base", sleeper(0.05, log, "base"))
+
+        report = asyncio.run(loader.load_all())
+        assert log[0] == "base"
+        assert report["components"]["graph"]["depends_on"] == ["base"]
+        assert loader.is_loaded("qa")
+
+    def test_retry_then_success(self):
+        """测试失败后按配置重试"""
+        calls = []
+
+        def flaky():
+            calls.append(threading.get_ident())
+            if len(calls) == 1:
+                raise RuntimeError("暂时不可用")
+            return True
+
+        loader = ComponentLoader(retries=2, retry_delay=0)
+        loader.register("flaky", flaky)
+        report = asyncio.run(loader.load_all())
+        assert report["components"]["flaky"]["status"] == "loaded"
+        assert report["components"]["flaky"]["attempts"] == 2
+
+    def test_failure_and_timeout_degrade_dependents(self):
+        """测试失败或超时的组件使下游组件被跳过，其余组件照常加载"""
+        loader = ComponentLoader(retries=1, retry_delay=0, dependencies={"qa": ["broken"], "graph": ["slow"]})
+        loader.register("broken", lambda: False)
+        loader.register("slow", sleeper(0.5), timeout=0.05)
+        loader.register("qa", sleeper(0))
+        loader.register("graph", sleeper(0))
+        loader.register("tables", sleeper(0))
+
+        report = asyncio.run(loader.load_all())
+        components = report["components"]
+        assert report["status"] == "degraded"
+        assert components["broken"]["status"] == "failed"
+        assert components["broken"]["attempts"] == 2
+        assert components["slow"]["status"] == "timeout"
+        assert components["slow"]["attempts"] == 1
+        assert components["qa"]["status"] == "skipped"
+        assert components["graph"]["status"] == "skipped"
+        assert components["tables"]["status"] == "loaded"
+
+    def test_cycle_is_rejected(self):
+        """测试循环依赖报错"""
+        loader = ComponentLoader(dependencies={"a": ["b"], "b": ["a"]})
+        loader.register("a", sleeper(0))
+        loader.register("b", sleeper(0))
+        with pytest.raises(ValueError):
+            asyncio.run(loader.load_all())
+        assert loader.load_status == "pending"
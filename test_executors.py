@@ -0,0 +1,129 @@
+"""
+同步任务执行器测试
+测试线程池/进程池执行、按任务名路由、有界队列及客户端断开后取消任务
+"""
+
+import os
+import sys
+import time
+import asyncio
+import threading
+
+import pytest
+
+# 确保能导入同目录下的执行器模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from executors import ExecutorPool, ExecutorRegistry, ExecutorBusy, ClientDisconnected
+from request_tracing import start_trace, finish_trace, span
+
+
+def square(x):
+    """进程池任务需为模块级函数"""
+    return x * x
+
+
+class FakeRequest:
+    """模拟已断开的客户端"""
+
+    def __init__(self, disconnected=True):
+        self.disconnected = disconnected
+
+    async def is_disconnected(self):
+        return self.disconnected
+
+
+def make_registry(**pool_options):
+    pools = {
+        "io": ExecutorPool("io", kind="thread", max_workers=2, max_queue=2, **pool_options),
+        "cpu": ExecutorPool("cpu", kind="process", max_workers=1, max_queue=4, mp_context="spawn"),
+    }
+    return ExecutorRegistry(pools, routes={"qa.search": "cpu"}, default_pool="io", disconnect_poll_interval=0.01)
+
+
+class TestExecutorRegistry:
+    """执行器测试类"""
+
+    def test_routing(self):
+        """测试按任务名选择执行池，未配置的任务使用默认池"""
+        registry = make_registry()
+        assert registry.pool_for("qa.search").name == "cpu"
+        assert registry.pool_for("qa.evaluate").name == "io"
+
+    def test_thread_pool_keeps_trace_context(self):
+        """测试线程池中的 span() 仍上报到当前请求的追踪记录"""
+        registry = make_registry()
+
+        def work():
+            with span("retrieval"):
+                return threading.current_thread().name
+
+        async def run():
+            trace, token = start_trace("GET /api/ask")
+            name = await registry.run("qa.evaluate", work)
+            finish_trace(trace, token)
+            return trace, name
+
+        try:
+            trace, name = asyncio.run(run())
+        finally:
+            registry.shutdown(wait=True)
+        assert name.startswith("executor-io")
+        assert "retrieval" in trace.stage_totals()
+        assert registry.get_stats()["pools"]["io"]["completed"] == 1
+
+    def test_process_pool(self):
+        """测试进程池执行模块级函数"""
+        registry = make_registry()
+        try:
+            result = asyncio.run(registry.run("qa.search", square, 7))
+        finally:
+            registry.shutdown(wait=True)
+        assert result == 49
+
+    def test_queue_full(self):
+        """测试执行中和排队任务数达到上限时拒绝新任务"""
+        pool = ExecutorPool("io", kind="thread", max_workers=1, max_queue=1)
+        release = threading.Event()
+        try:
+            pool.submit(release.wait)
+            pool.submit(release.wait)
+            with pytest.raises(ExecutorBusy):
+                pool.submit(release.wait)
+            assert pool.get_stats()["rejected"] == 1
+        finally:
+            release.set()
+            pool.shutdown(wait=True)
+        assert pool.pending == 0
+
+    def test_cancel_on_disconnect(self):
+        """测试客户端断开后取消尚未开始的任务"""
+        registry = make_registry()
+        pool = registry.pools["io"]
+        release = threading.Event()
+        started = []
+
+        def blocked():
+            release.wait()
+
+        def queued():
+            started.append(True)
+
+        async def run():
+            # 占满两个工作线程，后续任务只能排队
+            busy = [pool.submit(blocked) for _ in range(2)]
+            with pytest.raises(ClientDisconnected):
+                await registry.run("qa.evaluate", queued, request=FakeRequest())
+            release.set()
+            return busy
+
+        try:
+            busy = asyncio.run(run())
+            for future in busy:
+                future.result(timeout=5)
+        finally:
+            release.set()
+            registry.shutdown(wait=True)
+        time.sleep(0.05)
+        assert not started
+        assert pool.get_stats()["cancelled"] == 1
@@ -0,0 +1,146 @@
+"""
+PDF提取结果缓存测试
+测试内容相同的文件共享缓存、提取器版本失效、按大小淘汰以及提取方法挂载
+"""
+
+import os
+import sys
+import time
+import types
+
+import pytest
+
+# 确保能导入同目录下的缓存模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import extraction_cache
+from extraction_cache import ExtractionCache, install
+
+
+@pytest.fixture
+def copies(tmp_path):
+    """内容相同的两个PDF副本及一个不同的文件"""
+    paths = []
+    for name, content in (("test_copy_1.pdf", b"%PDF same"), ("test_copy_2.pdf", b"%PDF same"),
+                          ("other.pdf", b"%PDF other")):
+        path = tmp_path / name
+        path.write_bytes(content)
+        paths.append(str(path))
+    return paths
+
+
+class TestExtractionCache:
+    """提取结果缓存测试类"""
+
+    def test_identical_copies_share_entry(self, tmp_path, copies):
+        """测试内容相同的副本只计算一次，不同内容单独计算"""
+        cache = ExtractionCache(str(tmp_path / "cache"))
+        calls = []
+
+        def compute(path):
+            calls.append(path)
+            return [[["赛项名称"], [os.path.basename(path)]]]
+
+        first = cache.get_or_compute(copies[0], "tables", lambda: compute(copies[0]))
+        second = cache.get_or_compute(copies[1], "tables", lambda: compute(copies[1]))
+        cache.get_or_compute(copies[2], "tables", lambda: compute(copies[2]))
+        assert first == second
+        assert calls == [copies[0], copies[2]]
+        assert cache.get_stats()["hits"] == 1
+
+    def test_version_and_kind_in_key(self, tmp_path, copies):
+        """测试提取器版本或结果类型不同时不复用缓存"""
+        cache = ExtractionCache(str(tmp_path / "cache"))
+        cache.put(copies[0], "tables", ["v1"], extractor_version="1")
+        assert cache.get(copies[0], "tables", extractor_version="1") == (True, ["v1"])
+        assert cache.get(copies[0], "tables", extractor_version="2") == (False, None)
+        assert cache.get(copies[0], "text", extractor_version="1") == (False, None)
+
+        upgraded = ExtractionCache(str(tmp_path / "cache"), version="2")
+        assert upgraded.get(copies[0], "tables", extractor_version="1") == (False, None)
+
+    def test_size_eviction(self, tmp_path):
+        """测试超出大小上限时淘汰最久未使用的条目"""
+        cache = ExtractionCache(str(tmp_path / "cache"), max_bytes=2500)
+        paths = []
+        for i in range(3):
+            path = tmp_path / f"doc{i}.pdf"
+            path.write_bytes(f"doc{i}".encode())
+            paths.append(str(path))
+        cache.put(paths[0], "text", "x" * 1000)
+        cache.put(paths[1], "text", "y" * 1000)
+        # 访问第一个条目，使第二个条目成为最久未使用
+        time.sleep(0.01)
+        assert cache.get(paths[0], "text")[0]
+        cache.put(paths[2], "text", "z" * 1000)
+
+        assert cache.get(paths[1], "text") == (False, None)
+        assert cache.get(paths[0], "text")[0] and cache.get(paths[2], "text")[0]
+        assert cache.get_stats()["evictions"] == 1
+        assert cache.get_stats()["size_bytes"] <= 2500
+
+    def test_install_on_extractor(self, tmp_path, copies, monkeypatch):
+        """测试为提取器类的方法挂载缓存，带额外参数的调用不走缓存"""
+        module = types.ModuleType("fake_extract_tables")
+
+        class TableExtractor:
+            calls = 0
+
+            def extract_tables(self, pdf_path, pages=None):
+                TableExtractor.calls += 1
+                return [[["p"]]]
+
+        module.TableExtractor = TableExtractor
+        monkeypatch.setitem(sys.modules, "fake_extract_tables", module)
+
+        cache = ExtractionCache(str(tmp_path / "cache"))
+        targets = {"fake_extract_tables:TableExtractor.extract_tables": "tables",
+                   "missing.module:TextExtractor.extract_text": "text"}
+        assert install(targets, cache=cache) == ["fake_extract_tables:TableExtractor.extract_tables"]
+        install(targets, cache=cache)
+
+        extractor = TableExtractor()
+        extractor.extract_tables(copies[0])
+        extractor.extract_tables(copies[1])
+        extractor.extract_tables(copies[1], pages=[1])
+        assert TableExtractor.calls == 2
+
+    def test_target_version_change_misses(self, tmp_path, copies, monkeypatch):
+        """测试目标的提取器版本或提取代码变化后缓存不命中"""
+        module = types.ModuleType("fake_extract_text")
+        calls = []
+
+        def old_code(self, pdf_path):
+            calls.append(pdf_path)
+            return "text"
+
+        def new_code(self, pdf_path):
+            calls.append(pdf_path)
+            return "new " + "text"
+
+        def make_extractor(code):
+            # 模块没有源文件，按方法的字节码计算代码版本
+            code.__module__ = "fake_extract_text"
+            return type("TextExtractor", (), {"extract_text": code})
+
+        monkeypatch.setitem(sys.modules, "fake_extract_text", module)
+        cache = ExtractionCache(str(tmp_path / "cache"))
+        target = "fake_extract_text:TextExtractor.extract_text"
+
+        for version in ("1", "1", "2"):
+            module.TextExtractor = make_extractor(old_code)
+            install({target: {"kind": "text", "version": version}}, cache=cache)
+            module.TextExtractor().extract_text(copies[0])
+        assert len(calls) == 2
+
+        # 提取代码修改后，版本号不变也不命中
+        module.TextExtractor = make_extractor(new_code)
+        install({target: {"kind": "text", "version": "2"}}, cache=cache)
+        assert module.TextExtractor().extract_text(copies[0]) == "new text"
+        assert len(calls) == 3
+
+    def test_default_cache_disabled(self, monkeypatch):
+        """测试配置关闭时不创建缓存"""
+        monkeypatch.setattr(extraction_cache, "_default_cache", None)
+        monkeypatch.setitem(extraction_cache.EXTRACTION_CACHE_CONFIG, "enabled", False)
+        assert extraction_cache.get_extraction_cache() is None
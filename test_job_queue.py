@@ -0,0 +1,216 @@
+"""
+提取任务队列测试
+测试任务持久化、按内容哈希去重、逐页进度、失败重试及工作进程执行
+"""
+
+import os
+import sys
+import time
+import asyncio
+
+import pytest
+
+# 确保能导入同目录下的任务队列模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from job_queue import JobStore, JobQueue, UploadTooLarge
+
+
+def fake_extract(path, progress, filename=None):
+    """模拟逐页提取: 文件每行视为一页"""
+    with open(path, encoding="utf-8") as f:
+        pages = f.read().splitlines()
+    if "boom" in pages:
+        raise RuntimeError("解析失败")
+    for index in range(len(pages)):
+        progress(index + 1, len(pages))
+    return {"tables": [[[page]] for page in pages], "table_count": len(pages)}
+
+
+async def chunks(*parts):
+    for part in parts:
+        yield part
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestJobStore:
+    """任务表测试类"""
+
+    def test_dedup_by_content_hash(self, tmp_path):
+        """测试相同内容哈希的任务只创建一次"""
+        store = JobStore(str(tmp_path / "jobs.db"))
+        first, dedup_first = store.submit("abc", "/tmp/a.pdf", "a.pdf")
+        second, dedup_second = store.submit("abc", "/tmp/a.pdf", "a_copy.pdf")
+        assert not dedup_first and dedup_second
+        assert first["job_id"] == second["job_id"]
+        assert store.counts()["queued"] == 1
+
+    def test_run_with_progress(self, tmp_path):
+        """测试执行任务并记录逐页进度与结果"""
+        pdf = tmp_path / "doc.pdf"
+        pdf.write_text("p1\np2\np3", encoding="utf-8")
+        store = JobStore(str(tmp_path / "jobs.db"))
+        job, _ = store.submit("h1", str(pdf))
+
+        assert store.run_next(fake_extract)
+        assert not store.run_next(fake_extract)
+        status = store.get(job["job_id"])
+        assert status["status"] == "done"
+        assert status["progress"] == {"pages_done": 3, "pages_total": 3, "percent": 100.0}
+        assert store.result(job["job_id"])["table_count"] == 3
+
+    def test_failed_job_requeued_on_resubmit(self, tmp_path):
+        """测试失败的任务记录错误，重新提交后再次排队"""
+        pdf = tmp_path / "bad.pdf"
+        pdf.write_text("boom", encoding="utf-8")
+        store = JobStore(str(tmp_path / "jobs.db"))
+        job, _ = store.submit("h2", str(pdf))
+        store.run_next(fake_extract)
+        assert store.get(job["job_id"])["error"] == "解析失败"
+        assert store.result(job["job_id"]) is None
+
+        again, deduplicated = store.submit("h2", str(pdf))
+        assert not deduplicated
+        assert again["job_id"] == job["job_id"] and again["status"] == "queued"
+
+    def test_stale_running_job_reclaimed(self, tmp_path):
+        """测试工作进程退出后遗留的运行中任务重新执行，超过次数后标记失败"""
+        clock = FakeClock()
+        store = JobStore(str(tmp_path / "jobs.db"), stale_after=10, max_attempts=2, clock=clock)
+        job, _ = store.submit("h3", "/tmp/x.pdf")
+        assert store.claim()["job_id"] == job["job_id"]
+        assert store.claim() is None
+
+        clock.now += 11
+        assert store.claim()["job_id"] == job["job_id"]
+        assert store.get(job["job_id"])["attempts"] == 2
+
+        clock.now += 11
+        assert store.claim() is None
+        assert store.get(job["job_id"])["status"] == "failed"
+
+    def test_connection_opened_lazily_per_process(self, tmp_path, monkeypatch):
+        """测试创建任务表时不打开连接，fork出的子进程重新打开连接"""
+        store = JobStore(str(tmp_path / "jobs.db"))
+        assert getattr(store._local, "conn", None) is None
+        conn = store._connect()
+        assert store._connect() is conn
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+        assert store._connect() is not conn
+        assert store.counts()["queued"] == 0
+
+    def test_reclaimed_job_ignores_previous_worker(self, tmp_path):
+        """测试任务被重新取出后，原工作进程的进度、心跳和结果不再写入"""
+        clock = FakeClock()
+        store = JobStore(str(tmp_path / "jobs.db"), stale_after=10, max_attempts=3, clock=clock)
+        job, _ = store.submit("h4", "/tmp/x.pdf")
+        first = store.claim()
+        clock.now += 11
+        second = store.claim()
+        assert second["attempts"] == first["attempts"] + 1
+
+        assert not store.progress(job["job_id"], first["attempts"], 1, 2)
+        assert not store.heartbeat(job["job_id"], first["attempts"])
+        assert not store.complete(job["job_id"], first["attempts"], {"stale": True})
+        assert store.get(job["job_id"])["status"] == "running"
+
+        assert store.complete(job["job_id"], second["attempts"], {"stale": False})
+        assert store.result(job["job_id"]) == {"stale": False}
+        assert not store.fail(job["job_id"], second["attempts"], "late")
+
+    def test_heartbeat_without_page_progress(self, tmp_path):
+        """测试单页耗时超过 stale_after 时，心跳使任务不被重新取出"""
+        store = JobStore(str(tmp_path / "jobs.db"), stale_after=0.3, heartbeat_interval=0.05)
+        job, _ = store.submit("h5", "/tmp/x.pdf")
+        claimed = []
+
+        def slow_page(path, progress, filename):
+            time.sleep(0.8)
+            claimed.append(store.claim())
+            return {"table_count": 0}
+
+        assert store.run_next(slow_page)
+        assert claimed == [None]
+        status = store.get(job["job_id"])
+        assert status["status"] == "done" and status["attempts"] == 1
+
+
+class TestJobQueue:
+    """任务队列测试类"""
+
+    def make_queue(self, tmp_path, **kwargs):
+        store = JobStore(str(tmp_path / "jobs.db"))
+        return JobQueue(store, str(tmp_path / "uploads"), "test_job_queue:fake_extract", **kwargs)
+
+    def test_upload_dedup(self, tmp_path):
+        """测试重复上传相同内容只保存一个文件、只创建一个任务"""
+        queue = self.make_queue(tmp_path, workers=0)
+
+        async def run():
+            first = await queue.submit_upload(chunks(b"p1\n", b"p2"), "a.pdf")
+            second = await queue.submit_upload(chunks(b"p1\np2"), "b.pdf")
+            return first, second
+
+        first, second = asyncio.run(run())
+        assert first["job_id"] == second["job_id"]
+        assert second["deduplicated"]
+        assert os.listdir(tmp_path / "uploads") == [first["content_hash"] + ".pdf"]
+        assert queue.get_stats()["deduplicated"] == 1
+
+    def test_upload_limits(self, tmp_path):
+        """测试超过大小限制和空上传被拒绝，且不留下临时文件"""
+        queue = self.make_queue(tmp_path, workers=0, max_upload_bytes=4)
+        with pytest.raises(UploadTooLarge):
+            asyncio.run(queue.submit_upload(chunks(b"123", b"456")))
+        with pytest.raises(ValueError):
+            asyncio.run(queue.submit_upload(chunks()))
+        assert os.listdir(tmp_path / "uploads") == []
+
+    def test_stream_upload_removed(self, tmp_path):
+        """测试流式解析的上传文件保存在单独的临时目录，删除后不影响任务的上传文件"""
+        queue = self.make_queue(tmp_path, workers=0)
+        job = asyncio.run(queue.submit_upload(chunks(b"p1"), "a.pdf"))
+        _, path = asyncio.run(queue.save_stream_upload(chunks(b"p1")))
+        assert os.path.exists(path)
+        queue.remove_stream_upload(path)
+        assert os.listdir(tmp_path / "uploads") == [job["content_hash"] + ".pdf"]
+
+    def test_sweep_uploads(self, tmp_path):
+        """测试超过保留期的上传文件被删除，排队中任务的文件保留"""
+        clock = FakeClock()
+        clock.now = time.time()
+        queue = self.make_queue(tmp_path, workers=0, upload_retention=60, clock=clock)
+        done = asyncio.run(queue.submit_upload(chunks(b"p1"), "a.pdf"))
+        assert queue.store.run_next(fake_extract)
+        queued = asyncio.run(queue.submit_upload(chunks(b"p2"), "b.pdf"))
+        asyncio.run(queue.save_stream_upload(chunks(b"left over")))
+
+        assert queue.sweep_uploads() == 0
+        clock.now += 61
+        # 已完成任务的文件和遗留的临时目录被删除
+        assert queue.sweep_uploads() == 2
+        assert os.listdir(tmp_path / "uploads") == [queued["content_hash"] + ".pdf"]
+        assert queue.store.result(done["job_id"])["table_count"] == 1
+        assert queue.get_stats()["uploads_removed"] == 2
+
+    def test_worker_processes(self, tmp_path):
+        """测试工作进程取出任务执行"""
+        queue = self.make_queue(tmp_path, workers=1, poll_interval=0.05, mp_context="spawn")
+        queue.start()
+        try:
+            job = asyncio.run(queue.submit_upload(chunks(b"p1\np2"), "doc.pdf"))
+            deadline = time.monotonic() + 20
+            while queue.store.get(job["job_id"])["status"] != "done":
+                assert time.monotonic() < deadline, "任务未在限定时间内完成"
+                time.sleep(0.05)
+        finally:
+            queue.stop()
+        assert queue.store.result(job["job_id"])["tables"] == [[["p1"]], [["p2"]]]
+        assert not queue.processes
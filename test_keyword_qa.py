@@ -0,0 +1,263 @@
+"""
+关键词问答引擎测试
+测试KeywordQA倒排索引的加载、检索与旧版行为的一致性
+"""
+
+import os
+import sys
+import json
+import threading
+
+import pytest
+
+# 确保能导入同目录下的问答引擎模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from qa_engine import KeywordQA
+
+# 样本知识文件
+SAMPLE_FILES = ["sample.txt", "sample_knowledge.txt"]
+TEST_QUESTIONS = [
+    "泰迪杯比赛的时间是什么时候？",
+    "比赛地点在哪里？",
+    "参赛有哪些要求？",
+    "如何报名参加比赛？",
+    "机器人工程挑战赛主要考察什么？",
+    "无人机比赛分几个组别？",
+]
+
+
+def legacy_build(qa, directory):
+    """按旧版实现构建 {关键词: [段落列表]} 知识库，作为对照"""
+    knowledge_base = {}
+    for filename in sorted(os.listdir(directory)):
+        if not filename.endswith('.txt'):
+            continue
+        with open(os.path.join(directory, filename), 'r', encoding='utf-8') as f:
+            content = f.read()
+        for para in content.split('\n\n'):
+            para = para.strip()
+            if para:
+                for keyword in qa.extract_keywords(para):
+                    knowledge_base.setdefault(keyword, [])
+                    if para not in knowledge_base[keyword]:
+                        knowledge_base[keyword].append(para)
+    return knowledge_base
+
+
+def legacy_search(qa, knowledge_base, query, top_k=5):
+    """旧版计数检索"""
+    results = {}
+    for keyword in qa.extract_keywords(query):
+        for para in knowledge_base.get(keyword, []):
+            results[para] = results.get(para, 0) + 1
+    sorted_results = sorted(results.items(), key=lambda x: x[1], reverse=True)
+    return [para for para, weight in sorted_results[:top_k]]
+
+
+@pytest.fixture
+def knowledge_dir(tmp_path):
+    """复制样本知识文件到临时目录"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    for name in SAMPLE_FILES:
+        with open(os.path.join(root, name), 'r', encoding='utf-8') as f:
+            content = f.read()
+        # 重复写入一份，验证跨文件去重
+        (tmp_path / name).write_text(content, encoding='utf-8')
+        (tmp_path / f"copy_{name}").write_text(content, encoding='utf-8')
+    return str(tmp_path)
+
+
+class TestKeywordIndex:
+    """倒排索引测试类"""
+
+    def test_paragraphs_stored_once(self, knowledge_dir):
+        """测试段落只存储一次"""
+        qa = KeywordQA(knowledge_dir)
+        paragraphs = qa.index.paragraphs
+        assert len(paragraphs) == len(set(paragraphs))
+        assert qa.index.paragraph_count > 0
+
+    def test_matches_legacy_mapping(self, knowledge_dir):
+        """测试兼容视图与旧版知识库结构一致"""
+        qa = KeywordQA(knowledge_dir)
+        assert qa.knowledge_base == legacy_build(qa, knowledge_dir)
+
+    def test_search_matches_legacy(self, knowledge_dir):
+        """测试检索结果与旧版实现一致"""
+        qa = KeywordQA(knowledge_dir)
+        knowledge_base = legacy_build(qa, knowledge_dir)
+        for question in TEST_QUESTIONS:
+            for top_k in (1, 3, 5, 50):
+                assert qa.search(question, top_k) == legacy_search(qa, knowledge_base, question, top_k)
+
+    def test_answer_without_match(self, knowledge_dir):
+        """测试无匹配时的默认回答"""
+        qa = KeywordQA(knowledge_dir)
+        result = qa.answer("量子纠缠")
+        assert result["answer_count"] == 0
+
+    def test_json_round_trip(self, knowledge_dir, tmp_path):
+        """测试JSON格式知识库的保存与加载"""
+        qa = KeywordQA(knowledge_dir)
+        filepath = str(tmp_path / "knowledge_base.json")
+        qa.save_knowledge_base(filepath)
+        with open(filepath, 'r', encoding='utf-8') as f:
+            assert json.load(f) == qa.knowledge_base
+
+        restored = KeywordQA(str(tmp_path / "missing"))
+        restored.load_knowledge_base(filepath)
+        for question in TEST_QUESTIONS:
+            assert restored.search(question) == qa.search(question)
+
+
+class TestScoring:
+    """检索打分测试类"""
+
+    @pytest.mark.parametrize("scoring", ["tfidf", "bm25"])
+    def test_top_k_matches_full_sort(self, knowledge_dir, scoring):
+        """测试堆选top_k与全量排序结果一致"""
+        qa = KeywordQA(knowledge_dir)
+        for question in TEST_QUESTIONS:
+            keywords = qa.extract_keywords(question)
+            scores = qa.index.score(keywords, scoring)
+            expected = sorted(scores.items(), key=lambda x: x[1], reverse=True)[:3]
+            assert qa.search(question, 3, scoring=scoring) == [qa.index.get_paragraph(i) for i, _ in expected]
+
+    def test_bm25_prefers_specific_terms(self, knowledge_dir):
+        """测试BM25对低频关键词赋予更高权重"""
+        qa = KeywordQA(knowledge_dir, scoring="bm25")
+        results = qa.search("无人机编队飞行")
+        assert results and "无人机" in results[0]
+
+    def test_invalid_scoring(self, knowledge_dir):
+        """测试不支持的打分方式"""
+        with pytest.raises(ValueError):
+            KeywordQA(knowledge_dir, scoring="pagerank")
+        qa = KeywordQA(knowledge_dir)
+        with pytest.raises(ValueError):
+            qa.search("比赛时间", scoring="pagerank")
+
+
+class TestSnapshot:
+    """二进制快照测试类"""
+
+    def test_snapshot_round_trip(self, knowledge_dir, tmp_path):
+        """测试快照保存后检索结果不变"""
+        qa = KeywordQA(knowledge_dir)
+        snapshot_path = str(tmp_path / "knowledge_base.kqa")
+        qa.save_knowledge_base(snapshot_path)
+
+        restored = KeywordQA(str(tmp_path / "missing"), snapshot_path=snapshot_path)
+        assert type(restored.index).__name__ == "SnapshotIndex"
+        assert restored.knowledge_base == qa.knowledge_base
+        for question in TEST_QUESTIONS:
+            for scoring in ("count", "tfidf", "bm25"):
+                assert restored.search(question, scoring=scoring) == qa.search(question, scoring=scoring)
+
+    def test_snapshot_is_read_only(self, knowledge_dir, tmp_path):
+        """测试快照索引不可修改"""
+        qa = KeywordQA(knowledge_dir)
+        snapshot_path = str(tmp_path / "knowledge_base.kqa")
+        qa.save_knowledge_base(snapshot_path)
+        restored = KeywordQA(str(tmp_path / "missing"), snapshot_path=snapshot_path)
+        with pytest.raises(TypeError):
+            restored.index.add_paragraph("新段落", ["新段落"])
+
+    def test_corrupt_snapshot_falls_back(self, knowledge_dir, tmp_path):
+        """测试损坏的快照回退到目录加载"""
+        snapshot_path = tmp_path / "broken.kqa"
+        snapshot_path.write_bytes(b"KQASNAP\x00" + b"\x01" * 16)
+        qa = KeywordQA(knowledge_dir, snapshot_path=str(snapshot_path))
+        assert qa.index.paragraph_count > 0
+
+
+class TestIncrementalReload:
+    """增量重新加载测试类"""
+
+    def test_reload_without_changes(self, knowledge_dir):
+        """测试文件未变化时不重建索引"""
+        qa = KeywordQA(knowledge_dir)
+        index = qa.index
+        changes = qa.reload()
+        assert not changes["added"] and not changes["changed"] and not changes["removed"]
+        assert qa.index is index
+
+    def test_reload_detects_changes(self, knowledge_dir):
+        """测试新增、修改、删除文件后的增量加载"""
+        qa = KeywordQA(knowledge_dir)
+        os.remove(os.path.join(knowledge_dir, "copy_sample.txt"))
+        with open(os.path.join(knowledge_dir, "sample.txt"), 'a', encoding='utf-8') as f:
+            f.write("\n\n航天模型专项赛将在酒泉举办，面向中学生开放报名。")
+        with open(os.path.join(knowledge_dir, "new.txt"), 'w', encoding='utf-8') as f:
+            f.write("编程马拉松赛事持续二十四小时。")
+
+        changes = qa.reload()
+        assert changes["added"] == ["new.txt"]
+        assert changes["changed"] == ["sample.txt"]
+        assert changes["removed"] == ["copy_sample.txt"]
+        assert "酒泉" in qa.search("航天模型专项赛在哪里举办")[0]
+
+        # 增量结果与全量重建一致
+        rebuilt = KeywordQA(knowledge_dir)
+        assert qa.knowledge_base == rebuilt.knowledge_base
+        assert qa.index.paragraphs == rebuilt.index.paragraphs
+
+    def test_reload_with_trailing_slash(self, knowledge_dir):
+        """测试目录带末尾斜杠时删除的文件同样从索引中移除"""
+        qa = KeywordQA(knowledge_dir + os.sep)
+        with open(os.path.join(knowledge_dir, "other.txt"), 'w', encoding='utf-8') as f:
+            f.write("书法比赛在周末举行。")
+        qa.reload()
+        count = qa.index.paragraph_count
+        os.remove(os.path.join(knowledge_dir, "other.txt"))
+
+        changes = qa.reload()
+        assert changes["removed"] == ["other.txt"]
+        assert qa.index.paragraph_count == count - 1
+        assert not any("书法比赛" in para for para in qa.search("书法比赛"))
+
+    def test_touch_without_content_change(self, knowledge_dir):
+        """测试仅修改时间变化时按内容哈希判断为未变更"""
+        qa = KeywordQA(knowledge_dir)
+        filepath = os.path.join(knowledge_dir, "sample.txt")
+        stat = os.stat(filepath)
+        os.utime(filepath, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        changes = qa.reload()
+        assert "sample.txt" in changes["unchanged"]
+
+    def test_queries_during_reload(self, knowledge_dir):
+        """测试重新加载期间查询不受影响"""
+        qa = KeywordQA(knowledge_dir)
+        expected = qa.search("机器人工程挑战赛")
+        errors = []
+
+        def query():
+            for _ in range(50):
+                try:
+                    assert qa.search("机器人工程挑战赛") == expected
+                except Exception as e:
+                    errors.append(e)
+
+        thread = threading.Thread(target=query)
+        thread.start()
+        with open(os.path.join(knowledge_dir, "other.txt"), 'w', encoding='utf-8') as f:
+            f.write("书法比赛在周末举行。")
+        qa.reload()
+        thread.join()
+        assert not errors
+
+
+class TestParallelBuild:
+    """并行构建索引测试类"""
+
+    def test_parallel_matches_serial(self, knowledge_dir, monkeypatch):
+        """测试多进程构建结果与单进程一致"""
+        serial = KeywordQA(knowledge_dir, max_workers=1)
+        monkeypatch.setattr(KeywordQA, "parallel_min_bytes", 0)
+        parallel = KeywordQA(knowledge_dir, max_workers=3)
+        assert parallel.index.paragraphs == serial.index.paragraphs
+        assert parallel.knowledge_base == serial.knowledge_base
+        assert list(parallel.index.postings) == list(serial.index.postings)
+        for question in TEST_QUESTIONS:
+            assert parallel.search(question, scoring="bm25") == serial.search(question, scoring="bm25")
@@ -0,0 +1,121 @@
+"""
+请求延迟直方图测试
+测试LatencyHistogram的分位数精度、RateWindow速率统计及Prometheus导出
+"""
+
+import os
+import sys
+import random
+
+# 确保能导入同目录下的指标模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from latency_metrics import LatencyHistogram, LatencyRegistry, RateWindow, MAX_TRACKABLE_US
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 500.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestLatencyHistogram:
+    """延迟直方图测试类"""
+
+    def test_percentile_precision(self):
+        """测试分位数相对误差在桶精度以内"""
+        rng = random.Random(7)
+        values = [int(rng.lognormvariate(9, 1.2)) for _ in range(20000)]
+        histogram = LatencyHistogram()
+        for value in values:
+            histogram.record(value)
+        values.sort()
+        for quantile, estimate in zip((0.5, 0.95, 0.99), histogram.percentiles([0.5, 0.95, 0.99])):
+            exact = values[int(quantile * len(values)) - 1]
+            assert abs(estimate - exact) / exact < 0.04
+        assert histogram.percentiles([1.0]) == [max(values)]
+
+    def test_constant_memory(self):
+        """测试桶数量固定，超大值计入最后一个桶"""
+        histogram = LatencyHistogram()
+        size = len(histogram.counts)
+        for value in (0, 1, 63, 64, 10 ** 6, MAX_TRACKABLE_US * 10):
+            histogram.record(value)
+        assert len(histogram.counts) == size
+        assert histogram.total == 6
+        assert histogram.max_us == MAX_TRACKABLE_US * 10
+
+    def test_count_at_or_below(self):
+        """测试按阈值统计请求数"""
+        histogram = LatencyHistogram()
+        for value in (1000, 2000, 40000, 900000):
+            histogram.record(value)
+        assert histogram.count_at_or_below(5000) == 2
+        assert histogram.count_at_or_below(1000000) == 4
+
+
+class TestRateWindow:
+    """请求速率测试类"""
+
+    def test_sliding_rate(self):
+        clock = FakeClock()
+        window = RateWindow(clock=clock)
+        for second in range(10):
+            for _ in range(second):
+                window.record()
+            clock.now += 1
+        assert window.rate(10) == sum(range(10)) / 10
+        # 超过窗口的数据不再计入
+        clock.now += 100
+        assert window.rate(10) == 0
+
+
+class TestLatencyRegistry:
+    """路由延迟汇总测试类"""
+
+    def test_snapshot_and_prometheus(self):
+        clock = FakeClock()
+        registry = LatencyRegistry(clock=clock)
+        for i in range(100):
+            registry.record("GET /api/tables", (i + 1) * 1000 * 1000, success=i % 10 != 0)
+        snapshot = registry.snapshot()["routes"]["GET /api/tables"]
+        assert snapshot["count"] == 100 and snapshot["errors"] == 10
+        assert 49 <= snapshot["p50_ms"] <= 52
+        assert snapshot["max_ms"] == 100
+
+        text = registry.render_prometheus()
+        assert 'teddy_http_request_duration_seconds_bucket{route="GET /api/tables",le="+Inf"} 100' in text
+        # 按桶上界近似，跨越阈值的桶不计入，误差不超过一个桶
+        assert 9 <= self.bucket_count(text, "0.01") <= 10
+        assert 48 <= self.bucket_count(text, "0.05") <= 50
+        assert 'teddy_http_request_errors_total{route="GET /api/tables"} 10' in text
+
+    @staticmethod
+    def bucket_count(text, le):
+        bucket = 'teddy_http_request_duration_seconds_bucket{route="GET /api/tables",le="%s"} ' % le
+        return int(text.split(bucket)[1].split("\n")[0])
+
+    def test_route_limit(self):
+        """测试路由数上限"""
+        registry = LatencyRegistry(max_routes=3)
+        for i in range(10):
+            registry.record(f"GET /item/{i}", 1000)
+        assert len(registry.routes) == 4
+        assert registry.routes[LatencyRegistry.OVERFLOW_ROUTE].histogram.total == 7
+
+    def test_unmatched_requests_share_one_route(self):
+        """测试未匹配路由的请求（404）统一记为 UNMATCHED，不会把真实路由挤到 OTHER"""
+        class Route:
+            path = "/api/tables/{table_id}"
+
+        registry = LatencyRegistry(max_routes=3)
+        for i in range(50):
+            registry.record(LatencyRegistry.route_name({"method": "GET", "path": f"/random/{i}"}), 1000)
+        name = LatencyRegistry.route_name({"method": "GET", "path": "/api/tables/1", "route": Route()})
+        assert name == "GET /api/tables/{table_id}"
+        registry.record(name, 1000)
+        assert set(registry.routes) == {LatencyRegistry.UNMATCHED_ROUTE, name}
@@ -0,0 +1,93 @@
+"""
+路由延迟加载测试
+测试路由模块在首个需要它的请求到达时才导入并注册
+"""
+
+import os
+import sys
+import tempfile
+import textwrap
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# 确保能导入同目录下的延迟加载模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from lazy_routers import LazyRouterRegistry
+
+ROUTER_SOURCE = textwrap.dedent('''
+    from fastapi import APIRouter
+
+    router = APIRouter()
+
+    @router.get("/{name}")
+    async def hello():
+        return {"router": "{name}"}
+''')
+
+
+class TestLazyRouters:
+    """路由延迟加载测试类"""
+
+    def setup_method(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        package = os.path.join(self.tmpdir.name, "lazy_pkg")
+        os.makedirs(package)
+        open(os.path.join(package, "__init__.py"), "w").close()
+        for name in ("ask", "tables", "pages"):
+            with open(os.path.join(package, f"{name}_router.py"), "w", encoding="utf-8") as f:
+                f.write(ROUTER_SOURCE.replace("{name}", name))
+        sys.path.insert(0, self.tmpdir.name)
+
+        self.app = FastAPI()
+        self.loaded = []
+        self.registry = LazyRouterRegistry(self.app, load_all_paths=["/openapi.json"])
+        self.registry.add("lazy_pkg.ask_router", prefix="/api", paths=["/api/ask"])
+        self.registry.add("lazy_pkg.tables_router", prefix="/api", paths=["/api/tables"])
+        self.registry.add("lazy_pkg.pages_router")
+        self.registry.add("lazy_pkg.missing_router", optional=True)
+        self.registry.on_load(self.loaded.append)
+
+        @self.app.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+        @self.app.middleware("http")
+        async def lazy_router_middleware(request: Request, call_next):
+            await self.registry.ensure_for_request(request.scope)
+            return await call_next(request)
+
+        self.client = TestClient(self.app)
+
+    def teardown_method(self):
+        sys.path.remove(self.tmpdir.name)
+        for name in list(sys.modules):
+            if name.startswith("lazy_pkg"):
+                del sys.modules[name]
+        self.tmpdir.cleanup()
+
+    def test_router_loaded_on_first_matching_request(self):
+        """测试只在请求匹配时导入对应路由模块"""
+        assert self.client.get("/health").status_code == 200
+        assert "lazy_pkg.ask_router" not in sys.modules
+
+        response = self.client.get("/api/ask")
+        assert response.json() == {"router": "ask"}
+        assert self.loaded == ["lazy_pkg.ask_router"]
+        assert "lazy_pkg.tables_router" not in sys.modules
+        assert self.registry.status()["lazy_pkg.ask_router"]["status"] == "loaded"
+
+    def test_unmatched_request_loads_remaining_routers(self):
+        """测试未匹配任何路由的请求加载全部待加载路由，缺失的可选模块不报错"""
+        assert self.client.get("/pages").json() == {"router": "pages"}
+        status = self.registry.status()
+        assert status["lazy_pkg.tables_router"]["status"] == "loaded"
+        assert status["lazy_pkg.missing_router"]["status"] == "unavailable"
+        assert not self.registry.pending
+        assert self.client.get("/api/tables").json() == {"router": "tables"}
+
+    def test_openapi_includes_lazy_routes(self):
+        """测试访问文档时加载全部路由"""
+        paths = self.client.get("/openapi.json").json()["paths"]
+        assert {"/api/ask", "/api/tables", "/pages", "/health"} <= set(paths)
@@ -0,0 +1,168 @@
+"""
+PDF表格逐页提取测试
+测试跨页续表合并、页码分片以及并行提取与顺序提取结果一致
+"""
+
+import os
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+# 确保能导入同目录下的表格提取模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import pdf_tables
+from pdf_tables import stitch_tables, page_shards, extract_tables, extract_tables_parallel, iter_tables, extract_job
+from table_store import TableStore
+from extraction_cache import ExtractionCache
+
+
+class FakeTable:
+    def __init__(self, rows, top, bottom):
+        self.rows = rows
+        self.bbox = (0, top, 500, bottom)
+
+    def extract(self):
+        return [list(row) for row in self.rows]
+
+
+class FakePage:
+    def __init__(self, page_number, tables, height=800):
+        self.page_number = page_number
+        self.height = height
+        self.tables = tables
+
+    def find_tables(self):
+        self.parsed = True
+        return self.tables
+
+    def flush_cache(self):
+        pass
+
+
+class FakePDF:
+    def __init__(self, pages):
+        self.pages = pages
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+def make_document(page_count):
+    """每页一个表格: 偶数页的表格延续到页面底部，下一页顶部续表并重复表头"""
+    header = ["赛项名称", "赛道"]
+    pages = []
+    for number in range(1, page_count + 1):
+        if number % 2:
+            table = FakeTable([header, [f"赛项{number}", "A"]], top=400, bottom=780)
+        else:
+            table = FakeTable([header, [f"赛项{number}", "B"]], top=20, bottom=300)
+        pages.append(FakePage(number, [table]))
+    return pages
+
+
+@pytest.fixture
+def fake_pdf(monkeypatch):
+    pages = make_document(20)
+    monkeypatch.setattr(pdf_tables, "_open_pdf", lambda path: FakePDF(pages))
+    return pages
+
+
+def page(number, *tables, height=800):
+    return {"page": number, "height": height,
+            "tables": [{"rows": rows, "top": top, "bottom": bottom} for rows, top, bottom in tables]}
+
+
+class TestStitchTables:
+    """跨页续表合并测试类"""
+
+    def test_merge_continuation_and_drop_repeated_header(self):
+        """测试贴近页边且列数相同的表格合并，重复表头被去掉"""
+        pages = [
+            page(1, ([["h1", "h2"], ["a", "1"]], 500, 790)),
+            page(2, ([["h1", "h2"], ["b", "2"]], 10, 200)),
+        ]
+        assert stitch_tables(pages) == [[["h1", "h2"], ["a", "1"], ["b", "2"]]]
+
+    def test_keep_separate_tables(self):
+        """测试不贴近页边、列数不同或页码不相邻的表格不合并"""
+        pages = [
+            page(1, ([["h1", "h2"]], 100, 300)),
+            page(2, ([["h1", "h2"]], 10, 790)),
+            page(3, ([["x", "y", "z"]], 10, 790)),
+            page(5, ([["x", "y", "z"]], 10, 200)),
+        ]
+        assert len(stitch_tables(pages)) == 4
+
+    def test_chain_across_several_pages(self):
+        """测试整页表格连续跨越多页"""
+        pages = [page(n, ([["h"], [str(n)]], 10, 790)) for n in range(1, 4)]
+        assert stitch_tables(pages) == [[["h"], ["1"], ["2"], ["3"]]]
+
+
+class TestParallelExtraction:
+    """分片并行提取测试类"""
+
+    def test_page_shards(self):
+        """测试页序号切分为连续区间"""
+        assert page_shards(10, 4) == [(0, 4), (4, 8), (8, 10)]
+        assert page_shards(0, 4) == []
+
+    def test_parallel_matches_sequential(self, fake_pdf):
+        """测试分片提取的结果与顺序提取一致（分片边界上的续表同样被合并）"""
+        sequential = extract_tables("doc.pdf")
+        progress = []
+        with ThreadPoolExecutor(max_workers=3) as executor:
+            parallel = extract_tables_parallel(
+                "doc.pdf", progress=lambda done, total: progress.append((done, total)),
+                pages_per_shard=3, executor=executor,
+            )
+        assert parallel == sequential
+        assert len(sequential) == 10
+        assert progress[-1] == (20, 20)
+
+    def test_small_document_sequential(self, fake_pdf, monkeypatch):
+        """测试页数较少时不创建进程池"""
+        monkeypatch.setitem(pdf_tables.TABLE_PROCESSOR_CONFIG, "min_parallel_pages", 100)
+        monkeypatch.setattr(pdf_tables, "ProcessPoolExecutor", None)
+        assert extract_tables_parallel("doc.pdf", workers=4) == extract_tables("doc.pdf")
+
+
+class TestIterTables:
+    """逐页产出表格测试类"""
+
+    def test_yields_before_later_pages_parsed(self, fake_pdf):
+        """测试表格在所在页（续表为最后一页）解析后立即产出"""
+        tables = iter_tables("doc.pdf")
+        first = next(tables)
+        assert first == [["赛项名称", "赛道"], ["赛项1", "A"], ["赛项2", "B"]]
+        assert [getattr(p, "parsed", False) for p in fake_pdf[:3]] == [True, True, False]
+        tables.close()
+
+    def test_matches_extract_tables(self, fake_pdf):
+        """测试生成器版本与 extract_tables 结果一致"""
+        assert list(iter_tables("doc.pdf")) == extract_tables("doc.pdf")
+        assert list(iter_tables("doc.pdf", stitch=False)) == extract_tables("doc.pdf", stitch=False)
+
+
+class TestExtractJob:
+    """后台提取任务测试类"""
+
+    def test_results_ingested_into_store(self, fake_pdf, tmp_path, monkeypatch):
+        """测试任务的提取结果按上传文件名写入表格存储，内容未变化时不重复写入"""
+        pdf = tmp_path / "0123abcd.pdf"
+        pdf.write_bytes(b"%PDF test")
+        store = TableStore(str(tmp_path / "store"))
+        monkeypatch.setattr(pdf_tables, "get_table_store", lambda: store)
+        monkeypatch.setattr(pdf_tables, "get_extraction_cache", lambda: ExtractionCache(str(tmp_path / "cache")))
+        monkeypatch.setitem(pdf_tables.TABLE_PROCESSOR_CONFIG, "page_parallel", False)
+
+        result = extract_job(str(pdf), filename="rules.pdf")
+        assert result["table_count"] == 10
+        assert [entry["table_id"] for entry in store.find(source="rules.pdf")] == result["table_ids"]
+        assert store.read(result["table_ids"][0]).to_rows()[2] == ["赛项2", "B"]
+        assert extract_job(str(pdf), filename="rules.pdf")["table_ids"] == result["table_ids"]
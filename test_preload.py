@@ -0,0 +1,97 @@
+"""
+预加载测试
+测试索引快照的构建与新旧判断，以及共享组件只加载一次
+"""
+
+import os
+import sys
+import time
+import tempfile
+
+# 确保能导入同目录下的预加载模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import preload
+from knowledge_snapshot import SnapshotIndex
+
+
+def write_knowledge(directory, name, content):
+    with open(os.path.join(directory, name), "w", encoding="utf-8") as f:
+        f.write(content)
+
+
+class TestPreload:
+    """预加载测试类"""
+
+    def test_snapshot_rebuilt_only_when_stale(self):
+        """测试快照只在知识文件更新后重建"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            knowledge_dir = os.path.join(tmpdir, "knowledge")
+            os.makedirs(knowledge_dir)
+            write_knowledge(knowledge_dir, "rules.txt", "泰迪杯竞赛报名时间为每年三月")
+            snapshot_path = os.path.join(tmpdir, "cache", "kb.kqa")
+
+            assert preload.build_qa_snapshot(knowledge_dir, snapshot_path)
+            assert preload.snapshot_is_fresh(snapshot_path, knowledge_dir)
+            assert not preload.build_qa_snapshot(knowledge_dir, snapshot_path)
+
+            future = time.time() + 10
+            write_knowledge(knowledge_dir, "awards.txt", "获奖队伍将获得证书和奖金")
+            os.utime(os.path.join(knowledge_dir, "awards.txt"), (future, future))
+            assert not preload.snapshot_is_fresh(snapshot_path, knowledge_dir)
+            assert preload.build_qa_snapshot(knowledge_dir, snapshot_path)
+
+    def test_warm_start_loads_snapshot_once(self):
+        """测试共享组件从快照加载且重复调用直接复用"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_knowledge(tmpdir, "rules.txt", "泰迪杯竞赛报名时间为每年三月")
+            snapshot_path = os.path.join(tmpdir, "kb.kqa")
+            preload.build_qa_snapshot(tmpdir, snapshot_path)
+
+            preload._warm_components.clear()
+            try:
+                components = preload.warm_start(tmpdir, snapshot_path)
+                keyword_qa = preload.get_warm_component("keyword_qa")
+                assert isinstance(keyword_qa.index, SnapshotIndex)
+                assert keyword_qa.search("报名时间")
+                assert preload.warm_start(tmpdir, snapshot_path)["keyword_qa"] is keyword_qa
+                assert "tokenizer" in components
+                keyword_qa.index.close()
+            finally:
+                preload._warm_components.clear()
+
+    def test_warm_start_rebuilds_stale_snapshot(self):
+        """测试知识文件更新后 warm_start 重建过期快照，而不是加载旧索引"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_knowledge(tmpdir, "rules.txt", "泰迪杯竞赛报名时间为每年三月")
+            snapshot_path = os.path.join(tmpdir, "kb.kqa")
+            preload.build_qa_snapshot(tmpdir, snapshot_path)
+            future = time.time() + 10
+            write_knowledge(tmpdir, "awards.txt", "获奖队伍将获得证书和奖金")
+            os.utime(os.path.join(tmpdir, "awards.txt"), (future, future))
+
+            preload._warm_components.clear()
+            try:
+                keyword_qa = preload.warm_start(tmpdir, snapshot_path)["keyword_qa"]
+                assert isinstance(keyword_qa.index, SnapshotIndex)
+                assert any("奖金" in para for para in keyword_qa.search("获奖奖金"))
+                assert not os.path.exists(snapshot_path + ".lock")
+                keyword_qa.index.close()
+            finally:
+                preload._warm_components.clear()
+
+    def test_warm_start_skips_snapshot_while_rebuilding(self):
+        """测试其他进程正在重建快照时从知识目录构建，不加载过期快照"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            write_knowledge(tmpdir, "rules.txt", "泰迪杯竞赛报名时间为每年三月")
+            snapshot_path = os.path.join(tmpdir, "kb.kqa")
+            open(snapshot_path + ".lock", "w").close()
+
+            preload._warm_components.clear()
+            try:
+                keyword_qa = preload.warm_start(tmpdir, snapshot_path)["keyword_qa"]
+                assert not isinstance(keyword_qa.index, SnapshotIndex)
+                assert keyword_qa.search("报名时间")
+                assert not os.path.exists(snapshot_path)
+            finally:
+                preload._warm_components.clear()
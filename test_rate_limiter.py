@@ -0,0 +1,169 @@
+"""
+令牌桶限流测试
+测试令牌补充、按客户端和路由隔离、SQLite共享存储及429响应
+"""
+
+import os
+import sys
+import time
+import sqlite3
+import tempfile
+import threading
+
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+# 确保能导入同目录下的限流模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from rate_limiter import MemoryBucketStore, RateLimiter, SQLiteBucketStore
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestTokenBucket:
+    """令牌桶存储测试类"""
+
+    def test_refill_and_retry_after(self):
+        """测试突发容量耗尽后按速率补充"""
+        clock = FakeClock()
+        store = MemoryBucketStore(clock=clock)
+        results = [store.take("c|*", rate=1.0, capacity=3)[0] for _ in range(4)]
+        assert results == [True, True, True, False]
+
+        allowed, _, retry_after = store.take("c|*", rate=1.0, capacity=3)
+        assert not allowed and retry_after == 1.0
+        clock.now += 1.0
+        assert store.take("c|*", rate=1.0, capacity=3)[0]
+
+    def test_idle_buckets_pruned(self):
+        """测试超出上限时清理已回满的桶"""
+        clock = FakeClock()
+        store = MemoryBucketStore(max_keys=2, clock=clock)
+        store.take("a", rate=1.0, capacity=2)
+        store.take("b", rate=1.0, capacity=2)
+        clock.now += 5
+        store.take("c", rate=1.0, capacity=2)
+        assert set(store.buckets) == {"c"}
+
+    def test_sqlite_store_shared_between_instances(self):
+        """测试两个SQLite存储实例（模拟两个工作进程）共享计数"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "limits.db")
+            clock = FakeClock()
+            first = SQLiteBucketStore(path, clock=clock)
+            second = SQLiteBucketStore(path, clock=clock)
+            assert first.take("c|*", rate=1.0, capacity=2)[0]
+            assert second.take("c|*", rate=1.0, capacity=2)[0]
+            assert not first.take("c|*", rate=1.0, capacity=2)[0]
+            clock.now += 1
+            assert second.take("c|*", rate=1.0, capacity=2)[0]
+
+    def test_sqlite_lock_contention_fails_open_off_loop(self):
+        """测试SQLite写锁被占用时请求很快放行，且存储访问不在事件循环线程中执行"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = os.path.join(tmpdir, "limits.db")
+            store = SQLiteBucketStore(path)
+            threads = []
+            original_take = store.take
+
+            def take(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return original_take(*args, **kwargs)
+
+            store.take = take
+            limiter = RateLimiter(requests_per_minute=60, store=store)
+            app = FastAPI()
+
+            @app.middleware("http")
+            async def rate_limit_middleware(request: Request, call_next):
+                return await limiter.handle(request, call_next)
+
+            @app.get("/api/tables")
+            async def tables():
+                return {"thread": threading.current_thread().name}
+
+            holder = sqlite3.connect(path, isolation_level=None)
+            holder.execute("BEGIN IMMEDIATE")
+            try:
+                client = TestClient(app)
+                started = time.monotonic()
+                response = client.get("/api/tables")
+                assert response.status_code == 200
+                assert time.monotonic() - started < 1
+                assert limiter.get_stats()["store_errors"] == 1
+                assert threads and threads[0].name != response.json()["thread"]
+            finally:
+                holder.execute("ROLLBACK")
+                holder.close()
+
+
+class TestRateLimiter:
+    """限流中间件测试类"""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.limiter = RateLimiter(
+            requests_per_minute=60, burst=2, routes={"/api/ask": 1},
+            exempt_paths=["/health"], store=MemoryBucketStore(clock=self.clock),
+            trust_forwarded_for=True,
+        )
+        app = FastAPI()
+
+        @app.middleware("http")
+        async def rate_limit_middleware(request: Request, call_next):
+            return await self.limiter.handle(request, call_next)
+
+        @app.get("/api/ask")
+        async def ask():
+            return {"answer": "ok"}
+
+        @app.get("/api/tables")
+        async def tables():
+            return {"tables": []}
+
+        @app.get("/health")
+        async def health():
+            return {"status": "ok"}
+
+        self.client = TestClient(app)
+
+    def get(self, path, client="10.0.0.1"):
+        return self.client.get(path, headers={"X-Forwarded-For": client})
+
+    def test_returns_429_with_retry_after(self):
+        """测试超限返回429和Retry-After"""
+        first = self.get("/api/ask")
+        assert first.status_code == 200
+        assert first.headers["X-RateLimit-Limit"] == "1"
+        limited = self.get("/api/ask")
+        assert limited.status_code == 429
+        assert limited.headers["Retry-After"] == "60"
+        assert self.limiter.get_stats()["limited"] == {"/api/ask": 1}
+
+    def test_clients_and_routes_isolated(self):
+        """测试批量客户端耗尽令牌不影响其他客户端和其他路由"""
+        assert self.get("/api/ask", "batch").status_code == 200
+        assert self.get("/api/ask", "batch").status_code == 429
+        assert self.get("/api/ask", "interactive").status_code == 200
+        assert self.get("/api/tables", "batch").status_code == 200
+
+    def test_exempt_paths_and_prometheus(self):
+        """测试豁免路径不计数，计数可导出为Prometheus格式"""
+        for _ in range(5):
+            assert self.get("/health").status_code == 200
+        assert self.limiter.get_stats()["allowed"] == {}
+        self.get("/api/tables")
+        self.get("/api/tables")
+        self.get("/api/tables")
+        text = self.limiter.render_prometheus()
+        assert 'teddy_http_rate_limit_allowed_total{group="*"} 2' in text
+        assert 'teddy_http_rate_limited_total{group="*"} 1' in text
@@ -0,0 +1,104 @@
+"""
+请求分阶段计时测试
+测试span/traced上报、Server-Timing格式、方法挂载及慢请求记录
+"""
+
+import os
+import sys
+import asyncio
+import tempfile
+
+# 确保能导入同目录下的追踪模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from request_tracing import (
+    SlowTraceLog, Trace, current_trace, finish_trace, instrument, span, start_trace, traced
+)
+from qa_engine import KeywordQA
+
+
+class Evaluator:
+    """模拟答案评估器"""
+
+    def evaluate(self, answer):
+        return len(answer)
+
+
+class TestRequestTracing:
+    """分阶段计时测试类"""
+
+    def test_span_without_trace_is_noop(self):
+        """测试未开启追踪时span不记录也不报错"""
+        assert current_trace() is None
+        with span("tokenize"):
+            pass
+        assert current_trace() is None
+
+    def test_spans_and_server_timing(self):
+        """测试阶段汇总与Server-Timing头格式"""
+        trace, token = start_trace("POST /api/ask")
+        with span("tokenize"):
+            pass
+        with span("retrieval"):
+            pass
+        with span("retrieval"):
+            pass
+        finish_trace(trace, token, 200)
+
+        assert current_trace() is None
+        totals = trace.stage_totals()
+        assert list(totals) == ["tokenize", "retrieval"]
+        assert totals["retrieval"][1] == 2
+        header = trace.server_timing()
+        assert header.startswith("tokenize;dur=")
+        assert header.endswith(f"total;dur={trace.duration_ns / 1e6:.2f}")
+        data = trace.to_dict()
+        assert data["status_code"] == 200
+        assert data["stages"]["retrieval"]["count"] == 2
+        assert len(data["spans"]) == 3
+
+    def test_traced_async_and_instrument(self):
+        """测试异步函数计时及对已有类方法的挂载（不重复包装）"""
+        @traced("session_io")
+        async def save_session():
+            await asyncio.sleep(0)
+            return "ok"
+
+        assert instrument(Evaluator, "evaluate", "evaluate")
+        assert instrument(Evaluator, "evaluate", "evaluate")
+        assert not instrument(Evaluator, "missing", "missing")
+
+        async def handler():
+            trace, token = start_trace("POST /api/ask")
+            assert await save_session() == "ok"
+            assert Evaluator().evaluate("答案") == 2
+            return finish_trace(trace, token)
+
+        trace = asyncio.run(handler())
+        assert [name for name, _, _ in trace.spans] == ["session_io", "evaluate"]
+
+    def test_keyword_qa_stages(self):
+        """测试关键词问答的分词和检索阶段"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "rules.txt"), "w", encoding="utf-8") as f:
+                f.write("泰迪杯竞赛报名时间为每年三月\n\n参赛队伍需要提交论文")
+            qa = KeywordQA(knowledge_dir=tmpdir)
+            trace, token = start_trace("POST /api/ask")
+            assert qa.search("报名时间")
+            finish_trace(trace, token)
+        assert list(trace.stage_totals()) == ["tokenize", "retrieval"]
+
+    def test_slow_trace_log_keeps_slowest(self):
+        """测试只保留最慢的N条记录并按耗时降序返回"""
+        log = SlowTraceLog(capacity=3)
+        for i, duration in enumerate([5, 1, 9, 3, 7]):
+            trace = Trace(f"GET /api/ask/{i}" if i % 2 == 0 else f"GET /api/tables/{i}")
+            trace.duration_ns = duration * 1000000
+            log.add(trace)
+
+        durations = [item["duration_ms"] for item in log.get()]
+        assert durations == [9.0, 7.0, 5.0]
+        assert len(log.get(limit=1)) == 1
+        assert all("/api/ask" in item["name"] for item in log.get(name="/api/ask"))
+        log.clear()
+        assert log.get() == []
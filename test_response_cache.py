@@ -0,0 +1,253 @@
+"""
+API响应缓存测试
+测试ResponseCache的缓存键、容量淘汰、TTL过期与防击穿锁
+"""
+
+import os
+import sys
+import asyncio
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from fastapi.testclient import TestClient
+
+# 确保能导入同目录下的缓存模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from response_cache import ResponseCache
+
+
+class FakeClock:
+    """可手动推进的时钟"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def create_app(cache):
+    """创建带缓存中间件的测试应用"""
+    app = FastAPI()
+    app.state.calls = 0
+
+    @app.middleware("http")
+    async def cache_middleware(request: Request, call_next):
+        return await cache.handle(request, call_next)
+
+    @app.get("/api/tables")
+    async def tables(page: int = 1):
+        app.state.calls += 1
+        return JSONResponse({"page": page, "calls": app.state.calls}, headers={"X-Table-Count": "3"})
+
+    @app.get("/api/tables/slow")
+    async def slow_tables():
+        app.state.calls += 1
+        await asyncio.sleep(0.05)
+        return {"calls": app.state.calls}
+
+    @app.get("/api/tables/lang")
+    async def lang_tables(request: Request):
+        app.state.calls += 1
+        return PlainTextResponse(request.headers.get("accept-language", "none"), headers={"Vary": "Accept-Language"})
+
+    @app.get("/api/tables/missing")
+    async def missing():
+        app.state.calls += 1
+        return JSONResponse({"detail": "not found"}, status_code=404)
+
+    @app.get("/api/ask")
+    async def ask():
+        app.state.calls += 1
+        return {"calls": app.state.calls}
+
+    return app
+
+
+class TestResponseCache:
+    """响应缓存测试类"""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.cache = ResponseCache({"/api/tables": 30}, clock=self.clock)
+        self.app = create_app(self.cache)
+        self.client = TestClient(self.app)
+
+    def test_hit_preserves_headers(self):
+        """测试命中时保留状态码与响应头"""
+        first = self.client.get("/api/tables")
+        second = self.client.get("/api/tables")
+        assert first.headers["x-cache"] == "MISS"
+        assert second.headers["x-cache"] == "HIT"
+        assert second.json() == first.json()
+        assert second.headers["x-table-count"] == "3"
+        assert second.headers["content-type"] == "application/json"
+        assert self.app.state.calls == 1
+
+    def test_query_string_in_key(self):
+        """测试查询参数参与缓存键且顺序无关"""
+        assert self.client.get("/api/tables?page=1").json()["page"] == 1
+        assert self.client.get("/api/tables?page=2").json()["page"] == 2
+        assert self.app.state.calls == 2
+        self.client.get("/api/tables?page=2&x=1")
+        assert self.client.get("/api/tables?x=1&page=2").headers["x-cache"] == "HIT"
+
+    def test_vary_header_in_key(self):
+        """测试Vary头列出的请求头参与缓存键"""
+        zh = self.client.get("/api/tables/lang", headers={"Accept-Language": "zh"})
+        en = self.client.get("/api/tables/lang", headers={"Accept-Language": "en"})
+        assert (zh.text, en.text) == ("zh", "en")
+        again = self.client.get("/api/tables/lang", headers={"Accept-Language": "zh"})
+        assert again.text == "zh" and again.headers["x-cache"] == "HIT"
+
+    def test_ttl_expiry(self):
+        """测试TTL过期后重新回源"""
+        self.client.get("/api/tables")
+        self.clock.now += 31
+        assert self.client.get("/api/tables").headers["x-cache"] == "MISS"
+        assert self.cache.get_stats()["expired"] == 1
+
+    def test_uncached_routes_and_errors(self):
+        """测试未配置的路径和错误响应不缓存"""
+        self.client.get("/api/ask")
+        self.client.get("/api/ask")
+        self.client.get("/api/tables/missing")
+        self.client.get("/api/tables/missing")
+        assert self.app.state.calls == 4
+
+    def test_lru_eviction(self):
+        """测试超出条目上限时淘汰最久未使用的条目"""
+        self.cache.max_entries = 2
+        self.client.get("/api/tables?page=1")
+        self.client.get("/api/tables?page=2")
+        self.client.get("/api/tables?page=1")
+        self.client.get("/api/tables?page=3")
+        stats = self.cache.get_stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1
+        assert self.client.get("/api/tables?page=1").headers["x-cache"] == "HIT"
+        assert self.client.get("/api/tables?page=2").headers["x-cache"] == "MISS"
+
+    def test_vary_keys_bounded(self):
+        """测试淘汰条目时一并删除对应的Vary记录，不同查询参数不会让其无限增长"""
+        self.cache.max_entries = 2
+        for page in range(10):
+            self.client.get(f"/api/tables?page={page}")
+        assert len(self.cache._vary) == 2
+        self.cache.clear()
+        assert not self.cache._vary and not self.cache._variants
+
+    def test_lock_released_when_body_never_sent(self):
+        """测试流式响应体从未开始发送（如客户端已断开）时防击穿锁同样释放"""
+        from starlette.requests import Request as StarletteRequest
+        from starlette.responses import StreamingResponse
+
+        async def call_next(request):
+            async def body():
+                yield b"data"
+            return StreamingResponse(body())
+
+        async def run():
+            request = StarletteRequest({"type": "http", "method": "GET", "path": "/api/tables/stream",
+                                        "query_string": b"", "headers": []})
+            response = await self.cache.handle(request, call_next)
+            assert response.headers["x-cache"] == "MISS"
+            # 不读取响应体，直接丢弃响应
+            assert self.cache.get_stats()["pending_locks"] == 0
+            started = asyncio.get_running_loop().time()
+            await self.cache.handle(request, call_next)
+            return asyncio.get_running_loop().time() - started
+
+        self.cache.lock_timeout = 5
+        assert asyncio.run(run()) < 1
+
+    def test_byte_limit(self):
+        """测试超过单条字节上限的响应只透传不缓存"""
+        self.cache.max_entry_bytes = 10
+        assert self.client.get("/api/tables").headers["x-cache"] == "BYPASS"
+        assert self.client.get("/api/tables").headers["x-cache"] == "BYPASS"
+        assert self.cache.get_stats()["entries"] == 0
+
+    def test_stampede_lock(self):
+        """测试并发未命中时只有一个请求回源"""
+        import httpx
+
+        async def run():
+            transport = httpx.ASGITransport(app=self.app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+                return await asyncio.gather(*(client.get("/api/tables/slow") for _ in range(5)))
+
+        responses = asyncio.run(run())
+        assert self.app.state.calls == 1
+        assert all(r.json() == {"calls": 1} for r in responses)
+        assert self.cache.get_stats()["coalesced"] == 4
+
+
+class TestConditionalRequests:
+    """ETag与条件请求测试类"""
+
+    def setup_method(self):
+        self.clock = FakeClock()
+        self.mtime = 1713139200
+        self.cache = ResponseCache(
+            {"/api/tables": 30},
+            last_modified_sources={"/api/tables": lambda: self.mtime},
+            clock=self.clock,
+        )
+        self.app = create_app(self.cache)
+        self.client = TestClient(self.app)
+
+    def test_etag_and_304(self):
+        """测试ETag匹配时返回304且不回源"""
+        first = self.client.get("/api/tables")
+        etag = first.headers["etag"]
+        assert first.headers["last-modified"] == "Mon, 15 Apr 2024 00:00:00 GMT"
+
+        second = self.client.get("/api/tables", headers={"If-None-Match": etag})
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["etag"] == etag
+        assert self.client.get("/api/tables", headers={"If-None-Match": '"other", W/' + etag}).status_code == 304
+        assert self.client.get("/api/tables", headers={"If-None-Match": '"other"'}).status_code == 200
+        assert self.app.state.calls == 1
+        assert self.cache.get_stats()["not_modified"] == 2
+
+    def test_304_after_rebuild_with_same_content(self):
+        """测试缓存过期重建后内容未变时仍返回304"""
+        self.app.state.calls = 0
+        etag = self.client.get("/api/tables/lang").headers["etag"]
+        self.clock.now += 31
+        response = self.client.get("/api/tables/lang", headers={"If-None-Match": etag})
+        assert response.status_code == 304
+        assert response.headers["x-cache"] == "MISS"
+
+    def test_if_modified_since(self):
+        """测试If-Modified-Since条件请求"""
+        self.client.get("/api/tables")
+        not_modified = self.client.get("/api/tables", headers={"If-Modified-Since": "Mon, 15 Apr 2024 00:00:00 GMT"})
+        assert not_modified.status_code == 304
+        modified = self.client.get("/api/tables", headers={"If-Modified-Since": "Sun, 14 Apr 2024 00:00:00 GMT"})
+        assert modified.status_code == 200
+
+    def test_source_change_invalidates(self):
+        """测试数据文件更新后缓存失效"""
+        etag = self.client.get("/api/tables").headers["etag"]
+        self.mtime += 60
+        response = self.client.get("/api/tables", headers={"If-None-Match": etag})
+        assert response.status_code == 200
+        assert response.headers["etag"] != etag
+        assert self.cache.get_stats()["invalidated"] == 1
+
+    def test_source_mtime_from_directory(self, tmp_path):
+        """测试从数据目录统计最新修改时间"""
+        from response_cache import SourceMtime
+
+        (tmp_path / "a.xlsx").write_bytes(b"a")
+        os.utime(tmp_path / "a.xlsx", (1000, 1000))
+        (tmp_path / "sub").mkdir()
+        (tmp_path / "sub" / "b.xlsx").write_bytes(b"b")
+        os.utime(tmp_path / "sub" / "b.xlsx", (2000.5, 2000.5))
+        assert SourceMtime([str(tmp_path), str(tmp_path / "missing")])() == 2000
+        # 也可以只监视单个文件
+        assert SourceMtime([str(tmp_path / "a.xlsx")])() == 1000
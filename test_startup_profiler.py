@@ -0,0 +1,58 @@
+"""
+启动耗时分析测试
+测试模块导入耗时的记录与嵌套导入的自身耗时计算
+"""
+
+import os
+import sys
+import tempfile
+
+# 确保能导入同目录下的分析模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from startup_profiler import ImportProfiler
+
+
+class TestImportProfiler:
+    """导入耗时分析测试类"""
+
+    def test_records_nested_imports(self):
+        """测试记录嵌套导入，父模块自身耗时不含子模块"""
+        with tempfile.TemporaryDirectory() as tmpdir:
+            with open(os.path.join(tmpdir, "profiled_child.py"), "w") as f:
+                f.write("import time\ntime.sleep(0.05)\n")
+            with open(os.path.join(tmpdir, "profiled_parent.py"), "w") as f:
+                f.write("import profiled_child\n")
+            sys.path.insert(0, tmpdir)
+            try:
+                profiler = ImportProfiler().start()
+                import profiled_parent
+                profiler.mark("imported")
+                profiler.stop()
+            finally:
+                sys.path.remove(tmpdir)
+                sys.modules.pop("profiled_parent", None)
+                sys.modules.pop("profiled_child", None)
+
+        assert not profiler.active
+        report = profiler.report()
+        modules = {module["module"]: module for module in report["modules"]}
+        assert modules["profiled_child"]["parent"] == "profiled_parent"
+        assert modules["profiled_child"]["self_ms"] >= 50
+        assert modules["profiled_parent"]["self_ms"] < modules["profiled_child"]["self_ms"]
+        assert modules["profiled_parent"]["cumulative_ms"] >= modules["profiled_child"]["cumulative_ms"]
+        assert report["import_ms"] >= 50
+        assert report["phases"][0]["phase"] == "imported"
+        # 模块上的loader已还原为原始对象
+        assert type(profiled_parent.__loader__).__name__ == "SourceFileLoader"
+
+    def test_from_env(self, monkeypatch):
+        """测试只有设置环境变量时才开启"""
+        monkeypatch.delenv("STARTUP_PROFILE", raising=False)
+        assert ImportProfiler.from_env() is None
+        monkeypatch.setenv("STARTUP_PROFILE", "1")
+        profiler = ImportProfiler.from_env()
+        try:
+            assert profiler.active
+        finally:
+            profiler.stop()
@@ -0,0 +1,106 @@
+"""
+表格批量导出测试
+测试各格式流式写出、原子替换、目标文件被占用时的处理及并行导出
+"""
+
+import os
+import sys
+import csv
+
+import pandas as pd
+import pytest
+from openpyxl import load_workbook
+
+# 确保能导入同目录下的导出模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import table_export
+from table_export import (
+    ExportError, atomic_output, write_rows, frame_rows, export_table, export_source_workbook, export_catalog
+)
+from table_store import TableStore
+
+HEADER = ["赛项名称", "报名时间", "分值"]
+ROWS = [["挑战赛", "2024-04-15", 30], ["马拉松", None, 5]]
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = TableStore(str(tmp_path / "store"))
+    frame = pd.DataFrame({"赛项名称": ["挑战赛", "马拉松"],
+                          "报名时间": pd.to_datetime(["2024-04-15", None]),
+                          "分值": [30, 5]})
+    store.put_frame("rules.pdf", 4, 1, frame)
+    store.put_rows("rules.pdf", 5, 2, [["指标", "描述"], ["计算思维", "融合算法知识"]])
+    return store
+
+
+class TestTableExport:
+    """表格导出测试类"""
+
+    def test_formats(self, tmp_path):
+        """测试xlsx、csv、tsv流式写出"""
+        for fmt in ("xlsx", "csv", "tsv"):
+            path = tmp_path / f"out.{fmt}"
+            assert write_rows(str(path), HEADER, iter(ROWS)) == 2
+        sheet = load_workbook(tmp_path / "out.xlsx").active
+        assert [cell.value for cell in sheet[1]] == HEADER
+        assert sheet["B3"].value is None
+        with open(tmp_path / "out.tsv", encoding="utf-8-sig", newline="") as f:
+            assert list(csv.reader(f, delimiter="\t"))[2] == ["马拉松", "", "5"]
+        assert sorted(os.listdir(tmp_path)) == ["out.csv", "out.tsv", "out.xlsx"]
+        with pytest.raises(ExportError):
+            write_rows(str(tmp_path / "out.doc"), HEADER, iter(ROWS))
+
+    def test_failed_write_keeps_original(self, tmp_path):
+        """测试写出中途出错时保留原文件且不留临时文件"""
+        path = tmp_path / "out.csv"
+        path.write_text("原内容", encoding="utf-8")
+
+        def broken_rows():
+            yield ROWS[0]
+            raise RuntimeError("读取失败")
+
+        with pytest.raises(RuntimeError):
+            write_rows(str(path), HEADER, broken_rows())
+        assert path.read_text(encoding="utf-8") == "原内容"
+        assert os.listdir(tmp_path) == ["out.csv"]
+
+    def test_locked_target(self, tmp_path, monkeypatch):
+        """测试目标文件被占用时重试后报错，不留下备份或临时文件"""
+        def locked(src, dst):
+            raise PermissionError("文件被占用")
+
+        monkeypatch.setattr(table_export.os, "replace", locked)
+        path = tmp_path / "locked_export_test.xlsx"
+        with pytest.raises(ExportError):
+            with atomic_output(str(path), retries=1, retry_delay=0) as temp_path:
+                open(temp_path, "w").close()
+        assert os.listdir(tmp_path) == []
+
+    def test_frame_rows(self):
+        """测试DataFrame按行迭代，缺失值为None"""
+        frame = pd.DataFrame({"a": ["x", None], "b": [1.0, float("nan")]})
+        assert list(frame_rows(frame)) == [["x", 1.0], [None, None]]
+
+    def test_export_from_store(self, store, tmp_path):
+        """测试从列式存储导出（日期列写为Excel日期）及按来源导出工作簿"""
+        table_id = store.find(page=4)[0]["table_id"]
+        result = export_table(store, table_id, str(tmp_path / "t1.xlsx"))
+        assert result["rows"] == 2
+        sheet = load_workbook(tmp_path / "t1.xlsx").active
+        assert sheet.title == "表格_1"
+        assert sheet["B2"].value.year == 2024 and sheet["B3"].value is None
+
+        assert export_source_workbook(store, "rules.pdf", str(tmp_path / "rules.xlsx")) == 2
+        workbook = load_workbook(tmp_path / "rules.xlsx")
+        assert workbook.sheetnames == ["表格_1", "表格_2", "汇总信息"]
+        assert [cell.value for cell in workbook["汇总信息"][3]] == [2, 5, 2, 1]
+
+    def test_export_catalog_parallel(self, store, tmp_path):
+        """测试并行导出目录中的全部表格"""
+        output = tmp_path / "exports"
+        results = export_catalog(store, str(output), fmt="csv", max_workers=2, use_processes=False)
+        assert not results["failed"]
+        assert sorted(os.listdir(output)) == ["rules_p4_t1.csv", "rules_p5_t2.csv"]
+        assert [result["rows"] for result in results["exported"]] == [2, 1]
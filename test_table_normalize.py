@@ -0,0 +1,121 @@
+"""
+表格规范化测试
+测试折行与序号前缀清洗、网址规范化、中文日期及日期区间解析，以及入库时的规范化
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# 确保能导入同目录下的规范化模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from table_normalize import clean_text, canonicalize_urls, parse_date_ranges, normalize_frame
+from table_store import TableStore
+from table_query import TableQueryEngine
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+CSV_FILE = os.path.join(ROOT, "processed.csv")
+
+
+class TestTableNormalize:
+    """表格规范化测试类"""
+
+    def test_clean_text(self):
+        """测试去掉中文折行、多余空白和各种序号前缀，保留小数"""
+        cells = pd.Series(["2.主办单位\n拥有解释权", "（一） 参赛对象", "3、作品要求", "⚫  硬件平台",
+                           "2.4 Ghz 频段", "  ", None])
+        assert clean_text(cells).tolist() == [
+            "主办单位拥有解释权", "参赛对象", "作品要求", "硬件平台", "2.4 Ghz 频段", pd.NA, pd.NA
+        ]
+
+    def test_bare_enum_markers_kept(self):
+        """测试整格只有序号时不清洗（序号列不会变为空值）"""
+        cells = pd.Series(["1.", "2.", "（3）", "①", "•"])
+        assert clean_text(cells).tolist() == ["1.", "2.", "（3）", "①", "•"]
+
+    def test_canonicalize_urls(self):
+        """测试去掉网址末尾的中文标点，协议和域名转为小写，非网址保持不变"""
+        cells = pd.Series(["http://www.china61.org.cn；", "HTTPS://Example.COM/Path?a=1。", "www.robotics.org.cn",
+                           "详见 http://a.cn"], dtype="string")
+        assert canonicalize_urls(cells).tolist() == [
+            "http://www.china61.org.cn", "https://example.com/Path?a=1", "http://www.robotics.org.cn",
+            "详见 http://a.cn"
+        ]
+
+    def test_parse_date_ranges(self):
+        """测试单个日期、省略年月的日期区间及其他日期写法"""
+        cells = pd.Series(["2024年4月15日-5月15日", "2024年4月15日", "2024.4.15至2024.5.1", "2024-12-30~31",
+                           "2024年2月30日", "待定"], dtype="string")
+        start, end, is_range = parse_date_ranges(cells)
+        assert start.dt.strftime("%Y-%m-%d").tolist()[:4] == ["2024-04-15", "2024-04-15", "2024-04-15", "2024-12-30"]
+        assert end.dt.strftime("%Y-%m-%d").tolist()[:4] == ["2024-05-15", "2024-04-15", "2024-05-01", "2024-12-31"]
+        assert start[4:].isna().all() and end[4:].isna().all()
+        assert is_range.tolist() == [True, False, True, True, False, False]
+
+    def test_parse_dates_with_time_and_deadline_suffix(self):
+        """测试带时刻和 "前" "止" 截止说明的日期"""
+        cells = pd.Series(["2024年12月31日 24:00前", "2024年5月1日止", "2024.4.15 9:00-2024.5.15 17:30",
+                           "2024年6月1日之前", "2024年6月1日后"], dtype="string")
+        start, end, is_range = parse_date_ranges(cells)
+        assert start.dt.strftime("%Y-%m-%d").tolist()[:4] == ["2024-12-31", "2024-05-01", "2024-04-15", "2024-06-01"]
+        assert end.dt.strftime("%Y-%m-%d").tolist()[:4] == ["2024-12-31", "2024-05-01", "2024-05-15", "2024-06-01"]
+        assert is_range.tolist() == [False, False, True, False, False]
+        assert pd.isna(start[4])
+
+    def test_normalize_processed_csv(self):
+        """测试规范化 processed.csv: 日期列追加类型化的列，网址和序号被清洗"""
+        frame = pd.read_csv(CSV_FILE, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+        result = normalize_frame(frame)
+        assert {"发布时间_日期", "报名时间_开始", "报名时间_结束"} <= set(result.columns)
+        assert "赛项名称_日期" not in result.columns
+        assert result["报名时间_开始"].dtype.kind == "M"
+        assert result["报名时间_开始"].iloc[0] == pd.Timestamp("2024-04-15")
+        assert result["报名时间_结束"].iloc[0] == pd.Timestamp("2024-05-15")
+        assert not result["官网"].dropna().str.endswith("；").any()
+        assert not result["组织单位"].dropna().str.match(r"\d+\.").any()
+        # 原始文本列保留（清洗后），类型化的列紧随其后
+        columns = list(result.columns)
+        assert columns.index("报名时间_开始") == columns.index("报名时间") + 1
+
+
+class TestNormalizedStore:
+    """入库规范化测试类"""
+
+    @pytest.fixture
+    def store(self, tmp_path):
+        return TableStore.from_config({
+            "enabled": True, "root": str(tmp_path / "store"), "normalize": True,
+            "index_columns": ["报名时间_开始"],
+        })
+
+    def test_rows_stored_typed_and_queryable(self, store):
+        """测试行列表入库时规范化，日期区间保存为日期列并可按日期范围查询"""
+        rows = [["赛道", "报名时间", "官网"],
+                ["1.未来校园", "2024年4月15日-5月15日", "http://www.china61.org.cn；"],
+                ["2.智能编程", "2024年6月1日-6月30日", None]]
+        entry = store.put_rows("rules.pdf", 2, 1, rows)
+        assert entry["columns"] == ["赛道", "报名时间", "报名时间_开始", "报名时间_结束", "官网"]
+        table = store.read(entry["table_id"])
+        assert table.column("报名时间_开始").dtype.kind == "M"
+        assert table.to_rows()[1][0] == "未来校园"
+        assert table.to_rows()[1][4] == "http://www.china61.org.cn"
+
+        result = TableQueryEngine(store).query(entry["table_id"], filters=[("报名时间_开始", "gte", "2024-05-01")],
+                                               columns=["赛道", "报名时间_结束"])
+        assert result["rows"] == [["智能编程", "2024-06-30"]]
+
+    def test_normalizer_version_triggers_reimport(self, store, tmp_path):
+        """测试规范化规则版本变化后，相同内容的文件会重新导入"""
+        path = tmp_path / "tables.csv"
+        pd.DataFrame({"报名时间": ["2024年4月15日"]}).to_csv(path, index=False, encoding="utf-8-sig")
+        assert store.import_csv(str(path)) is not None
+        assert store.import_csv(str(path)) is None
+
+        def normalizer(frame):
+            return normalize_frame(frame)
+        normalizer.version = "test"
+        store.normalizer = normalizer
+        assert store.import_csv(str(path)) is not None
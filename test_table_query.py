@@ -0,0 +1,134 @@
+"""
+表格查询测试
+测试条件过滤、排序、分页游标及排序索引与全表扫描结果一致
+"""
+
+import os
+import sys
+import base64
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 确保能导入同目录下的查询模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from table_store import TableStore
+from table_query import TableQueryEngine, QueryError, parse_filters, parse_sort
+
+ROWS = [
+    ["赛项名称", "赛道", "报名时间", "分值"],
+    ["人工智能挑战赛", "未来校园", "2024-04-15", "30"],
+    ["3D编程挑战赛", "3D编程", "2024-05-01", "15"],
+    ["人工智能挑战赛", "3D编程", None, "10"],
+    ["机器人大赛", "未来校园", "2024-03-20", "30"],
+    ["编程马拉松", None, "2024-04-15", "5"],
+]
+
+
+def make_engine(tmp_path, index_columns):
+    store = TableStore(str(tmp_path / "store"), index_columns=index_columns)
+    entry = store.put_rows("rules.pdf", 1, 1, ROWS)
+    return TableQueryEngine(store, max_page_size=3, default_page_size=2), entry["table_id"]
+
+
+@pytest.fixture(params=[(), ("赛项名称", "赛道", "报名时间")], ids=["scan", "indexed"])
+def engine(request, tmp_path):
+    return make_engine(tmp_path, request.param)
+
+
+def names(result):
+    return [row[0] for row in result["rows"]]
+
+
+class TestTableQuery:
+    """表格查询测试类（全表扫描与排序索引两种情况结果相同）"""
+
+    def test_parse(self):
+        """测试解析条件和排序表达式"""
+        assert parse_filters(["赛道:in:未来校园|3D编程", "报名时间:isnull"]) == [
+            ("赛道", "in", ["未来校园", "3D编程"]), ("报名时间", "isnull", None)
+        ]
+        assert parse_sort("-报名时间, 赛项名称") == [("报名时间", True), ("赛项名称", False)]
+        with pytest.raises(QueryError):
+            parse_filters(["赛道:like:校园"])
+
+    def test_filters(self, engine):
+        """测试等值、多值、范围、前缀、包含及缺失值条件"""
+        engine, table_id = engine
+
+        def query(*filters):
+            return names(engine.query(table_id, parse_filters(filters), sort=[("赛项名称", False)], limit=10))
+
+        assert query("赛道:eq:未来校园") == ["人工智能挑战赛", "机器人大赛"]
+        assert query("赛道:in:3D编程|不存在") == ["3D编程挑战赛", "人工智能挑战赛"]
+        assert query("报名时间:gte:2024-04-15") == ["3D编程挑战赛", "人工智能挑战赛", "编程马拉松"]
+        assert query("报名时间:lt:2024-04-15") == ["机器人大赛"]
+        assert query("赛项名称:startswith:人工") == ["人工智能挑战赛", "人工智能挑战赛"]
+        assert query("赛项名称:contains:编程") == ["3D编程挑战赛", "编程马拉松"]
+        assert query("赛道:isnull") == ["编程马拉松"]
+        assert query("赛道:ne:未来校园", "报名时间:notnull") == ["3D编程挑战赛"]
+
+    def test_sort_missing_last(self, engine):
+        """测试多列排序，升序和降序时缺失值都排在最后"""
+        engine, table_id = engine
+        ascending = engine.query(table_id, sort=parse_sort("报名时间,赛项名称"), columns=["报名时间"], limit=3)
+        assert ascending["columns"] == ["报名时间"]
+        assert [row[0] for row in ascending["rows"]] == ["2024-03-20", "2024-04-15", "2024-04-15"]
+        descending = engine.query(table_id, sort=parse_sort("-报名时间"), columns=["赛项名称", "报名时间"],
+                                  offset=3, limit=3)
+        assert descending["rows"] == [["机器人大赛", "2024-03-20"], ["人工智能挑战赛", None]]
+
+    def test_cursor_pagination(self, engine):
+        """测试游标分页遍历全部结果，条件变化后游标失效"""
+        engine, table_id = engine
+        sort = parse_sort("赛项名称")
+        seen, cursor = [], None
+        while True:
+            page = engine.query(table_id, sort=sort, cursor=cursor)
+            seen += names(page)
+            cursor = page["next_cursor"]
+            if cursor is None:
+                break
+        assert page["total"] == 5 and len(seen) == 5
+        assert seen == sorted(seen)
+
+        first = engine.query(table_id, sort=sort)
+        with pytest.raises(QueryError):
+            engine.query(table_id, sort=parse_sort("-赛项名称"), cursor=first["next_cursor"])
+
+    def test_malformed_cursor(self, engine):
+        """测试能解码但结构不对的游标返回查询错误"""
+        engine, table_id = engine
+        for payload in (b"1", b"[1]", b'"x"', b'{"o": -1}', b'{"o": "2"}', b'{"o": true}', b"\xff"):
+            cursor = base64.urlsafe_b64encode(payload).decode("ascii").rstrip("=")
+            with pytest.raises(QueryError):
+                engine.query(table_id, cursor=cursor)
+        with pytest.raises(QueryError):
+            engine.query(table_id, cursor="不是游标")
+
+    def test_errors(self, engine):
+        """测试不存在的列和类型不匹配的值"""
+        engine, table_id = engine
+        with pytest.raises(QueryError):
+            engine.query(table_id, parse_filters(["不存在:eq:1"]))
+        with pytest.raises(KeyError):
+            engine.query("missing")
+
+
+def test_typed_columns(tmp_path):
+    """测试数值和日期类型列的条件与排序"""
+    store = TableStore(str(tmp_path / "store"), index_columns=["报名时间"])
+    frame = pd.DataFrame({
+        "分值": [30, 15, 10],
+        "报名时间": pd.to_datetime(["2024-04-15", None, "2024-03-01"]),
+    })
+    table_id = store.put_frame("scores.xlsx", None, 1, frame)["table_id"]
+    engine = TableQueryEngine(store)
+    result = engine.query(table_id, parse_filters(["分值:gte:15"]), parse_sort("-分值"))
+    assert result["rows"] == [[30, "2024-04-15"], [15, None]]
+    result = engine.query(table_id, parse_filters(["报名时间:lte:2024-04-01"]))
+    assert result["rows"] == [[10, "2024-03-01"]]
+    with pytest.raises(QueryError):
+        engine.query(table_id, parse_filters(["分值:gt:很多"]))
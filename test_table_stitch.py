@@ -0,0 +1,183 @@
+"""
+跨页续表合并测试
+测试按表头和列几何指纹查找续表、已知表头及没有列几何的表格不被误合并、跨空白页合并、多文档一次扫描、来源记录及Excel导入时的合并
+"""
+
+import os
+import sys
+
+import pandas as pd
+import pytest
+
+# 确保能导入同目录下的续表合并模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from table_stitch import TableStitcher, stitch_records, stitch_documents, geometry_key
+from table_store import TableStore
+from pdf_tables import _column_edges
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EXCEL_FILE = os.path.join(ROOT, "02_3D编程模型创新设计专项赛_tables.xlsx")
+
+HEADER = ["指标", "描述", "分值"]
+EDGES = [0.1, 0.3, 0.8, 0.9]
+
+
+def table(rows, top, bottom, edges=EDGES):
+    return {"rows": rows, "top": top, "bottom": bottom, "edges": edges}
+
+
+def page(number, *tables, height=800):
+    return {"page": number, "height": height, "tables": list(tables)}
+
+
+class TestTableStitcher:
+    """续表合并测试类"""
+
+    def test_continuation_without_repeated_header(self):
+        """测试没有重复表头的续表按列几何合并，并记录各片段的页码和行区间"""
+        records = stitch_records([
+            page(5, table([HEADER, ["计算思维", "…", "30分"]], 400, 790)),
+            page(6, table([["完整性", "…", "15分"], ["实用性", "…", "10分"]], 20, 200)),
+        ], source="rules.pdf")
+        assert len(records) == 1
+        record = records[0]
+        assert record["rows"] == [HEADER, ["计算思维", "…", "30分"], ["完整性", "…", "15分"], ["实用性", "…", "10分"]]
+        assert (record["page_start"], record["page_end"]) == (5, 6)
+        assert record["provenance"] == [
+            {"source": "rules.pdf", "page": 5, "index": 0, "row_start": 0, "row_end": 2},
+            {"source": "rules.pdf", "page": 6, "index": 0, "row_start": 2, "row_end": 4},
+        ]
+
+    def test_repeated_header_matched_despite_wrapping(self):
+        """测试续表重复的表头（折行不同）被识别并去掉"""
+        records = stitch_records([
+            page(1, table([["赛项\n名称", "赛道", "分值"], ["A", "x", "1"]], 400, 790)),
+            page(2, table([["赛项名称", "赛道", "分值"], ["B", "y", "2"]], 20, 300)),
+        ])
+        assert records[0]["rows"] == [["赛项\n名称", "赛道", "分值"], ["A", "x", "1"], ["B", "y", "2"]]
+        assert records[0]["provenance"][1]["row_start"] == 2
+
+    def test_separate_tables_not_merged(self):
+        """测试列几何不同、首行是其他已知表头或不贴近页边的表格不合并"""
+        other = ["阶段", "环节", "时间"]
+        records = stitch_records([
+            page(1, table([other, ["报名", "…", "4月"]], 100, 300), table([HEADER, ["a", "b", "1"]], 400, 790)),
+            page(2, table([other, ["提交", "…", "5月"]], 20, 300)),
+            page(3, table([HEADER, ["c", "d", "2"]], 400, 790)),
+            page(4, table([["e", "f", "3"]], 20, 300, edges=[0.1, 0.5, 0.8, 0.9])),
+        ])
+        assert len(records) == 5
+
+    def test_matches_among_several_open_tables(self):
+        """测试页面底部有多个未结束的表格时，续表按指纹找到对应的表格"""
+        narrow = [0.1, 0.25, 0.4]
+        records = stitch_records([
+            page(1, table([HEADER, ["a", "b", "1"]], 300, 790), table([["页脚", "说明"], ["x", "y"]], 760, 790, narrow)),
+            page(2, table([HEADER, ["c", "d", "2"]], 20, 300)),
+        ])
+        assert [record["rows"][-1] for record in records] == [["c", "d", "2"], ["x", "y"]]
+        assert [len(record["provenance"]) for record in records] == [2, 1]
+
+    def test_skip_page_without_tables(self):
+        """测试续表可以隔着没有表格的页面（如整页插图），超过最大页码差时不合并"""
+        pages = [
+            page(1, table([HEADER, ["a", "b", "1"]], 400, 790)),
+            page(2),
+            page(3, table([["c", "d", "2"]], 20, 300)),
+        ]
+        assert len(stitch_records(pages, max_page_gap=2)) == 1
+        assert len(stitch_records(pages, max_page_gap=1)) == 2
+
+    def test_documents_in_one_pass(self):
+        """测试多个文档共用一个索引扫描，续表不会跨文件合并"""
+        first = [page(1, table([HEADER, ["a", "b", "1"]], 400, 790))]
+        second = [page(2, table([HEADER, ["c", "d", "2"]], 20, 300))]
+        records = stitch_documents([("a.pdf", first), ("b.pdf", second)])
+        assert [record["provenance"][0]["source"] for record in records] == ["a.pdf", "b.pdf"]
+
+    def test_streaming_output(self):
+        """测试表格确定结束后立即输出，贴近底部的表格等到下一页"""
+        stitcher = TableStitcher()
+        assert stitcher.feed(page(1, table([HEADER, ["a", "b", "1"]], 400, 790))) == []
+        finished = stitcher.feed(page(2, table([["c", "d", "2"]], 20, 300)))
+        assert len(finished) == 1 and finished[0]["page_end"] == 2
+        assert stitcher.finish() == []
+
+    def test_same_width_tables_without_geometry_not_merged(self):
+        """测试没有列边界和位置信息时，列数相同但表头不同的相邻页表格不合并"""
+        records = stitch_records([
+            {"page": 1, "tables": [{"rows": [["姓名", "分数"], ["a", "1"]]}]},
+            {"page": 2, "tables": [{"rows": [["奖项", "名额"], ["一等奖", "3"]]}]},
+        ])
+        assert [record["rows"][0] for record in records] == [["姓名", "分数"], ["奖项", "名额"]]
+        # 有位置但没有列边界时同样不合并
+        records = stitch_records([
+            page(1, table([["姓名", "分数"], ["a", "1"]], 400, 790, edges=None)),
+            page(2, table([["奖项", "名额"], ["一等奖", "3"]], 20, 300, edges=None)),
+        ])
+        assert len(records) == 2
+
+    def test_geometry_key(self):
+        """测试列几何指纹按精度取整，没有列边界时只比较列数"""
+        assert geometry_key({"rows": [["a", "b"]], "edges": [0.101, 0.5, 0.9]}, 0.02) == \
+            geometry_key({"rows": [["a", "b"]], "edges": [0.099, 0.5, 0.9]}, 0.02)
+        assert geometry_key({"rows": [["a", "b"], ["c"]]}, 0.02) == (2,)
+
+    def test_column_edges_from_cells(self):
+        """测试从pdfplumber表格的单元格计算列边界"""
+        class FakeTable:
+            bbox = (50, 100, 550, 300)
+            cells = [(50, 100, 200, 150), (200, 100, 550, 150), (50, 150, 200, 200), (200, 150, 550, 200)]
+        assert _column_edges(FakeTable(), 1000) == [0.05, 0.2, 0.55]
+        assert _column_edges(FakeTable(), None) is None
+
+
+class TestStitchOnImport:
+    """Excel导入时合并续表测试类"""
+
+    @staticmethod
+    def write_workbook(path, sheets, pages):
+        """按表格提取的输出格式写入工作簿: 每个表格一个工作表（不写表头行之外的索引），加汇总工作表"""
+        with pd.ExcelWriter(path) as writer:
+            for number, rows in enumerate(sheets, start=1):
+                pd.DataFrame(rows).to_excel(writer, sheet_name=f"表格_{number}", index=False, header=False)
+            pd.DataFrame({"表格序号": list(range(1, len(sheets) + 1)), "页码": pages}).to_excel(
+                writer, sheet_name="汇总信息", index=False)
+
+    def test_import_excel_merges_repeated_header(self, tmp_path):
+        """测试下一页重复了表头的工作表合并，续表中的空单元格保持为空值，并保存来源"""
+        path = tmp_path / "scores.xlsx"
+        self.write_workbook(path, [
+            [["姓名", "分数", "备注"], ["a", "1", "x"], ["b", "2", "y"]],
+            [["姓名", "分数", "备注"], ["c", "3", None], ["d", "4", "z"]],
+        ], [1, 2])
+        store = TableStore(str(tmp_path / "store"), stitch=True)
+        entries = store.import_excel(str(path))
+        assert len(entries) == 1
+        merged = store.read(entries[0]["table_id"])
+        assert merged.to_rows() == [["姓名", "分数", "备注"], ["a", "1", "x"], ["b", "2", "y"],
+                                    ["c", "3", None], ["d", "4", "z"]]
+        assert [(item["page"], item["table_no"]) for item in merged.provenance] == [(1, 1), (2, 2)]
+
+    def test_import_excel_keeps_sheets_without_geometry(self, tmp_path):
+        """测试工作表没有列边界和位置信息，没有重复表头的相邻页工作表不合并，首行空单元格不会变成占位列名"""
+        path = tmp_path / "awards.xlsx"
+        self.write_workbook(path, [
+            [["姓名", "分数"], ["a", "1"]],
+            [["奖项", "名额"], ["一等奖", "3"]],
+            [["完整性", None], ["实用性", "10分"]],
+        ], [1, 2, 3])
+        store = TableStore(str(tmp_path / "store"), stitch=True)
+        entries = store.import_excel(str(path))
+        assert [entry["columns"] for entry in entries] == [["姓名", "分数"], ["奖项", "名额"], ["完整性", "列2"]]
+
+        entries = TableStore(str(tmp_path / "sample"), stitch=True).import_excel(EXCEL_FILE)
+        assert [entry["page"] for entry in entries] == [4, 5, 5, 6]
+
+    def test_stitch_setting_triggers_reimport(self, tmp_path):
+        """测试开启合并后，已导入的相同文件会重新导入"""
+        root = str(tmp_path / "store")
+        assert len(TableStore(root).import_excel(EXCEL_FILE)) == 4
+        assert TableStore(root).import_excel(EXCEL_FILE) is None
+        assert TableStore(root, stitch=True).import_excel(EXCEL_FILE) is not None
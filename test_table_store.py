@@ -0,0 +1,150 @@
+"""
+列式表格存储测试
+测试按列写入与读取、列投影、内存映射、缺失值、目录检索及Excel/CSV导入
+"""
+
+import os
+import sys
+import shutil
+import threading
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 确保能导入同目录下的表格存储模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from table_store import TableStore
+
+ROOT = os.path.dirname(os.path.abspath(__file__))
+EXCEL_FILE = os.path.join(ROOT, "02_3D编程模型创新设计专项赛_tables.xlsx")
+
+
+@pytest.fixture
+def store(tmp_path):
+    return TableStore(str(tmp_path / "store"))
+
+
+class TestTableStore:
+    """表格存储测试类"""
+
+    def test_rows_roundtrip_and_projection(self, store):
+        """测试行列表写入后按列读取，只加载请求的列且为内存映射"""
+        rows = [["赛项名称", "赛道", None], ["挑战赛", "未来校园", "x"], ["挑战赛", None]]
+        entry = store.put_rows("rules.pdf", 3, 1, rows)
+        assert entry["columns"] == ["赛项名称", "赛道", "列3"]
+        assert entry["n_rows"] == 2
+
+        table = store.read(entry["table_id"], ["赛道"])
+        assert table.names == ["赛道"]
+        assert isinstance(table.column("赛道"), np.memmap)
+        assert table.is_missing("赛道").tolist() == [False, True]
+        assert store.read(entry["table_id"]).to_rows() == [
+            ["赛项名称", "赛道", "列3"], ["挑战赛", "未来校园", "x"], ["挑战赛", None, None]
+        ]
+        with pytest.raises(KeyError):
+            store.read(entry["table_id"], ["不存在"])
+
+    def test_connection_opened_lazily_per_process(self, tmp_path, monkeypatch):
+        """测试创建存储时不打开数据库连接，fork出的子进程重新打开连接"""
+        store = TableStore(str(tmp_path / "store"))
+        assert getattr(store._local, "conn", None) is None
+        conn = store._connect()
+        monkeypatch.setattr(os, "getpid", lambda: -1)
+        assert store._connect() is not conn
+        assert store.get_stats()["tables"] == 0
+
+    def test_frame_keeps_types(self, store):
+        """测试DataFrame的数值和日期列保持原类型"""
+        frame = pd.DataFrame({
+            "分值": [30, 15],
+            "报名开始": pd.to_datetime(["2024-04-15", None]),
+            "指标": ["计算思维", "完整性"],
+        })
+        entry = store.put_frame("scores.xlsx", None, 1, frame)
+        table = store.read(entry["table_id"])
+        assert table.column("分值").dtype.kind == "i"
+        assert table.column("报名开始").dtype.kind == "M"
+        restored = table.to_frame()
+        assert restored["分值"].tolist() == [30, 15]
+        assert pd.isna(restored["报名开始"][1])
+
+    def test_catalog_find_and_replace(self, store):
+        """测试按来源和页码检索，重新入库时替换原有表格"""
+        store.ingest_tables("a.pdf", [[["h"], ["1"]], [["h"], ["2"]]], pages=[1, 2], source_hash="v1")
+        store.ingest_tables("b.pdf", [[["h"], ["3"]]], pages=[1], source_hash="v1")
+        assert len(store.find(source="a.pdf")) == 2
+        assert [entry["source"] for entry in store.find(page=1)] == ["a.pdf", "b.pdf"]
+
+        assert store.ingest_tables("a.pdf", [[["h"], ["9"]]], source_hash="v1") is None
+        store.ingest_tables("a.pdf", [[["h"], ["9"]]], source_hash="v2")
+        entries = store.find(source="a.pdf")
+        assert len(entries) == 1
+        assert store.read(entries[0]["table_id"]).to_rows(header=False) == [["9"]]
+        assert store.get_stats() == {"tables": 2, "sources": 2, "rows": 2}
+
+    def test_concurrent_replace_and_read(self, store):
+        """测试并发重写同一表格时读取方始终读到完整版本，写入方不报错且只保留一个版本目录"""
+        entry = store.put_rows("a.pdf", 1, 1, [["h", "v"], ["0", "0"]])
+        errors = []
+        done = threading.Event()
+
+        def write(worker):
+            try:
+                for i in range(20):
+                    store.put_rows("a.pdf", 1, 1, [["h", "v"], [str(worker), str(worker)], [str(i), str(i)]])
+            except Exception as exc:
+                errors.append(exc)
+
+        def read():
+            try:
+                while not done.is_set():
+                    for row in store.read(entry["table_id"]).to_rows(header=False):
+                        assert row[0] == row[1]
+            except Exception as exc:
+                errors.append(exc)
+
+        writers = [threading.Thread(target=write, args=(n,)) for n in range(2)]
+        # 只用一个读取线程：Python 3.11 的 ast.literal_eval（np.load 解析文件头）在多线程并发时可能报 SystemError
+        reader = threading.Thread(target=read)
+        for thread in writers + [reader]:
+            thread.start()
+        for thread in writers:
+            thread.join()
+        done.set()
+        reader.join()
+
+        assert errors == []
+        assert len(os.listdir(store.tables_dir)) == 1
+        assert store.read(entry["table_id"]).n_rows == 2
+
+    def test_legacy_table_directory(self, store):
+        """测试旧版本按 table_id 命名目录的表格仍可读取，重写后切换到版本目录"""
+        entry = store.put_rows("a.pdf", 1, 1, [["h"], ["1"]])
+        table_id = entry["table_id"]
+        directory = store._directory(table_id)
+        os.rename(os.path.join(store.tables_dir, directory), os.path.join(store.tables_dir, table_id))
+        store._connect().execute("UPDATE tables SET directory = NULL WHERE table_id = ?", (table_id,))
+        store._cache.clear()
+        assert store.read(table_id).to_rows(header=False) == [["1"]]
+
+        store.put_rows("a.pdf", 1, 1, [["h"], ["2"]])
+        assert not os.path.exists(os.path.join(store.tables_dir, table_id))
+        assert store.read(table_id).to_rows(header=False) == [["2"]]
+
+    def test_import_excel_directory(self, store, tmp_path):
+        """测试导入表格提取输出的Excel（页码取自汇总工作表），未变化的文件跳过"""
+        directory = tmp_path / "excel_tables"
+        directory.mkdir()
+        shutil.copy(EXCEL_FILE, directory / "02.xlsx")
+        pd.DataFrame({"赛项名称": ["挑战赛"], "报名时间": ["2024年4月15日"]}).to_csv(
+            directory / "processed.csv", index=False, encoding="utf-8-sig")
+
+        assert store.import_directory(str(directory)) == {"imported": 2, "unchanged": 0, "failed": {}}
+        tables = store.find(source="02.xlsx")
+        assert [entry["page"] for entry in tables] == [4, 5, 5, 6]
+        assert tables[1]["columns"] == ["指标", "描述", "分值"]
+        assert store.find(source="processed.csv")[0]["columns"] == ["赛项名称", "报名时间"]
+
+        assert store.import_directory(str(directory))["unchanged"] == 2
@@ -0,0 +1,103 @@
+"""
+表格流式输出测试
+测试NDJSON与SSE格式、缓存命中及解析出错时的输出
+"""
+
+import os
+import sys
+import json
+
+import pytest
+from fastapi import FastAPI
+from starlette.testclient import TestClient
+
+# 确保能导入同目录下的流式输出模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import table_streaming
+from table_streaming import negotiate_format, table_stream_response
+from extraction_cache import ExtractionCache
+
+
+def fake_records(pdf_path, stitch=True, progress=None):
+    yield {"rows": [["赛项名称"], ["A"]], "page_start": 1, "page_end": 2}
+    yield {"rows": [["赛道"], ["B"]], "page_start": 3, "page_end": 3}
+
+
+def broken_records(pdf_path, stitch=True, progress=None):
+    yield {"rows": [["赛项名称"]], "page_start": 1, "page_end": 1}
+    raise RuntimeError("第2页解析失败")
+
+
+@pytest.fixture
+def setup(tmp_path, monkeypatch):
+    pdf = tmp_path / "doc.pdf"
+    pdf.write_bytes(b"%PDF test")
+    cache = ExtractionCache(str(tmp_path / "cache"))
+    monkeypatch.setattr(table_streaming, "iter_table_records", fake_records)
+
+    app = FastAPI()
+
+    @app.get("/stream")
+    def stream(format: str = None):
+        return table_stream_response(str(pdf), negotiate_format(format), cache)
+
+    return TestClient(app), cache, str(pdf)
+
+
+class TestTableStreaming:
+    """表格流式输出测试类"""
+
+    def test_negotiate_format(self):
+        """测试按参数和Accept请求头选择格式"""
+        assert negotiate_format("sse") == "sse"
+        assert negotiate_format(None, "text/event-stream") == "sse"
+        assert negotiate_format(None, "application/json") == "ndjson"
+
+    def test_ndjson_and_cache(self, setup, monkeypatch):
+        """测试NDJSON每行一个表格，完整输出后写入缓存，再次请求直接读取缓存"""
+        client, cache, pdf = setup
+        response = client.get("/stream")
+        assert response.headers["content-type"].startswith("application/x-ndjson")
+        lines = [json.loads(line) for line in response.text.splitlines()]
+        assert [line["index"] for line in lines] == [0, 1]
+        assert lines[0]["page_end"] == 2
+
+        monkeypatch.setattr(table_streaming, "iter_table_records", broken_records)
+        cached = [json.loads(line) for line in client.get("/stream").text.splitlines()]
+        assert [line["rows"] for line in cached] == [line["rows"] for line in lines]
+        assert cache.get_stats()["hits"] == 1
+
+    def test_sse_events(self, setup):
+        """测试SSE按表格发送事件并以 end 事件结束"""
+        client, _, _ = setup
+        response = client.get("/stream", params={"format": "sse"})
+        assert response.headers["content-type"].startswith("text/event-stream")
+        events = [block for block in response.text.split("\n\n") if block]
+        assert [block.split("\n")[0] for block in events] == ["event: table", "event: table", "event: end"]
+        assert json.loads(events[-1].split("data: ")[1]) == {"table_count": 2}
+
+    def test_on_close_after_body(self, tmp_path, monkeypatch):
+        """测试响应体发送完成后调用 on_close（如删除上传的临时文件）"""
+        monkeypatch.setattr(table_streaming, "iter_table_records", fake_records)
+        pdf = tmp_path / "upload" / "doc.pdf"
+        pdf.parent.mkdir()
+        pdf.write_bytes(b"%PDF test")
+        closed = []
+        app = FastAPI()
+
+        @app.get("/stream")
+        def stream():
+            return table_stream_response(str(pdf), "ndjson", ExtractionCache(str(tmp_path / "cache")),
+                                         on_close=lambda: closed.append(len(closed)))
+
+        assert len(TestClient(app).get("/stream").text.splitlines()) == 2
+        assert closed
+
+    def test_error_not_cached(self, setup, monkeypatch):
+        """测试解析出错时输出错误记录，不完整的结果不写入缓存"""
+        client, cache, pdf = setup
+        monkeypatch.setattr(table_streaming, "iter_table_records", broken_records)
+        lines = [json.loads(line) for line in client.get("/stream").text.splitlines()]
+        assert lines[-1] == {"error": "第2页解析失败"}
+        assert cache.get(pdf, "tables", table_streaming.cache_version()) == (False, None)
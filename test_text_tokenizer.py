@@ -0,0 +1,60 @@
+"""
+共享分词服务测试
+测试TokenizerService的缓存、批量分词与多进程分词
+"""
+
+import os
+import sys
+
+# 确保能导入同目录下的分词模块
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import jieba
+
+from text_tokenizer import TokenizerService, get_tokenizer
+
+TEXTS = [
+    "未来校园智能应用专项赛的报名时间是什么时候？",
+    "机器人工程挑战赛主要考察参赛选手的机器人设计能力。",
+    "无人机主题赛的内容包括无人机自主导航、目标识别与跟踪。",
+]
+
+
+class TestTokenizerService:
+    """分词服务测试类"""
+
+    def test_cut_matches_jieba(self):
+        """测试分词结果与jieba一致"""
+        tokenizer = TokenizerService()
+        for text in TEXTS:
+            assert tokenizer.cut(text) == tuple(jieba.cut(text))
+
+    def test_cut_is_cached(self):
+        """测试重复查询命中缓存"""
+        tokenizer = TokenizerService(cache_size=2)
+        tokenizer.cut(TEXTS[0])
+        tokenizer.cut(TEXTS[0])
+        info = tokenizer.cache_info()
+        assert info["hits"] == 1 and info["misses"] == 1
+
+        # 超过容量后淘汰最久未使用的条目
+        tokenizer.cut(TEXTS[1])
+        tokenizer.cut(TEXTS[2])
+        assert tokenizer.cache_info()["size"] == 2
+
+    def test_batch_does_not_pollute_cache(self):
+        """测试批量分词默认不写入缓存"""
+        tokenizer = TokenizerService()
+        results = tokenizer.cut_batch(TEXTS)
+        assert results == [tuple(jieba.cut(text)) for text in TEXTS]
+        assert tokenizer.cache_info()["size"] == 0
+
+    def test_batch_multi_process(self):
+        """测试多进程批量分词保持输入顺序"""
+        tokenizer = TokenizerService(processes=2, chunk_size=2)
+        texts = TEXTS * 3
+        assert tokenizer.cut_batch(texts) == [tuple(jieba.cut(text)) for text in texts]
+
+    def test_shared_instance(self):
+        """测试共享实例"""
+        assert get_tokenizer() is get_tokenizer()
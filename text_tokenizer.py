@@ -0,0 +1,128 @@
+# 泰迪杯项目 - 共享分词服务
+# 负责人: C成员
+# 功能: 为问答引擎、知识图谱和推荐引擎提供带缓存的jieba分词与批量分词
+# 更新日期: 2025-04-24
+
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+
+import jieba
+
+try:
+    from .config import TOKENIZER_CONFIG
+except ImportError:
+    from config import TOKENIZER_CONFIG
+
+# 通用停用词表，只构建一次
+STOPWORDS = frozenset({
+    '的', '了', '是', '在', '我', '有', '和', '就', '不', '人', '都', '一', '一个', '上', '也',
+    '很', '到', '说', '要', '去', '你', '会', '着', '没有', '看', '好', '自己', '这'
+})
+
+
+def _cut(text):
+    """jieba精确模式分词，返回不可变的词元组"""
+    return tuple(jieba.cut(text))
+
+
+def _cut_chunk(texts):
+    """子进程中对一批文本分词"""
+    return [_cut(text) for text in texts]
+
+
+class TokenizerService:
+    """共享分词服务
+
+    - cut: 单条文本分词，结果进入有界LRU缓存，适合重复出现的查询
+    - cut_batch: 批量分词，可选多进程，适合建索引等一次性的大量文本
+    """
+
+    def __init__(self, cache_size=4096, processes=1, chunk_size=256):
+        """初始化分词服务
+
+        Args:
+            cache_size (int): LRU缓存条数上限，0表示不缓存
+            processes (int): 批量分词默认进程数，1表示在当前进程中执行
+            chunk_size (int): 多进程批量分词时每个任务的文本条数
+        """
+        self.processes = max(1, processes or 1)
+        self.chunk_size = max(1, chunk_size)
+        self._cached_cut = lru_cache(maxsize=cache_size)(_cut)
+        self._init_lock = threading.Lock()
+        self._initialized = False
+
+    def initialize(self):
+        """加载jieba词典（首次分词时也会自动加载）"""
+        with self._init_lock:
+            if not self._initialized:
+                jieba.initialize()
+                self._initialized = True
+
+    def cut(self, text):
+        """分词（带缓存）
+
+        Args:
+            text (str): 输入文本
+
+        Returns:
+            tuple: 分词结果
+        """
+        return self._cached_cut(text)
+
+    def cut_batch(self, texts, processes=None, use_cache=False):
+        """批量分词
+
+        Args:
+            texts (list): 文本列表
+            processes (int): 进程数，默认使用初始化时的设置
+            use_cache (bool): 是否读写LRU缓存；建索引时的段落一般不会重复出现，默认不缓存
+
+        Returns:
+            list: 与输入顺序一致的分词结果列表
+        """
+        texts = list(texts)
+        processes = max(1, processes or self.processes)
+
+        if processes > 1 and len(texts) > self.chunk_size:
+            chunks = [texts[i:i + self.chunk_size] for i in range(0, len(texts), self.chunk_size)]
+            results = []
+            with ProcessPoolExecutor(max_workers=processes) as executor:
+                for chunk_result in executor.map(_cut_chunk, chunks):
+                    results.extend(chunk_result)
+            return results
+
+        cut = self._cached_cut if use_cache else _cut
+        return [cut(text) for text in texts]
+
+    def cache_info(self):
+        """获取缓存命中统计"""
+        info = self._cached_cut.cache_info()
+        return {
+            "hits": info.hits,
+            "misses": info.misses,
+            "size": info.currsize,
+            "max_size": info.maxsize,
+        }
+
+    def clear_cache(self):
+        """清空缓存（例如加载用户词典之后）"""
+        self._cached_cut.cache_clear()
+
+
+_default_tokenizer = None
+_default_lock = threading.Lock()
+
+
+def get_tokenizer():
+    """获取进程内共享的分词服务实例"""
+    global _default_tokenizer
+    if _default_tokenizer is None:
+        with _default_lock:
+            if _default_tokenizer is None:
+                _default_tokenizer = TokenizerService(
+                    cache_size=TOKENIZER_CONFIG.get('cache_size', 4096),
+                    processes=TOKENIZER_CONFIG.get('processes', 1),
+                    chunk_size=TOKENIZER_CONFIG.get('chunk_size', 256),
+                )
+    return _default_tokenizer